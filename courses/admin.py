@@ -1,8 +1,9 @@
 from django.contrib import admin
-from .models import Course, Module, Material, Enrollment, UserProgress
+from .models import Course, Module, Material, Enrollment, UserProgress, CatalogCourse
 
 admin.site.register(Course)
 admin.site.register(Module)
 admin.site.register(Material)
 admin.site.register(Enrollment)
 admin.site.register(UserProgress)
+admin.site.register(CatalogCourse)
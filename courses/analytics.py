@@ -0,0 +1,121 @@
+from collections import Counter
+from functools import reduce
+from operator import or_
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.db.models import F, Q
+
+from .models import Survey, SurveyStat
+from .surveys import load_surveys
+
+SCORE_KEY = 'score'
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def _numeric_answers(survey_type, answers):
+    # В агрегаты попадают только вопросы и варианты из data/surveys.json: произвольные ключи и значения
+    # из API не должны порождать новые строки SurveyStat
+    survey = load_surveys().get(survey_type)
+    if survey is None or not isinstance(answers, dict):
+        return {}
+    result = {}
+    for question in survey.question_ids:
+        value = survey.clean_answer(question, answers.get(question))
+        if value is not None:
+            result[question] = value
+    return result
+
+
+def _stat_keys(survey_type, answers):
+    if survey_type not in load_surveys():
+        return []
+    answers = _numeric_answers(survey_type, answers)
+    keys = [(survey_type, question, value) for question, value in answers.items()]
+    keys.append((survey_type, SCORE_KEY, sum(answers.values())))
+    return keys
+
+
+def _shift_stats(keys, delta):
+    if not keys:
+        return
+    condition = reduce(or_, (Q(survey_type=t, question=q, value=v) for t, q, v in keys))
+    if delta > 0:
+        SurveyStat.objects.bulk_create(
+            [SurveyStat(survey_type=t, question=q, value=v) for t, q, v in keys], ignore_conflicts=True
+        )
+    else:
+        condition &= Q(count__gte=-delta)
+    SurveyStat.objects.filter(condition).update(count=F('count') + delta)
+
+
+def update_survey_stats(old=None, new=None):
+    # Инкрементальное обновление: old и new — (тип, ответы) до и после изменения, None — нет версии
+    # (создание или удаление). Общие ключи не трогаются, остальные сдвигаются двумя UPDATE
+    old_keys = set(_stat_keys(*old)) if old is not None else set()
+    new_keys = set(_stat_keys(*new)) if new is not None else set()
+    with transaction.atomic():
+        _shift_stats(new_keys - old_keys, 1)
+        _shift_stats(old_keys - new_keys, -1)
+
+
+def _count_batch(rows):
+    frame = pd.DataFrame.from_records([_numeric_answers(survey_type, answers) for survey_type, answers in rows],
+                                      index=range(len(rows)))
+    frame.insert(0, 'survey_type', [survey_type for survey_type, _ in rows])
+    question_columns = [column for column in frame.columns if column != 'survey_type']
+
+    counts = Counter()
+    long = frame.melt(id_vars='survey_type', var_name='question', value_name='value').dropna(subset=['value'])
+    for (survey_type, question, value), count in long.groupby(['survey_type', 'question', 'value']).size().items():
+        counts[(survey_type, question, int(value))] += int(count)
+
+    scores = np.nan_to_num(frame[question_columns].to_numpy(dtype=float)).sum(axis=1).astype(np.int64)
+    score_frame = pd.DataFrame({'survey_type': frame['survey_type'], 'value': scores})
+    for (survey_type, value), count in score_frame.groupby(['survey_type', 'value']).size().items():
+        counts[(survey_type, SCORE_KEY, int(value))] += int(count)
+    return counts
+
+
+def compute_stats(queryset=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Полный пересчёт пачками по chunk_size строк, без загрузки всей таблицы в память
+    queryset = queryset if queryset is not None else Survey.objects.all()
+    queryset = queryset.filter(survey_type__in=list(load_surveys()))
+    totals = Counter()
+    batch = []
+    for row in queryset.values_list('survey_type', 'answers').iterator(chunk_size=chunk_size):
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            totals.update(_count_batch(batch))
+            batch = []
+    if batch:
+        totals.update(_count_batch(batch))
+    return totals
+
+
+def rebuild_stats(chunk_size=DEFAULT_CHUNK_SIZE):
+    totals = compute_stats(chunk_size=chunk_size)
+    with transaction.atomic():
+        SurveyStat.objects.all().delete()
+        SurveyStat.objects.bulk_create(
+            [SurveyStat(survey_type=t, question=q, value=v, count=count) for (t, q, v), count in totals.items()],
+            batch_size=1000,
+        )
+    return totals
+
+
+def stats_report(survey_type=None):
+    rows = SurveyStat.objects.filter(count__gt=0)
+    if survey_type:
+        rows = rows.filter(survey_type=survey_type)
+    report = {}
+    for survey_type, question, value, count in rows.order_by('survey_type', 'question', 'value').values_list(
+            'survey_type', 'question', 'value', 'count'):
+        entry = report.setdefault(survey_type, {'total': 0, 'questions': {}, 'scores': {}})
+        if question == SCORE_KEY:
+            entry['scores'][value] = count
+            entry['total'] += count
+        else:
+            entry['questions'].setdefault(question, {})[value] = count
+    return report
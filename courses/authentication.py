@@ -0,0 +1,153 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import router
+from rest_framework.authentication import TokenAuthentication
+
+from .versions import bump_version, get_version
+
+TOKEN_CACHE_KEY = 'courses:token:{}'
+TOKEN_REVOCATION_KEY = 'courses:token:{}:revoked'
+# Хэш пароля в кэш не попадает: поле отложено и дочитывается из базы, только если к нему обратятся
+USER_FIELDS = tuple(field.attname for field in User._meta.concrete_fields if field.attname != 'password')
+
+
+class TokenCache:
+    """
+    LRU в памяти процесса: ключ токена -> (дата создания токена, значения полей пользователя).
+    Запись живёт TOKEN_CACHE_TTL секунд: столько в худшем случае другой процесс видит отозванный
+    токен, в своём процессе отзыв действует сразу.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Растёт при каждом отзыве: строка, прочитанная из базы до отзыва, в кэш уже не попадёт
+        self.generation = 0
+
+    @property
+    def max_size(self):
+        return getattr(settings, 'TOKEN_CACHE_SIZE', 10000)
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'TOKEN_CACHE_TTL', 30)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, row = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return row
+
+    def set(self, key, row, generation):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, row)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, keys=(), user_id=None):
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._entries.pop(key, None)
+            if user_id is not None:
+                user_index = USER_FIELDS.index('id')
+                for key in [key for key, (_, (_, values)) in self._entries.items() if values[user_index] == user_id]:
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+token_cache = TokenCache()
+
+
+def shared_cache():
+    # Общий уровень (например, Redis из CACHES) — по алиасу, пустая строка отключает его
+    alias = getattr(settings, 'TOKEN_SHARED_CACHE', '')
+    return caches[alias] if alias else None
+
+
+def shared_key(key):
+    # В общий кэш ключ токена попадает только в виде хэша
+    return TOKEN_CACHE_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def revocation_key(key):
+    return TOKEN_REVOCATION_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def forget_tokens(keys=(), user_id=None):
+    keys = list(keys)
+    if user_id is not None:
+        from rest_framework.authtoken.models import Token
+        keys += Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    token_cache.discard(keys, user_id)
+    shared = shared_cache()
+    if shared is not None and keys:
+        # Новая версия отзыва: запись, загруженная из базы до отзыва и записанная после, не будет принята
+        for key in keys:
+            bump_version(revocation_key(key), shared)
+        shared.delete_many([shared_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication без запроса Token + User на каждый вызов API: строка берётся из LRU процесса,
+    затем из общего кэша, и только потом из базы. Неверные токены и неактивные пользователи не кэшируются.
+    Отзыв — в courses.signals: удаление токена, любое сохранение пользователя (смена пароля, деактивация).
+    """
+
+    def authenticate_credentials(self, key):
+        row = token_cache.get(key)
+        if row is None:
+            generation = token_cache.generation
+            shared = shared_cache()
+            row = self.load_row(key) if shared is None else self.load_shared_row(shared, key)
+            token_cache.set(key, row, generation)
+        return self.build(key, row)
+
+    def load_shared_row(self, shared, key):
+        # Запись общего кэша хранит версию отзыва, прочитанную до запроса к базе, и принимается,
+        # только пока версия не сменилась — как поколение у LRU процесса, но для всех процессов
+        entry_key, version_key = shared_key(key), revocation_key(key)
+        cached = shared.get_many([entry_key, version_key])
+        version = cached.get(version_key) or get_version(version_key, shared)
+        entry = cached.get(entry_key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        row = self.load_row(key)
+        shared.set(entry_key, (version, row), getattr(settings, 'TOKEN_SHARED_CACHE_TTL', 300))
+        return row
+
+    def load_row(self, key):
+        user, token = super().authenticate_credentials(key)
+        return token.created, tuple(getattr(user, name) for name in USER_FIELDS)
+
+    def build(self, key, row):
+        # Каждый запрос получает свои экземпляры: изменения request.user не расходятся по другим запросам
+        created, values = row
+        user = User.from_db(router.db_for_read(User), USER_FIELDS, values)
+        model = self.get_model()
+        token = model.from_db(router.db_for_read(model), ('key', 'user_id', 'created'), (key, user.pk, created))
+        token.user = user
+        return user, token
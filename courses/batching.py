@@ -0,0 +1,10 @@
+from itertools import islice
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def batched(iterable, size):
+    # Пачки по size элементов без загрузки всего итератора в память
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
@@ -0,0 +1,499 @@
+import asyncio
+import io
+import json
+import platform
+import random
+import string
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import accumulate
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection
+from django.db.models import Q
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+
+from .authentication import CachedTokenAuthentication, token_cache
+from .batching import DEFAULT_BATCH_SIZE
+from .fast_serializers import VALUES_SERIALIZERS
+from .middleware import capture_queries
+from .models import Course, Enrollment, Material, Module
+from .progress import refresh_module_counts
+from .search import SEARCH_TABLE, build_match, search
+from .seeding import bulk_insert
+from .test_runner import isolated_caches
+
+
+def default_endpoints():
+    course = Course.objects.order_by('id').first()
+    endpoints = [
+        ('api_courses', reverse('api_courses'), 'user'),
+        ('favorites', reverse('favorites'), 'user'),
+        ('api_profile', reverse('api_profile'), 'user'),
+        ('module_list', reverse('module_list'), 'staff'),
+        ('material_list', reverse('material_list'), 'staff'),
+        ('api_users', reverse('api_users'), 'staff'),
+        ('course_list_create', reverse('course_list_create'), 'user'),
+        ('module_list_create', reverse('module_list_create'), 'user'),
+        ('material_list_create', reverse('material_list_create'), 'user'),
+        ('enrollment_list_create', reverse('enrollment_list_create'), 'user'),
+        ('progress_list_create', reverse('progress_list_create'), 'user'),
+        ('favorite_list_create', reverse('favorite_list_create'), 'user'),
+        ('survey_list_create', reverse('survey_list_create'), 'user'),
+    ]
+    if course is not None:
+        endpoints += [
+            ('course_detail', reverse('course_detail', kwargs={'slug': course.slug}), 'user'),
+            ('course_detail_api', reverse('course_detail_api', kwargs={'pk': course.pk}), 'user'),
+        ]
+    return endpoints
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def measure(client, path, requests, warmup=2):
+    for _ in range(warmup):
+        client.get(path)
+    timings = []
+    query_counts = []
+    statuses = set()
+    started = time.perf_counter()
+    for _ in range(requests):
+        with capture_queries() as stats:
+            request_started = time.perf_counter()
+            response = client.get(path)
+            timings.append((time.perf_counter() - request_started) * 1000)
+        query_counts.append(stats.count)
+        statuses.add(response.status_code)
+    elapsed = time.perf_counter() - started
+    timings.sort()
+    return {
+        'path': path,
+        'requests': requests,
+        'status_codes': sorted(statuses),
+        'throughput_rps': round(requests / elapsed, 2) if elapsed else None,
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'queries_min': min(query_counts),
+        'queries_max': max(query_counts),
+    }
+
+
+def run_benchmark(requests=50, warmup=2, endpoints=None, only=None):
+    staff = User.objects.filter(is_superuser=True).order_by('id').first()
+    user = User.objects.filter(is_staff=False).order_by('id').first() or staff
+    clients = {'staff': Client(), 'user': Client()}
+    clients['staff'].force_login(staff)
+    clients['user'].force_login(user)
+
+    results = {}
+    for name, path, role in endpoints or default_endpoints():
+        if only and name not in only:
+            continue
+        results[name] = measure(clients[role], path, requests, warmup=warmup)
+    return results
+
+
+def _best_of(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def benchmark_serializers(rows=5000, repeat=5):
+    # Полный путь списка без HTTP: выборка, сериализация и рендеринг JSON — ModelSerializer против values()
+    renderer = JSONRenderer()
+    results = {}
+    for model, values_serializer_class in VALUES_SERIALIZERS.items():
+        queryset = model.objects.order_by('id')
+        if model is Enrollment:
+            queryset = queryset.select_related('course')
+        queryset = queryset[:rows]
+        serializer_class = values_serializer_class.serializer_class
+
+        def model_path():
+            return renderer.render(serializer_class(queryset, many=True).data)
+
+        def values_path():
+            fast = values_serializer_class()
+            return renderer.render(fast.serialize(fast.values(queryset)))
+
+        model_seconds, expected = _best_of(model_path, repeat)
+        values_seconds, content = _best_of(values_path, repeat)
+        count = queryset.count()
+        results[serializer_class.__name__] = {
+            'rows': count,
+            'model_serializer_ms': round(model_seconds * 1000, 3),
+            'values_serializer_ms': round(values_seconds * 1000, 3),
+            'model_rows_per_s': round(count / model_seconds) if model_seconds else None,
+            'values_rows_per_s': round(count / values_seconds) if values_seconds else None,
+            'speedup': round(model_seconds / values_seconds, 2) if values_seconds else None,
+            'identical': content == expected,
+        }
+    return results
+
+
+SEARCH_VOCABULARY = 20000
+SEARCH_WORDS_PER_MATERIAL = 40
+
+
+def search_vocabulary(rng, size=SEARCH_VOCABULARY):
+    letters = 'абвгдеёжзийклмнопрстуфхцчшщыэюя' + string.ascii_lowercase
+    words = {}
+    while len(words) < size:
+        words.setdefault(''.join(rng.choices(letters, k=rng.randint(4, 10))), None)
+    return list(words)
+
+
+def seed_search_corpus(materials, batch_size=DEFAULT_BATCH_SIZE, seed=0, report=None):
+    # Тексты из синтетического словаря с распределением Ципфа: есть частые слова (длинные списки
+    # совпадений) и редкие; курсы и модули — по 10 модулей на курс и 100 материалов на модуль
+    rng = random.Random(seed)
+    words = search_vocabulary(rng)
+    cum_weights = list(accumulate(1 / rank for rank in range(1, len(words) + 1)))
+
+    def text(k):
+        return ' '.join(rng.choices(words, cum_weights=cum_weights, k=k))
+
+    instructor, _ = User.objects.get_or_create(username='search_bench_admin', defaults={'is_staff': True})
+    now = timezone.now()
+    modules = max(1, materials // 100)
+    courses = max(1, modules // 10)
+    insert = dict(batch_size=batch_size, report=report)
+    bulk_insert(Course, (
+        Course(title=text(3), slug=f'search-bench-{i}', description=text(30), instructor=instructor,
+               start_date=now, end_date=now) for i in range(courses)
+    ), total=courses, **insert)
+    course_ids = list(Course.objects.filter(instructor=instructor).values_list('id', flat=True))
+    bulk_insert(Module, (
+        Module(title=text(3), description=text(20), course_id=course_ids[i % len(course_ids)])
+        for i in range(modules)
+    ), total=modules, **insert)
+    module_ids = list(Module.objects.filter(course_id__in=course_ids).values_list('id', flat=True))
+    bulk_insert(Material, (
+        Material(title=text(4), type='text', content=text(SEARCH_WORDS_PER_MATERIAL),
+                 module_id=module_ids[i % len(module_ids)]) for i in range(materials)
+    ), total=materials, **insert)
+    refresh_module_counts(course_ids)
+    return words, {'courses': courses, 'modules': modules, 'materials': materials}
+
+
+def search_queries(words):
+    # Частое слово, слово средней частоты, редкое, два слова и префикс
+    return {
+        'frequent': words[0],
+        'medium': words[200],
+        'rare': words[-1],
+        'two_words': f'{words[5]} {words[50]}',
+        'prefix': words[20][:3],
+    }
+
+
+def benchmark_search(queries, repeat=20, baseline_repeat=3, limit=20):
+    # Поиск FTS5 с ранжированием и подсветкой против полного сканирования через icontains;
+    # matches показывает, сколько строк ранжирует bm25: частое слово обходится дороже редкого
+    results = {}
+    for name, query in queries.items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            found = search(query, limit=limit)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [build_match(query)])
+            matches = cursor.fetchone()[0]
+
+        # Без индекса число совпадений (для пагинации) требует полного прохода по всем текстам
+        scan = Material.objects.all()
+        for term in query.split():
+            scan = scan.filter(Q(title__icontains=term) | Q(content__icontains=term))
+        scan_seconds, _ = _best_of(scan.count, baseline_repeat)
+        results[name] = {
+            'query': query,
+            'matches': matches,
+            'results': len(found),
+            'fts_p50_ms': round(percentile(timings, 50), 3),
+            'fts_p95_ms': round(percentile(timings, 95), 3),
+            'icontains_count_ms': round(scan_seconds * 1000, 3),
+        }
+    return results
+
+
+def async_endpoints():
+    # Представления с асинхронной реализацией
+    course = Course.objects.order_by('id').first()
+    return {
+        'api_courses': reverse('api_courses'),
+        'course_detail': reverse('course_detail', kwargs={'slug': course.slug}),
+        'course_tree': reverse('course_tree', kwargs={'pk': course.pk}),
+        'favorites': reverse('favorites'),
+        'api_profile': reverse('api_profile'),
+    }
+
+
+def session_cookie(user):
+    client = Client()
+    client.force_login(user)
+    return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+
+def _load_summary(results, elapsed):
+    timings = sorted(timing for timing, _ in results)
+    return {
+        'requests': len(results),
+        'status_codes': sorted({status for _, status in results}),
+        'throughput_rps': round(len(results) / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+    }
+
+
+def load_wsgi(path, cookie, concurrency, requests):
+    # Многопоточный WSGI-сервер: concurrency рабочих потоков, каждый вызывает WSGIHandler
+    handler = WSGIHandler()
+
+    def call(_):
+        statuses = []
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+            'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1', 'HTTP_HOST': 'testserver', 'HTTP_COOKIE': cookie,
+            'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        started = time.perf_counter()
+        response = handler(environ, lambda status, headers, exc_info=None: statuses.append(int(status[:3])))
+        try:
+            b''.join(response)
+        finally:
+            response.close()
+        return (time.perf_counter() - started) * 1000, statuses[0]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(call, range(requests)))
+    return _load_summary(results, time.perf_counter() - started)
+
+
+async def _load_asgi(path, cookie, concurrency, requests):
+    handler = ASGIHandler()
+    semaphore = asyncio.Semaphore(concurrency)
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+
+    async def call():
+        async with semaphore:
+            finished = asyncio.Event()
+            body = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+            statuses = []
+
+            async def receive():
+                if body:
+                    return body.pop()
+                await finished.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+
+            started = time.perf_counter()
+            await handler(dict(scope), receive, send)
+            finished.set()
+            return (time.perf_counter() - started) * 1000, statuses[0]
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(call() for _ in range(requests)))
+    return _load_summary(results, time.perf_counter() - started)
+
+
+def load_asgi(path, cookie, concurrency, requests):
+    # ASGI-сервер с одним event loop: concurrency одновременных запросов к ASGIHandler
+    return asyncio.run(_load_asgi(path, cookie, concurrency, requests))
+
+
+def benchmark_wsgi_asgi(concurrency=(1, 8, 32), requests=200, warmup=5, only=None):
+    user = User.objects.filter(is_staff=False, favorite_courses__isnull=False).order_by('id').first()
+    cookie = session_cookie(user)
+    results = {}
+    for name, path in async_endpoints().items():
+        if only and name not in only:
+            continue
+        # Прогрев кэшей страниц, дерева и каталога, чтобы оба сервера мерились на одинаковом состоянии
+        load_wsgi(path, cookie, 1, warmup)
+        results[name] = {'path': path}
+        for level in concurrency:
+            wsgi = load_wsgi(path, cookie, level, requests)
+            asgi = load_asgi(path, cookie, level, requests)
+            results[name][f'concurrency_{level}'] = {
+                'wsgi': wsgi,
+                'asgi': asgi,
+                'asgi_to_wsgi_throughput': round(asgi['throughput_rps'] / wsgi['throughput_rps'], 2)
+                if wsgi['throughput_rps'] and asgi['throughput_rps'] else None,
+            }
+    return results
+
+
+AUTH_CLASSES = {
+    'token_db': 'rest_framework.authentication.TokenAuthentication',
+    'cached_token': 'courses.authentication.CachedTokenAuthentication',
+}
+
+
+def seed_tokens(users, batch_size=DEFAULT_BATCH_SIZE, report=None):
+    bulk_insert(User, (User(username=f'auth_user_{i}', password='!') for i in range(users)),
+                batch_size=batch_size, total=users, report=report, label='user')
+    user_ids = User.objects.filter(username__startswith='auth_user_').values_list('id', flat=True)
+    bulk_insert(Token, (Token(key=Token.generate_key(), user_id=user_id) for user_id in user_ids.iterator()),
+                batch_size=batch_size, total=users, report=report, label='token')
+    return list(Token.objects.order_by('user_id').values_list('key', flat=True))
+
+
+def _auth_timings(authenticator, keys):
+    factory = APIRequestFactory()
+    requests = [factory.get('/', HTTP_AUTHORIZATION=f'Token {key}') for key in keys]
+    timings = []
+    with capture_queries() as stats:
+        for request in requests:
+            started = time.perf_counter()
+            authenticator.authenticate(Request(request))
+            timings.append((time.perf_counter() - started) * 1_000_000)
+    timings.sort()
+    return {
+        'calls': len(keys),
+        'mean_us': round(sum(timings) / len(timings), 2),
+        'p50_us': round(percentile(timings, 50), 2),
+        'p95_us': round(percentile(timings, 95), 2),
+        'queries_per_call': round(stats.count / len(keys), 3),
+    }
+
+
+@contextmanager
+def authentication_classes(classes):
+    # Представления DRF берут классы из настроек при объявлении, поэтому подменяется атрибут APIView
+    previous = APIView.authentication_classes
+    APIView.authentication_classes = [import_string(path) for path in classes]
+    try:
+        yield
+    finally:
+        APIView.authentication_classes = previous
+
+
+def benchmark_auth(keys, calls=5000, hot_tokens=1000, shared_cache=None, requests=300):
+    # Стоимость аутентификации одного вызова: DRF TokenAuthentication (Token + User из базы) против кэша.
+    # Горячие токены — активные клиенты, к ним идёт весь поток вызовов; холодные — первые обращения
+    rng = random.Random(0)
+    hot, cold = keys[:hot_tokens], keys[hot_tokens:hot_tokens + calls]
+    sample = [rng.choice(hot) for _ in range(calls)]
+    cached = CachedTokenAuthentication()
+    token_cache.clear()
+    results = {
+        'token_db': _auth_timings(TokenAuthentication(), sample),
+        'cached_miss': _auth_timings(cached, cold),
+    }
+    token_cache.clear()
+    _auth_timings(cached, hot)
+    results['cached_local_hit'] = _auth_timings(cached, sample)
+
+    # Общий уровень: заданный алиас CACHES или отдельный LocMemCache, в который помещаются все горячие токены
+    caches_setting = settings.CACHES
+    if not shared_cache:
+        shared_cache = 'token_benchmark'
+        caches_setting = {**caches_setting, shared_cache: {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'token-benchmark', 'OPTIONS': {'MAX_ENTRIES': len(hot) * 2},
+        }}
+    with override_settings(CACHES=caches_setting, TOKEN_SHARED_CACHE=shared_cache):
+        token_cache.clear()
+        _auth_timings(cached, hot)
+        # LRU нулевого размера: каждый вызов идёт в общий кэш, как в только что запущенном процессе
+        with override_settings(TOKEN_CACHE_SIZE=0):
+            results['cached_shared_hit'] = _auth_timings(cached, sample)
+    results['cached_shared_hit']['shared_cache'] = shared_cache
+    for result in results.values():
+        result['speedup'] = round(results['token_db']['mean_us'] / result['mean_us'], 2)
+
+    # Весь запрос к API с токеном: разница в запросах к базе и в задержке на одном и том же представлении
+    path = reverse('search') + '?q=auth'
+    endpoint = {}
+    for name, auth_class in AUTH_CLASSES.items():
+        with authentication_classes([auth_class]):
+            token_cache.clear()
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {hot[0]}')
+            endpoint[name] = measure(client, path, requests)
+    return {'authenticate': results, 'endpoint': endpoint}
+
+
+@contextmanager
+def isolated_database(keepdb=False):
+    # Прогоны идут в отдельной тестовой базе и в своём кэше: рабочие база и общий кэш не затрагиваются
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+    try:
+        with override_settings(CACHES=isolated_caches()):
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+
+def environment_info():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'platform': platform.platform(),
+    }
+
+
+def add_report_arguments(parser):
+    parser.add_argument('--output', help='Файл для JSON-отчёта (по умолчанию stdout)')
+    parser.add_argument('--keepdb', action='store_true', help='Не удалять тестовую базу после прогона')
+
+
+def write_report(command, output, **sections):
+    # Общий вывод команд benchmark_*: окружение и разделы отчёта в JSON — в файл или в stdout
+    report = json.dumps({'environment': environment_info(), **sections}, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, 'w', encoding='utf-8') as fh:
+            fh.write(report)
+        command.stderr.write(f'Отчёт записан в {output}')
+    else:
+        command.stdout.write(report)
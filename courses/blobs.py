@@ -0,0 +1,66 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import Material, StoredBlob
+from .storage import BLOB_DIR, material_storage
+
+
+def retain_blob(name):
+    if not material_storage.is_blob(name):
+        return
+    if StoredBlob.objects.filter(name=name).update(refcount=F('refcount') + 1):
+        return
+    try:
+        with transaction.atomic():
+            StoredBlob.objects.create(name=name, size=material_storage.size(name), refcount=1)
+    except IntegrityError:
+        StoredBlob.objects.filter(name=name).update(refcount=F('refcount') + 1)
+
+
+def release_blob(name):
+    # Файл удаляется только после коммита и только когда на блоб больше никто не ссылается
+    if not material_storage.is_blob(name):
+        return
+    with transaction.atomic():
+        blob = StoredBlob.objects.select_for_update().filter(name=name).first()
+        if blob is None:
+            return
+        if blob.refcount > 1:
+            StoredBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') - 1)
+            return
+        blob.delete()
+        transaction.on_commit(lambda: _delete_unreferenced(name))
+
+
+def _delete_unreferenced(name):
+    # Пока удаление ждало коммита, тот же файл мог быть загружен заново
+    if not StoredBlob.objects.filter(name=name).exists():
+        material_storage.delete(name)
+
+
+def rebuild_blob_refcounts():
+    # Пересчёт счётчиков по материалам: после записи в обход сигналов (update, bulk_create, миграции)
+    referenced = dict(
+        Material.objects.filter(file__startswith=BLOB_DIR + '/').values('file')
+        .annotate(total=Count('id')).values_list('file', 'total')
+    )
+    known = dict(StoredBlob.objects.values_list('name', 'refcount'))
+    for name, total in referenced.items():
+        if name not in known:
+            StoredBlob.objects.create(name=name, size=material_storage.size(name), refcount=total)
+        elif known[name] != total:
+            StoredBlob.objects.filter(name=name).update(refcount=total)
+    StoredBlob.objects.exclude(name__in=referenced).update(refcount=0)
+    return len(referenced)
+
+
+def unreferenced_blobs():
+    # Имена файлов хранилища, на которые не ссылается ни один материал (включая файлы без строки StoredBlob)
+    referenced = set(Material.objects.filter(file__startswith=BLOB_DIR + '/')
+                     .values_list('file', flat=True))
+    directories, _ = material_storage.listdir(BLOB_DIR) if material_storage.exists(BLOB_DIR) else ([], [])
+    names = []
+    for directory in directories:
+        _, files = material_storage.listdir(f'{BLOB_DIR}/{directory}')
+        names.extend(f'{BLOB_DIR}/{directory}/{file}' for file in files)
+    return [name for name in names if name not in referenced]
@@ -0,0 +1,104 @@
+import functools
+import threading
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.utils import dateformat, timezone
+
+from .models import CatalogCourse, FavoriteCourse
+from .slugs import slugify_title
+from .versions import bump_version, get_version
+
+CATALOG_VERSION_KEY = 'courses:catalog:version'
+CATALOG_DATE_FORMAT = 'j E Y'
+
+# Копия каталога в памяти процесса. Актуальность проверяется по версии в общем кэше,
+# поэтому обычный просмотр каталога не обращается к базе за самим каталогом.
+_snapshot = {'version': None, 'entries': (), 'icons': {}}
+_lock = threading.Lock()
+
+
+def get_catalog_version():
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def invalidate_catalog():
+    bump_version(CATALOG_VERSION_KEY)
+
+
+def _load_entries():
+    return tuple(
+        {
+            'name': name,
+            'slug': slugify_title(name),
+            'icon': icon,
+            'date': _format_date(date),
+        }
+        for name, icon, date in CatalogCourse.objects.values_list('name', 'icon', 'date')
+    )
+
+
+def get_catalog():
+    version = get_catalog_version()
+    if _snapshot['version'] != version:
+        with _lock:
+            if _snapshot['version'] != version:
+                entries = _load_entries()
+                _snapshot['entries'] = entries
+                _snapshot['icons'] = {entry['name']: entry['icon'] for entry in entries}
+                _snapshot['version'] = version
+    return _snapshot['entries']
+
+
+def get_catalog_icons():
+    get_catalog()
+    return _snapshot['icons']
+
+
+@functools.lru_cache(maxsize=4096)
+def _format_date(value):
+    return dateformat.format(value, CATALOG_DATE_FORMAT)
+
+
+def format_course_date(value):
+    if hasattr(value, 'tzinfo') and value.tzinfo is not None:
+        value = timezone.localtime(value)
+    if hasattr(value, 'date'):
+        value = value.date()
+    return _format_date(value)
+
+
+def _with_favorites(entries, favorites):
+    return [
+        {**entry, 'progress': favorites.get(entry['name'], 0), 'is_favorite': entry['name'] in favorites}
+        for entry in entries
+    ]
+
+
+def catalog_for_user(user):
+    entries = get_catalog()
+    favorites = {}
+    if user.is_authenticated:
+        favorites = dict(FavoriteCourse.objects.filter(user=user).values_list('course_name', 'progress'))
+    return _with_favorites(entries, favorites)
+
+
+async def aget_catalog():
+    # Актуальная копия отдаётся сразу, перезагрузка из базы — через синхронный get_catalog под блокировкой
+    if _snapshot['version'] is not None and _snapshot['version'] == await cache.aget(CATALOG_VERSION_KEY):
+        return _snapshot['entries']
+    return await sync_to_async(get_catalog)()
+
+
+async def aget_catalog_icons():
+    await aget_catalog()
+    return _snapshot['icons']
+
+
+async def acatalog_for_user(user):
+    entries = await aget_catalog()
+    favorites = {}
+    if user.is_authenticated:
+        favorites = {name: progress async for name, progress in
+                     FavoriteCourse.objects.filter(user=user).values_list('course_name', 'progress')}
+    return _with_favorites(entries, favorites)
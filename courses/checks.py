@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+from .search import missing_triggers
+
+
+@register(Tags.database)
+def search_triggers_check(app_configs, databases=None, **kwargs):
+    # Проверки с тегом database запускаются командой migrate и check --database
+    errors = []
+    for alias in databases or ():
+        missing = missing_triggers(alias)
+        if missing:
+            errors.append(Warning(
+                f'Нет триггеров полнотекстового индекса: {", ".join(missing)}',
+                hint='Таблица пересоздана миграцией; выполните python manage.py rebuild_search_index',
+                id='courses.W001',
+            ))
+    return errors
+
+
+@register(Tags.caches, deploy=True)
+def shared_cache_check(app_configs, **kwargs):
+    # Сброс кэша страниц, деревьев и версий из одного воркера должен доходить до остальных
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend.endswith('locmem.LocMemCache'):
+        return [Warning(
+            'Кэш default хранится в памяти процесса: при нескольких воркерах сброс не доходит до остальных',
+            hint='Задайте REDIS_URL или файловый кэш (CACHE_DIR), общий для всех воркеров',
+            id='courses.W002',
+        )]
+    return []
@@ -0,0 +1,69 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .batching import DEFAULT_BATCH_SIZE, batched
+from .models import Enrollment
+from .progress import rebuild_rollups
+from .recommender import recommender
+
+MAX_COHORT_SIZE = 50000
+INVALID_SAMPLE_SIZE = 100
+
+
+def split_identifiers(users):
+    # Числа — id пользователей, строки — логины; повторы учитываются один раз
+    ids, usernames, invalid = {}, {}, []
+    for value in users:
+        if isinstance(value, int) and not isinstance(value, bool):
+            ids.setdefault(value, None)
+        elif isinstance(value, str) and value.strip():
+            usernames.setdefault(value.strip(), None)
+        else:
+            invalid.append(value)
+    return list(ids), list(usernames), invalid
+
+
+def resolve_users(ids, usernames, batch_size=DEFAULT_BATCH_SIZE):
+    found_ids, invalid = [], []
+    for batch in batched(ids, batch_size):
+        known = set(User.objects.filter(id__in=batch).values_list('id', flat=True))
+        found_ids.extend(user_id for user_id in batch if user_id in known)
+        invalid.extend(user_id for user_id in batch if user_id not in known)
+    for batch in batched(usernames, batch_size):
+        known = dict(User.objects.filter(username__in=batch).values_list('username', 'id'))
+        found_ids.extend(known[username] for username in batch if username in known)
+        invalid.extend(username for username in batch if username not in known)
+    return list(dict.fromkeys(found_ids)), invalid
+
+
+def enroll_cohort(course, users, batch_size=DEFAULT_BATCH_SIZE, report=None):
+    ids, usernames, invalid = split_identifiers(users)
+    user_ids, unknown = resolve_users(ids, usernames, batch_size)
+    invalid.extend(unknown)
+
+    created = already_enrolled = 0
+    for batch in batched(user_ids, batch_size):
+        # Пачка — одна транзакция: уже записанные отсекаются заранее, гонки гасит ignore_conflicts
+        with transaction.atomic():
+            existing = set(Enrollment.objects.filter(course=course, user_id__in=batch)
+                           .values_list('user_id', flat=True))
+            Enrollment.objects.bulk_create(
+                [Enrollment(user_id=user_id, course=course) for user_id in batch if user_id not in existing],
+                batch_size=batch_size, ignore_conflicts=True,
+            )
+            total = Enrollment.objects.filter(course=course, user_id__in=batch).count()
+        already_enrolled += len(existing)
+        created += total - len(existing)
+        if report:
+            report(created, already_enrolled, len(invalid))
+
+    if created:
+        # bulk_create не вызывает сигналы: новые записи получают сводку по уже существующему прогрессу
+        rebuild_rollups(Enrollment.objects.filter(course=course, progress_points=0, completed_modules=0))
+        recommender.mark_dirty(course.id)
+    return {
+        'created': created,
+        'already_enrolled': already_enrolled,
+        'invalid': len(invalid),
+        'invalid_users': invalid[:INVALID_SAMPLE_SIZE],
+    }
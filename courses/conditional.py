@@ -0,0 +1,67 @@
+import hashlib
+from calendar import timegm
+
+from django.db.models import Max
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+from .versions import bump_version, get_version
+
+
+DELETIONS_VERSION_KEY = 'courses:deletions:{}'
+
+
+def get_deletions_version(model):
+    # Удаление не двигает максимум updated_at, поэтому списки учитывают ещё и счётчик удалений
+    return get_version(DELETIONS_VERSION_KEY.format(model._meta.label_lower))
+
+
+def record_deletion(model):
+    bump_version(DELETIONS_VERSION_KEY.format(model._meta.label_lower))
+
+
+def make_etag(*parts):
+    return hashlib.blake2b('|'.join(map(str, parts)).encode(), digest_size=16).hexdigest()
+
+
+class ConditionalGetMixin:
+    # ETag (и Last-Modified для деталей) для generic-представлений DRF по полю updated_at: валидатор считается
+    # одним коротким запросом, а при совпадении ответ 304 отдаётся без сериализации
+    updated_field = 'updated_at'
+
+    def _variant(self, request):
+        # Одни и те же данные по-разному выглядят в JSON и в browsable API, на разных страницах и хостах
+        return request.accepted_media_type, request.build_absolute_uri()
+
+    def _conditional(self, request, etag, updated_at, build_response):
+        last_modified = timegm(updated_at.utctimetuple()) if updated_at else None
+        not_modified = get_conditional_response(request, etag=quote_etag(etag), last_modified=last_modified)
+        response = not_modified or build_response()
+        if response.status_code in (200, 304):
+            response.headers.setdefault('ETag', quote_etag(etag))
+            if last_modified is not None:
+                response.headers.setdefault('Last-Modified', http_date(last_modified))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        # MAX по индексу updated_at вместо COUNT: списки с курсорной пагинацией не должны сканировать таблицу
+        queryset = self.filter_queryset(self.get_queryset())
+        updated_at = queryset.order_by().aggregate(updated_at=Max(self.updated_field))['updated_at']
+        etag = make_etag(*self._variant(request), get_deletions_version(queryset.model),
+                         updated_at.isoformat() if updated_at else '')
+        # Без Last-Modified: удаление не двигает MAX(updated_at), и If-Modified-Since отдал бы устаревший 304.
+        # Удаления учитывает только ETag — через счётчик удалений в общем кэше
+        return self._conditional(request, etag, None,
+                                 lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        ).values_list('pk', self.updated_field).first()
+        if row is None:
+            return super().retrieve(request, *args, **kwargs)
+        pk, updated_at = row
+        etag = make_etag(*self._variant(request), pk, updated_at.isoformat())
+        return self._conditional(request, etag, updated_at,
+                                 lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs))
@@ -0,0 +1,45 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from .models import Course
+
+COURSE_PAGE_CACHE_KEY = 'courses:course_page:{}'
+COURSE_PAGE_TIMEOUT = 60 * 60 * 24
+
+
+def course_page_key(slug):
+    # Сегмент URL может быть старым адресом по названию — с пробелами, любым Юникодом и любой длины,
+    # а такие ключи не допускает memcached: в ключ идёт хэш, как в surveys.course_cache_key
+    return COURSE_PAGE_CACHE_KEY.format(hashlib.blake2b(slug.encode(), digest_size=16).hexdigest())
+
+
+def get_course_page(slug):
+    # Отрисованная карточка курса хранится в общем кэше; горячие страницы не обращаются к базе
+    key = course_page_key(slug)
+    page = cache.get(key)
+    if page is None:
+        course = Course.objects.select_related('instructor').filter(slug=slug).first()
+        if course is None:
+            return None
+        modules = course.modules.order_by('id').values_list('title', flat=True)
+        page = {
+            'title': course.title,
+            'slug': course.slug,
+            'body': render_to_string('course_detail_body.html', {'course': course, 'modules': modules}),
+        }
+        cache.set(key, page, COURSE_PAGE_TIMEOUT)
+    return page
+
+
+async def aget_course_page(slug):
+    page = await cache.aget(course_page_key(slug))
+    if page is None:
+        page = await sync_to_async(get_course_page)(slug)
+    return page
+
+
+def invalidate_course_pages(slugs):
+    cache.delete_many([course_page_key(slug) for slug in slugs if slug])
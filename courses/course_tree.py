@@ -0,0 +1,53 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from .models import Course, Material, Module
+from .serializers import CourseTreeSerializer
+
+COURSE_TREE_CACHE_KEY = 'courses:course_tree:{}'
+COURSE_TREE_TIMEOUT = 60 * 60 * 24
+
+
+def course_tree_key(course_id):
+    return COURSE_TREE_CACHE_KEY.format(course_id)
+
+
+def build_course_tree(course_id):
+    # Курс, модули и материалы — ровно три запроса независимо от размера курса
+    course = Course.objects.prefetch_related(
+        Prefetch('modules', queryset=Module.objects.order_by('id').prefetch_related(
+            Prefetch('materials', queryset=Material.objects.order_by('id'))
+        ))
+    ).filter(pk=course_id).first()
+    if course is None:
+        return None
+    return JSONRenderer().render(CourseTreeSerializer(course).data)
+
+
+def get_course_tree(course_id):
+    # В кэше лежат готовые байты JSON и их ETag, попадание не трогает ни ORM, ни сериализаторы
+    key = course_tree_key(course_id)
+    entry = cache.get(key)
+    if entry is None:
+        content = build_course_tree(course_id)
+        if content is None:
+            return None
+        entry = (content, hashlib.blake2b(content, digest_size=16).hexdigest())
+        cache.set(key, entry, COURSE_TREE_TIMEOUT)
+    return entry
+
+
+async def aget_course_tree(course_id):
+    # Сборка дерева (prefetch и сериализаторы DRF) остаётся синхронной и нужна только при промахе кэша
+    entry = await cache.aget(course_tree_key(course_id))
+    if entry is None:
+        entry = await sync_to_async(get_course_tree)(course_id)
+    return entry
+
+
+def invalidate_course_trees(course_ids):
+    cache.delete_many([course_tree_key(course_id) for course_id in course_ids if course_id])
@@ -0,0 +1,167 @@
+import hashlib
+import mimetypes
+import os
+import secrets
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+CHUNK_SIZE = 256 * 1024
+MAX_RANGES = 16
+
+
+class FileRange:
+    # Окно [start, start + length) поверх открытого файла. fileno() отдаётся наружу, поэтому
+    # wsgi.file_wrapper (gunicorn, uWSGI) отправляет диапазон через os.sendfile с текущей позиции
+    # и Content-Length, а без него файл читается кусками по CHUNK_SIZE
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range_header(header, size):
+    # Разбор «Range: bytes=...» в список (start, end) включительно, пересекающиеся диапазоны склеиваются.
+    # None — заголовка нет или он не разобран (файл отдаётся целиком), [] — все диапазоны вне файла (416)
+    if not header:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+    ranges = []
+    for part in spec.split(','):
+        first, dash, last = part.strip().partition('-')
+        if not dash:
+            return None
+        try:
+            if not first:
+                suffix = int(last)
+                if suffix <= 0:
+                    continue
+                start, end = max(size - suffix, 0), size - 1
+            else:
+                start = int(first)
+                end = int(last) if last else size - 1
+                if last and start > end:
+                    return None
+                end = min(end, size - 1)
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, end))
+
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def file_validators(stat, name):
+    etag = hashlib.blake2b(f'{name}:{stat.st_size}:{stat.st_mtime_ns}'.encode(), digest_size=16).hexdigest()
+    return quote_etag(etag), int(stat.st_mtime)
+
+
+def _if_range_matches(request, etag, last_modified):
+    # If-Range: диапазон отдаётся, только если у клиента та же версия файла; иначе — весь файл
+    value = request.headers.get('If-Range')
+    if not value:
+        return True
+    if value.startswith('"') or value.startswith('W/'):
+        return value == etag
+    return parse_http_date_safe(value) == last_modified
+
+
+def _multipart(path, ranges, size, content_type, boundary):
+    parts = [
+        ((f'\r\n--{boundary}\r\nContent-Type: {content_type}\r\n'
+          f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n').encode(), start, end)
+        for start, end in ranges
+    ]
+    closing = f'\r\n--{boundary}--\r\n'.encode()
+    length = sum(len(header) + end - start + 1 for header, start, end in parts) + len(closing)
+
+    def stream():
+        with open(path, 'rb') as file:
+            for header, start, end in parts:
+                yield header
+                window = FileRange(file, start, end - start + 1)
+                while chunk := window.read(CHUNK_SIZE):
+                    yield chunk
+        yield closing
+    return stream(), length
+
+
+def serve_file(request, field_file, as_attachment=False, filename=None):
+    # Потоковая отдача: 200 целиком, 206 для одного или нескольких диапазонов,
+    # 304 по ETag/Last-Modified и 416 для диапазонов за пределами файла
+    try:
+        path = field_file.path
+    except NotImplementedError:
+        # Хранилище без локального пути: без Range и sendfile, но всё равно кусками
+        return FileResponse(field_file.open('rb'), as_attachment=as_attachment,
+                            filename=filename or os.path.basename(field_file.name))
+    stat = os.stat(path)
+    size = stat.st_size
+    etag, last_modified = file_validators(stat, field_file.name)
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    filename = filename or os.path.basename(field_file.name)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        ranges = parse_range_header(request.headers.get('Range'), size)
+        if ranges is not None and not _if_range_matches(request, etag, last_modified):
+            ranges = None
+        if ranges is not None and len(ranges) > MAX_RANGES:
+            ranges = None
+
+        accel_prefix = getattr(settings, 'MATERIAL_ACCEL_REDIRECT', '')
+        if accel_prefix:
+            # Отдачу и Range берёт на себя nginx (sendfile на его стороне), Python только проверил права
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + field_file.name
+        elif ranges == []:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        elif ranges is None:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+            response.block_size = CHUNK_SIZE
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            response = FileResponse(FileRange(open(path, 'rb'), start, end - start + 1),
+                                    content_type=content_type, status=206)
+            response.block_size = CHUNK_SIZE
+            response['Content-Length'] = end - start + 1
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        else:
+            boundary = secrets.token_hex(16)
+            content, length = _multipart(path, ranges, size, content_type, boundary)
+            response = StreamingHttpResponse(content, status=206,
+                                             content_type=f'multipart/byteranges; boundary={boundary}')
+            response['Content-Length'] = length
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if response.status_code in (200, 206):
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    return response
@@ -0,0 +1,177 @@
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .models import Course, Module, Material, Enrollment, UserProgress, FavoriteCourse, Survey
+from .serializers import (
+    CourseSerializer, ModuleSerializer, MaterialSerializer, EnrollmentSerializer, UserProgressSerializer,
+    FavoriteCourseSerializer, SurveySerializer
+)
+
+# Поля, значения которых из values() уже совпадают с тем, что вернул бы to_representation
+PASSTHROUGH_FIELDS = (
+    serializers.IntegerField, serializers.CharField, serializers.ChoiceField, serializers.BooleanField,
+    serializers.JSONField, serializers.ReadOnlyField, serializers.PrimaryKeyRelatedField,
+)
+# Поля, для которых переиспользуется to_representation поля DRF, собранного один раз
+CONVERTED_FIELDS = (serializers.DateTimeField, serializers.DateField, serializers.DecimalField)
+
+
+class ValuesSerializer:
+    """
+    Быстрый путь чтения для списков: строки берутся из values_list(named=True) и превращаются
+    в словари по заранее собранному плану, без экземпляров моделей и копий полей на каждую строку.
+    Вывод совпадает с serializer_class байт в байт; неподдерживаемое поле — ошибка при сборке плана.
+    """
+    serializer_class = None
+    # Поля, которых нет в базе: имя -> (пути для values(), функция от этих значений)
+    computed = {}
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        self.model = self.serializer_class.Meta.model
+        self.sources = []
+        self.plan = []
+        for name, field in self.serializer_class(context=self.context).fields.items():
+            if field.write_only:
+                continue
+            if name in self.computed:
+                paths, function = self.computed[name]
+                self.plan.append((name, tuple(self._source(path) for path in paths), function))
+            else:
+                self.plan.append((name, self._source(self._path(field)), self._converter(field)))
+
+    def _source(self, path):
+        if path not in self.sources:
+            self.sources.append(path)
+        return self.sources.index(path)
+
+    def _path(self, field):
+        # 'course.module_count' -> 'course__module_count'; внешний ключ читается как course_id
+        parts = field.source.split('.')
+        model = self.model
+        for part in parts[:-1]:
+            model = self._model_field(model, part, field).related_model
+        model_field = self._model_field(model, parts[-1], field)
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            parts[-1] = model_field.attname
+        return '__'.join(parts)
+
+    def _model_field(self, model, name, field):
+        try:
+            return model._meta.get_field(name)
+        except FieldDoesNotExist:
+            raise ImproperlyConfigured(
+                f'{type(self).__name__}: поле {field.field_name} не хранится в базе, добавьте его в computed'
+            )
+
+    def _converter(self, field):
+        if isinstance(field, serializers.FileField):
+            return self._file_converter(field)
+        if isinstance(field, serializers.DateTimeField):
+            return self._datetime_converter(field)
+        if isinstance(field, CONVERTED_FIELDS):
+            return field.to_representation
+        if isinstance(field, PASSTHROUGH_FIELDS):
+            return None
+        raise ImproperlyConfigured(f'{type(self).__name__}: поле {type(field).__name__} не поддерживается')
+
+    def _datetime_converter(self, field):
+        # Частый случай ISO 8601 для aware-значений без поиска формата и зоны на каждой строке;
+        # всё остальное уходит в DateTimeField.to_representation
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+            return field.to_representation
+        fallback = field.to_representation
+
+        def convert(value):
+            if not timezone.is_aware(value):
+                return fallback(value)
+            value = value.astimezone(field_timezone).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return convert
+
+    def _file_converter(self, field):
+        storage = self.model._meta.get_field(field.source).storage
+        request = self.context.get('request')
+
+        def convert(name):
+            # Как FileField.to_representation: пустое имя — None, при наличии запроса — абсолютный URL
+            if not name:
+                return None
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+        return convert
+
+    def values(self, queryset):
+        return queryset.values_list(*self.sources, named=True)
+
+    def to_representation(self, row):
+        item = {}
+        for name, position, convert in self.plan:
+            if type(position) is tuple:
+                item[name] = convert(*(row[index] for index in position))
+                continue
+            value = row[position]
+            item[name] = value if convert is None or value is None else convert(value)
+        return item
+
+    def serialize(self, rows):
+        to_representation = self.to_representation
+        return [to_representation(row) for row in rows]
+
+
+class CourseValuesSerializer(ValuesSerializer):
+    serializer_class = CourseSerializer
+
+
+class ModuleValuesSerializer(ValuesSerializer):
+    serializer_class = ModuleSerializer
+
+
+class MaterialValuesSerializer(ValuesSerializer):
+    serializer_class = MaterialSerializer
+
+
+class EnrollmentValuesSerializer(ValuesSerializer):
+    serializer_class = EnrollmentSerializer
+    computed = {'progress': (('progress_points', 'course__module_count'), Enrollment.percent)}
+
+
+class UserProgressValuesSerializer(ValuesSerializer):
+    serializer_class = UserProgressSerializer
+
+
+class FavoriteCourseValuesSerializer(ValuesSerializer):
+    serializer_class = FavoriteCourseSerializer
+
+
+class SurveyValuesSerializer(ValuesSerializer):
+    serializer_class = SurveySerializer
+
+
+VALUES_SERIALIZERS = {
+    Course: CourseValuesSerializer,
+    Module: ModuleValuesSerializer,
+    Material: MaterialValuesSerializer,
+    Enrollment: EnrollmentValuesSerializer,
+    UserProgress: UserProgressValuesSerializer,
+    FavoriteCourse: FavoriteCourseValuesSerializer,
+    Survey: SurveyValuesSerializer,
+}
+
+
+class FastListMixin:
+    # GET списка идёт через ValuesSerializer; создание, детальные ответы и формы остаются на ModelSerializer
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        fast = self.values_serializer_class(context=self.get_serializer_context())
+        queryset = fast.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast.serialize(page))
+        return Response(fast.serialize(queryset))
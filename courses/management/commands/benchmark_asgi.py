@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from courses.batching import DEFAULT_BATCH_SIZE
+from courses.benchmarks import add_report_arguments, benchmark_wsgi_asgi, isolated_database, write_report
+from courses.seeding import DEFAULT_DATASET, seed_dataset, print_progress
+
+
+class Command(BaseCommand):
+    help = ('Нагрузка на асинхронные представления через WSGIHandler (пул потоков) и ASGIHandler '
+            '(один event loop) на одних и тех же данных и уровнях конкурентности')
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_DATASET.items():
+            parser.add_argument(f'--{name}', type=int, default=default)
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--requests', type=int, default=200, help='Запросов на каждый endpoint и уровень')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32],
+                            help='Уровни конкурентности')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--only', nargs='*', help='Имена маршрутов, которые нужно прогнать')
+        add_report_arguments(parser)
+
+    def handle(self, *args, **options):
+        dataset = {name: options[name] for name in DEFAULT_DATASET}
+        with isolated_database(keepdb=options['keepdb']):
+            self.stderr.write('Заполнение данных...')
+            counts = seed_dataset(**dataset, batch_size=options['batch_size'], prefix='bench',
+                                  report=print_progress(self.stderr.write))
+            results = benchmark_wsgi_asgi(concurrency=options['concurrency'], requests=options['requests'],
+                                          warmup=options['warmup'], only=options['only'])
+
+        write_report(self, options['output'], dataset=counts, endpoints=results)
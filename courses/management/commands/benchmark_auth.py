@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from courses.batching import DEFAULT_BATCH_SIZE
+from courses.benchmarks import add_report_arguments, benchmark_auth, isolated_database, seed_tokens, write_report
+from courses.seeding import print_progress
+
+
+class Command(BaseCommand):
+    help = 'Стоимость аутентификации по токену на вызов: DRF TokenAuthentication против CachedTokenAuthentication'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20000, help='Пользователей с токенами')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--calls', type=int, default=5000, help='Вызовов аутентификации на сценарий')
+        parser.add_argument('--hot-tokens', type=int, default=1000, help='Токенов, к которым идёт поток вызовов')
+        parser.add_argument('--shared-cache', default='',
+                            help='Алиас CACHES для общего уровня (например, Redis); по умолчанию LocMemCache')
+        parser.add_argument('--requests', type=int, default=300, help='Запросов к API на каждый класс')
+        add_report_arguments(parser)
+
+    def handle(self, *args, **options):
+        with isolated_database(keepdb=options['keepdb']):
+            self.stderr.write('Создание пользователей и токенов...')
+            keys = seed_tokens(options['users'], batch_size=options['batch_size'],
+                               report=print_progress(self.stderr.write))
+            results = benchmark_auth(keys, calls=options['calls'], hot_tokens=options['hot_tokens'],
+                                     shared_cache=options['shared_cache'], requests=options['requests'])
+
+        write_report(self, options['output'], dataset={'users': options['users'], 'tokens': len(keys)}, **results)
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from courses.batching import DEFAULT_BATCH_SIZE
+from courses.benchmarks import add_report_arguments, isolated_database, run_benchmark, write_report
+from courses.seeding import DEFAULT_DATASET, seed_dataset, print_progress
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный прогон HTML-страниц и /api/* на синтетических данных с отчётом в JSON'
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_DATASET.items():
+            parser.add_argument(f'--{name}', type=int, default=default)
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--requests', type=int, default=50, help='Запросов на каждый endpoint')
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--only', nargs='*', help='Имена маршрутов, которые нужно прогнать')
+        add_report_arguments(parser)
+
+    def handle(self, *args, **options):
+        dataset = {name: options[name] for name in DEFAULT_DATASET}
+        with isolated_database(keepdb=options['keepdb']):
+            self.stderr.write('Заполнение данных...')
+            counts = seed_dataset(**dataset, batch_size=options['batch_size'], prefix='bench',
+                                  report=print_progress(self.stderr.write))
+            self.stderr.write(f'Создано: {counts}')
+            results = run_benchmark(requests=options['requests'], warmup=options['warmup'], only=options['only'])
+
+        write_report(self, options['output'], dataset=counts, requests_per_endpoint=options['requests'],
+                     endpoints=results)
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.batching import DEFAULT_BATCH_SIZE
+from courses.benchmarks import (
+    add_report_arguments, benchmark_search, isolated_database, search_queries, seed_search_corpus, write_report
+)
+from courses.search import is_supported
+from courses.seeding import print_progress
+
+
+class Command(BaseCommand):
+    help = 'Задержка полнотекстового поиска FTS5 на большом корпусе материалов в сравнении с icontains'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--materials', type=int, default=1000000, help='Материалов в корпусе')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--repeat', type=int, default=20, help='Повторов каждого поискового запроса')
+        parser.add_argument('--baseline-repeat', type=int, default=3,
+                            help='Повторов полного сканирования icontains, берётся лучший')
+        parser.add_argument('--limit', type=int, default=20)
+        add_report_arguments(parser)
+
+    def handle(self, *args, **options):
+        if not is_supported():
+            raise CommandError('Полнотекстовый индекс доступен только для SQLite')
+        with isolated_database(keepdb=options['keepdb']):
+            self.stderr.write('Заполнение корпуса (индекс обновляется триггерами при вставке)...')
+            started = time.perf_counter()
+            words, counts = seed_search_corpus(options['materials'], batch_size=options['batch_size'],
+                                               report=print_progress(self.stderr.write))
+            counts['seed_seconds'] = round(time.perf_counter() - started, 1)
+            results = benchmark_search(search_queries(words), repeat=options['repeat'],
+                                       baseline_repeat=options['baseline_repeat'], limit=options['limit'])
+
+        write_report(self, options['output'], dataset=counts, search=results)
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from courses.batching import DEFAULT_BATCH_SIZE
+from courses.benchmarks import add_report_arguments, benchmark_serializers, isolated_database, write_report
+from courses.seeding import DEFAULT_DATASET, seed_dataset, print_progress
+
+
+class Command(BaseCommand):
+    help = 'Микробенчмарк сериализации списков: ModelSerializer против values() с проверкой идентичности вывода'
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_DATASET.items():
+            parser.add_argument(f'--{name}', type=int, default=default)
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--rows', type=int, default=5000, help='Строк на каждый сериализатор')
+        parser.add_argument('--repeat', type=int, default=5, help='Повторов, берётся лучший')
+        add_report_arguments(parser)
+
+    def handle(self, *args, **options):
+        dataset = {name: options[name] for name in DEFAULT_DATASET}
+        with isolated_database(keepdb=options['keepdb']):
+            self.stderr.write('Заполнение данных...')
+            counts = seed_dataset(**dataset, batch_size=options['batch_size'], prefix='bench',
+                                  report=print_progress(self.stderr.write))
+            results = benchmark_serializers(rows=options['rows'], repeat=options['repeat'])
+
+        write_report(self, options['output'], dataset=counts, serializers=results)
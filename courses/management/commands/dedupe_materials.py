@@ -0,0 +1,80 @@
+import os
+import shutil
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from courses.blobs import rebuild_blob_refcounts, unreferenced_blobs
+from courses.course_tree import invalidate_course_trees
+from courses.models import Material, StoredBlob
+from courses.storage import BLOB_DIR, file_digest, material_storage
+
+
+class Command(BaseCommand):
+    help = ('Перенос файлов материалов в хранилище по содержимому: одинаковые файлы остаются в одном '
+            'экземпляре, материалы переключаются на общий блоб, счётчики ссылок пересчитываются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать, сколько места освободится')
+        parser.add_argument('--prune', action='store_true',
+                            help='Удалить блобы, на которые не ссылается ни один материал')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        dry_run = options['dry_run']
+        names = (Material.objects.exclude(file='').exclude(file__isnull=True)
+                 .exclude(file__startswith=BLOB_DIR + '/').values_list('file', flat=True).distinct())
+        seen = set()
+        files = moved = duplicates = missing = saved = 0
+        course_ids = set()
+        for name in names.iterator():
+            path = material_storage.path(name)
+            if not os.path.exists(path):
+                missing += 1
+                continue
+            files += 1
+            blob = material_storage.blob_name(file_digest(path), name)
+            target = material_storage.path(blob)
+            if blob in seen or os.path.exists(target):
+                duplicates += 1
+                saved += os.path.getsize(path)
+            seen.add(blob)
+            if dry_run:
+                continue
+
+            if not os.path.exists(target):
+                # Сначала появляется блоб, затем материалы переключаются на него, и только потом
+                # удаляется старый файл: прерванный запуск не оставляет материалов без файла
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                try:
+                    os.link(path, target)
+                except OSError:
+                    shutil.copyfile(path, target)
+            with transaction.atomic():
+                materials = Material.objects.filter(file=name)
+                course_ids.update(materials.values_list('module__course_id', flat=True))
+                materials.update(file=blob, updated_at=timezone.now())
+            os.remove(path)
+            moved += 1
+
+        if not dry_run:
+            blobs = rebuild_blob_refcounts()
+            invalidate_course_trees(course_ids)
+            self.stdout.write(f'Перенесено файлов: {moved}, дубликатов: {duplicates}, '
+                              f'освобождено: {saved / 1024 ** 2:.1f} МиБ, блобов: {blobs}')
+        else:
+            self.stdout.write(f'Файлов к переносу: {files}, '
+                              f'дубликатов: {duplicates}, освободится: {saved / 1024 ** 2:.1f} МиБ')
+        if missing:
+            self.stdout.write(self.style.WARNING(f'Файлов нет на диске: {missing}'))
+
+        if options['prune'] and not dry_run:
+            orphans = unreferenced_blobs()
+            for name in orphans:
+                material_storage.delete(name)
+            # После пересчёта у неиспользуемых блобов счётчик нулевой
+            StoredBlob.objects.filter(refcount=0).delete()
+            self.stdout.write(f'Удалено неиспользуемых блобов: {len(orphans)}')
+        self.stdout.write(f'Готово за {time.perf_counter() - started:.2f} с')
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.batching import DEFAULT_BATCH_SIZE
+from courses.cohorts import enroll_cohort
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Массовая запись пользователей на курс пачками (id или логины)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course', type=int, help='ID курса')
+        parser.add_argument('--user-ids', nargs='*', type=int, default=[])
+        parser.add_argument('--usernames', nargs='*', default=[])
+        parser.add_argument('--file', help='Файл с логинами, по одному на строку')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        course = Course.objects.filter(pk=options['course']).first()
+        if course is None:
+            raise CommandError(f'Курс {options["course"]} не найден')
+        users = [*options['user_ids'], *options['usernames']]
+        if options['file']:
+            with open(options['file'], encoding='utf-8') as fh:
+                users.extend(line.strip() for line in fh if line.strip())
+        if not users:
+            raise CommandError('Укажите --user-ids, --usernames или --file')
+
+        started = time.perf_counter()
+        result = enroll_cohort(
+            course, users, batch_size=options['batch_size'],
+            report=lambda created, already, invalid: self.stderr.write(
+                f'Записано: {created}, уже были записаны: {already}, не найдено: {invalid}'
+            ),
+        )
+        self.stdout.write(
+            f'Курс «{course.title}»: записано {result["created"]}, уже были записаны {result["already_enrolled"]}, '
+            f'не найдено {result["invalid"]} ({time.perf_counter() - started:.2f} с)'
+        )
+        if result['invalid_users']:
+            self.stdout.write('Не найдены: ' + ', '.join(map(str, result['invalid_users'])))
@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from courses.models import MaterialUpload
+from courses.uploads import discard_upload
+
+
+class Command(BaseCommand):
+    help = 'Удаление брошенных загрузок материалов по частям вместе с недописанными файлами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=48, help='Возраст загрузки в часах (по умолчанию 48)')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        uploads = MaterialUpload.objects.filter(created_at__lt=cutoff)
+        count = 0
+        for upload in uploads.iterator():
+            discard_upload(upload)
+            count += 1
+        self.stdout.write(f'Удалено загрузок: {count}')
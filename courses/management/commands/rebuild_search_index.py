@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.search import is_supported, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Полная перестройка полнотекстового индекса FTS5 по курсам, модулям и материалам'
+
+    def handle(self, *args, **options):
+        if not is_supported():
+            raise CommandError('Полнотекстовый индекс доступен только для SQLite')
+        started = time.perf_counter()
+        rows = rebuild_index()
+        self.stdout.write(f'Строк в индексе: {rows} ({time.perf_counter() - started:.2f} с)')
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from courses.recommender import DEFAULT_CHUNK_SIZE, recommender
+
+
+class Command(BaseCommand):
+    help = 'Перестроение матрицы профилей курсов и пересчёт рекомендаций для всех опросов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        recommender.invalidate()
+        recommender.ensure_current()
+        self.stdout.write(f'Матрица {recommender.matrix.shape} построена за {time.perf_counter() - started:.2f} с')
+        started = time.perf_counter()
+        updated = recommender.rescore(chunk_size=options['chunk_size'])
+        self.stdout.write(f'Обновлено опросов: {updated} за {time.perf_counter() - started:.2f} с')
@@ -0,0 +1,22 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from courses.analytics import DEFAULT_CHUNK_SIZE, rebuild_stats, stats_report
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт распределений ответов и гистограмм баллов по опросам (NumPy/pandas)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--survey-type', help='Вывести отчёт только по одному типу опроса')
+        parser.add_argument('--no-rebuild', action='store_true', help='Только вывести предрасчитанные данные')
+
+    def handle(self, *args, **options):
+        if not options['no_rebuild']:
+            started = time.perf_counter()
+            totals = rebuild_stats(chunk_size=options['chunk_size'])
+            self.stderr.write(f'Пересчитано {len(totals)} агрегатов за {time.perf_counter() - started:.2f} с')
+        self.stdout.write(json.dumps(stats_report(options['survey_type']), ensure_ascii=False, indent=2))
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .routers import replica_aliases, routing
+
+logger = logging.getLogger('courses.queries')
+
+_IN_LIST_RE = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+
+
+def fingerprint(sql):
+    # Одинаковые запросы с разными параметрами дают один отпечаток
+    normalized = _STRING_RE.sub('?', sql)
+    normalized = _IN_LIST_RE.sub('(...)', normalized)
+    normalized = _NUMBER_RE.sub('?', normalized)
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self.samples = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            key = fingerprint(sql)
+            self.fingerprints[key] += 1
+            self.samples.setdefault(key, sql)
+
+    @property
+    def duplicates(self):
+        return {key: count for key, count in self.fingerprints.items() if count > 1}
+
+    @property
+    def duration_ms(self):
+        return round(self.duration * 1000, 2)
+
+
+@contextmanager
+def capture_queries():
+    stats = QueryStats()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        yield stats
+
+
+class QueryBudgetMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # В ASGI цепочка остаётся асинхронной: синхронная прослойка перевела бы все представления в поток
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with capture_queries() as stats:
+            response = self.get_response(request)
+        self.report(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        # Соединения с базой привязаны к потоку, а асинхронный ORM выполняет запросы в потоке запроса
+        # (thread_sensitive) — обёртки ставятся и снимаются там же
+        stack = ExitStack()
+        stats = await sync_to_async(self._enter_capture)(stack)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self.report(request, response, stats)
+        return response
+
+    @staticmethod
+    def _enter_capture(stack):
+        return stack.enter_context(capture_queries())
+
+    def report(self, request, response, stats):
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else None
+        duplicates = stats.duplicates
+
+        if getattr(settings, 'QUERY_STATS_HEADERS', settings.DEBUG):
+            response['X-DB-Query-Count'] = str(stats.count)
+            response['X-DB-Query-Time-Ms'] = str(stats.duration_ms)
+            response['X-DB-Duplicate-Queries'] = ','.join(f'{key}:{count}' for key, count in duplicates.items())
+        else:
+            logger.info(json.dumps({
+                'event': 'db_queries',
+                'method': request.method,
+                'path': request.path,
+                'view': view_name,
+                'status': response.status_code,
+                'queries': stats.count,
+                'db_time_ms': stats.duration_ms,
+                'duplicates': duplicates,
+            }, ensure_ascii=False))
+
+        budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        budget = budgets.get(view_name, getattr(settings, 'QUERY_BUDGET_DEFAULT', None))
+        if budget is not None and stats.count > budget:
+            logger.warning(json.dumps({
+                'event': 'db_query_budget_exceeded',
+                'method': request.method,
+                'path': request.path,
+                'view': view_name,
+                'queries': stats.count,
+                'budget': budget,
+                'db_time_ms': stats.duration_ms,
+                'duplicates': {stats.samples[key]: count for key, count in duplicates.items()},
+            }, ensure_ascii=False))
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Безопасные запросы читают с реплик, остальные — с основной базы. После записи ответ ставит
+    cookie на REPLICA_STICKY_SECONDS: следующие запросы этого клиента читают с основной базы
+    и видят свои изменения, пока реплика догоняет.
+    """
+    sync_capable = True
+    async_capable = True
+    cookie_name = 'db_primary'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with routing(self.reads_from_replica(request)) as state:
+            response = self.get_response(request)
+        return self.stick(response, state)
+
+    async def __acall__(self, request):
+        with routing(self.reads_from_replica(request)) as state:
+            response = await self.get_response(request)
+        return self.stick(response, state)
+
+    def reads_from_replica(self, request):
+        return (request.method in ('GET', 'HEAD', 'OPTIONS') and self.cookie_name not in request.COOKIES
+                and bool(replica_aliases()))
+
+    def stick(self, response, state):
+        if state.wrote and response.status_code < 500:
+            response.set_cookie(self.cookie_name, '1', max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 10),
+                                httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogCourse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Название')),
+                ('icon', models.CharField(default='question.png', max_length=255, verbose_name='Иконка')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('position', models.PositiveIntegerField(default=0, verbose_name='Порядок')),
+            ],
+            options={
+                'verbose_name': 'Курс каталога',
+                'verbose_name_plural': 'Каталог курсов',
+                'ordering': ['position', 'id'],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:21
+
+import datetime
+
+from django.db import migrations
+
+# Каталог, который раньше был зашит в courses.views.api_courses
+CATALOG = [
+    ('Backend', '2920/2920346.png', datetime.date(2025, 4, 15)),
+    ('Frontend', '1055/1055681.png', datetime.date(2025, 4, 20)),
+    ('Data Science', '2920/2920352.png', datetime.date(2025, 4, 25)),
+    ('DevOps', '1055/1055680.png', datetime.date(2025, 4, 30)),
+    ('AI/ML', '2920/2920348.png', datetime.date(2025, 5, 5)),
+    ('Cybersecurity', '5968/5968852.png', datetime.date(2025, 5, 10)),
+    ('Mobile Development', '5968/5968896.png', datetime.date(2025, 5, 15)),
+    ('Cloud Computing', 'question.png', datetime.date(2025, 5, 20)),
+    ('Game Development', '5968/5968880.png', datetime.date(2025, 5, 25)),
+    ('UI/UX Design', '5968/5968908.png', datetime.date(2025, 5, 30)),
+    ('Blockchain', '5968/5968864.png', datetime.date(2025, 6, 5)),
+    ('Python Basics', '5968/5968876.png', datetime.date(2025, 6, 10)),
+    ('Java Programming', '5968/5968844.png', datetime.date(2025, 6, 15)),
+    ('Web Development', '5968/5968912.png', datetime.date(2025, 6, 20)),
+    ('Database Design', '5968/5968820.png', datetime.date(2025, 6, 25)),
+]
+
+
+def seed_catalog(apps, schema_editor):
+    CatalogCourse = apps.get_model('courses', 'CatalogCourse')
+    CatalogCourse.objects.bulk_create(
+        [CatalogCourse(name=name, icon=icon, date=date, position=position)
+         for position, (name, icon, date) in enumerate(CATALOG)],
+        ignore_conflicts=True,
+    )
+
+
+def unseed_catalog(apps, schema_editor):
+    CatalogCourse = apps.get_model('courses', 'CatalogCourse')
+    CatalogCourse.objects.filter(name__in=[name for name, _, _ in CATALOG]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_catalogcourse'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_catalog, unseed_catalog),
+    ]
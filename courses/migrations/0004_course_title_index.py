@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_seed_catalog'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='course',
+            name='title',
+            field=models.CharField(db_index=True, max_length=255, verbose_name='Название'),
+        ),
+    ]
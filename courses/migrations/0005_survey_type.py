@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_course_title_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='survey',
+            name='survey_type',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=50, verbose_name='Тип опроса'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_survey_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SurveyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('survey_type', models.CharField(max_length=50, verbose_name='Тип опроса')),
+                ('question', models.CharField(max_length=50, verbose_name='Вопрос')),
+                ('value', models.IntegerField(verbose_name='Значение')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество')),
+            ],
+            options={
+                'verbose_name': 'Статистика опросов',
+                'verbose_name_plural': 'Статистика опросов',
+                'unique_together': {('survey_type', 'question', 'value')},
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.4 on 2026-10-18 19:38
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+
+def fill_rollups(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Module = apps.get_model('courses', 'Module')
+    Enrollment = apps.get_model('courses', 'Enrollment')
+    UserProgress = apps.get_model('courses', 'UserProgress')
+    modules = Module.objects.filter(course=OuterRef('pk')).values('course').annotate(total=Count('id')).values('total')
+    Course.objects.update(module_count=Coalesce(Subquery(modules), Value(0)))
+    rows = UserProgress.objects.filter(user=OuterRef('user'), course=OuterRef('course')).values('user', 'course')
+    Enrollment.objects.update(
+        progress_points=Coalesce(Subquery(
+            rows.annotate(total=Sum(Least(Greatest('progress', Value(0)), Value(100)))).values('total')
+        ), Value(0)),
+        completed_modules=Coalesce(Subquery(
+            rows.annotate(total=Count('id', filter=Q(progress__gte=100))).values('total')
+        ), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_surveystat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='module_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество модулей'),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='completed_modules',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Завершено модулей'),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='progress_points',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сумма прогресса'),
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
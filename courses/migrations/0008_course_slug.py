@@ -0,0 +1,66 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:05
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+# Копия courses.slugs на момент миграции: правки живого кода не должны менять уже применённую миграцию
+SLUG_BASE_LENGTH = 245
+LOOKUP_CHUNK_SIZE = 500
+
+
+def slugify_title(title):
+    return slugify(title, allow_unicode=True)[:SLUG_BASE_LENGTH].strip('-') or 'course'
+
+
+def unique_slugs(queryset, titles):
+    bases = [slugify_title(title) for title in titles]
+    counts = Counter(bases)
+    distinct = list(counts)
+    taken = set()
+    for start in range(0, len(distinct), LOOKUP_CHUNK_SIZE):
+        chunk = distinct[start:start + LOOKUP_CHUNK_SIZE]
+        taken.update(queryset.filter(slug__in=chunk).values_list('slug', flat=True))
+    for base in distinct:
+        if base in taken or counts[base] > 1:
+            taken.update(queryset.filter(slug__startswith=f'{base}-').values_list('slug', flat=True))
+
+    slugs = []
+    for base in bases:
+        slug, suffix = base, 2
+        while slug in taken:
+            slug, suffix = f'{base}-{suffix}', suffix + 1
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def fill_slugs(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    courses = list(Course.objects.filter(slug__isnull=True).order_by('id').only('id', 'title'))
+    for course, slug in zip(courses, unique_slugs(Course.objects.exclude(slug__isnull=True),
+                                                  [course.title for course in courses])):
+        course.slug = slug
+    Course.objects.bulk_update(courses, ['slug'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_enrollment_progress_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='slug',
+            field=models.SlugField(allow_unicode=True, blank=True, max_length=255, null=True, verbose_name='Слаг'),
+        ),
+        migrations.RunPython(fill_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='course',
+            name='slug',
+            field=models.SlugField(allow_unicode=True, blank=True, max_length=255, unique=True, verbose_name='Слаг'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.1.4 on 2026-10-18 21:10
+
+from django.db import migrations
+
+# SQL зафиксирован в миграции: последующие правки courses.search не должны менять уже применённую схему
+CREATE_STATEMENTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS courses_search USING fts5(kind UNINDEXED, title, body, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+
+    "CREATE TRIGGER IF NOT EXISTS courses_course_search_insert AFTER INSERT ON courses_course BEGIN "
+    "INSERT INTO courses_search(rowid, kind, title, body) "
+    "VALUES (NEW.id * 4 + 1, 'course', NEW.title, COALESCE(NEW.description, '')); END",
+    "CREATE TRIGGER IF NOT EXISTS courses_course_search_update AFTER UPDATE OF title, description ON courses_course "
+    "BEGIN DELETE FROM courses_search WHERE rowid = OLD.id * 4 + 1; "
+    "INSERT INTO courses_search(rowid, kind, title, body) "
+    "VALUES (NEW.id * 4 + 1, 'course', NEW.title, COALESCE(NEW.description, '')); END",
+    "CREATE TRIGGER IF NOT EXISTS courses_course_search_delete AFTER DELETE ON courses_course BEGIN "
+    "DELETE FROM courses_search WHERE rowid = OLD.id * 4 + 1; END",
+
+    "CREATE TRIGGER IF NOT EXISTS courses_module_search_insert AFTER INSERT ON courses_module BEGIN "
+    "INSERT INTO courses_search(rowid, kind, title, body) "
+    "VALUES (NEW.id * 4 + 2, 'module', NEW.title, COALESCE(NEW.description, '')); END",
+    "CREATE TRIGGER IF NOT EXISTS courses_module_search_update AFTER UPDATE OF title, description ON courses_module "
+    "BEGIN DELETE FROM courses_search WHERE rowid = OLD.id * 4 + 2; "
+    "INSERT INTO courses_search(rowid, kind, title, body) "
+    "VALUES (NEW.id * 4 + 2, 'module', NEW.title, COALESCE(NEW.description, '')); END",
+    "CREATE TRIGGER IF NOT EXISTS courses_module_search_delete AFTER DELETE ON courses_module BEGIN "
+    "DELETE FROM courses_search WHERE rowid = OLD.id * 4 + 2; END",
+
+    "CREATE TRIGGER IF NOT EXISTS courses_material_search_insert AFTER INSERT ON courses_material BEGIN "
+    "INSERT INTO courses_search(rowid, kind, title, body) VALUES (NEW.id * 4 + 3, 'material', NEW.title, "
+    "CASE WHEN NEW.type = 'text' THEN COALESCE(NEW.content, '') ELSE '' END); END",
+    "CREATE TRIGGER IF NOT EXISTS courses_material_search_update AFTER UPDATE OF title, type, content "
+    "ON courses_material BEGIN DELETE FROM courses_search WHERE rowid = OLD.id * 4 + 3; "
+    "INSERT INTO courses_search(rowid, kind, title, body) VALUES (NEW.id * 4 + 3, 'material', NEW.title, "
+    "CASE WHEN NEW.type = 'text' THEN COALESCE(NEW.content, '') ELSE '' END); END",
+    "CREATE TRIGGER IF NOT EXISTS courses_material_search_delete AFTER DELETE ON courses_material BEGIN "
+    "DELETE FROM courses_search WHERE rowid = OLD.id * 4 + 3; END",
+]
+
+FILL_STATEMENTS = [
+    "INSERT INTO courses_search(rowid, kind, title, body) "
+    "SELECT id * 4 + 1, 'course', title, COALESCE(description, '') FROM courses_course",
+    "INSERT INTO courses_search(rowid, kind, title, body) "
+    "SELECT id * 4 + 2, 'module', title, COALESCE(description, '') FROM courses_module",
+    "INSERT INTO courses_search(rowid, kind, title, body) SELECT id * 4 + 3, 'material', title, "
+    "CASE WHEN type = 'text' THEN COALESCE(content, '') ELSE '' END FROM courses_material",
+]
+
+DROP_STATEMENTS = [
+    f'DROP TRIGGER IF EXISTS courses_{table}_search_{action}'
+    for table in ('course', 'module', 'material') for action in ('insert', 'update', 'delete')
+] + ['DROP TABLE IF EXISTS courses_search']
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 есть только в SQLite; на других базах поиск работает через search_fallback
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in CREATE_STATEMENTS + FILL_STATEMENTS:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_STATEMENTS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_stored_blob'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,29 +1,62 @@
+import copy
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+from .slugs import SLUG_MAX_LENGTH, unique_slugs
+from .storage import get_material_storage
+
+
+class LoadedValuesMixin:
+    # Значения полей на момент загрузки из базы: сигналы по ним считают разницу и находят
+    # прежний курс, если запись перенесли
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # JSON копируется: правка словаря на месте не должна менять и «прежнее» значение
+        instance._loaded_values = {
+            name: copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+            for name, value in zip(field_names, values) if value is not models.DEFERRED
+        }
+        return instance
+
 
 class Course(models.Model):
-    title = models.CharField(max_length=255, verbose_name="Название")
+    title = models.CharField(max_length=255, db_index=True, verbose_name="Название")
+    slug = models.SlugField(max_length=SLUG_MAX_LENGTH, unique=True, allow_unicode=True, blank=True,
+                            verbose_name="Слаг")
     description = models.TextField(verbose_name="Описание")
     start_date = models.DateTimeField(default=timezone.now, verbose_name="Дата начала")
     end_date = models.DateTimeField(verbose_name="Дата окончания")
     instructor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='instructed_courses',
                                    verbose_name="Инструктор")
+    module_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Количество модулей")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Дата изменения")
 
     class Meta:
         verbose_name = "Курс"
         verbose_name_plural = "Курсы"
         permissions = [("manage_all_courses", "Управление всеми курсами")]
 
+    def save(self, *args, **kwargs):
+        # Слаг выдаётся один раз и не меняется при переименовании, чтобы ссылки на курс не ломались
+        if not self.slug:
+            self.slug = unique_slugs(Course.objects.all(), [self.title])[0]
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'slug'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.title
 
 
-class Module(models.Model):
+class Module(LoadedValuesMixin, models.Model):
     title = models.CharField(max_length=255, verbose_name="Название")
     description = models.TextField(verbose_name="Описание")
     course = models.ForeignKey(Course, related_name='modules', on_delete=models.CASCADE, verbose_name="Курс")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Дата изменения")
 
     class Meta:
         verbose_name = "Модуль"
@@ -33,7 +66,7 @@ class Module(models.Model):
         return self.title
 
 
-class Material(models.Model):
+class Material(LoadedValuesMixin, models.Model):
     TYPE_CHOICES = [
         ('video', 'Видео'),
         ('text', 'Текст'),
@@ -42,8 +75,10 @@ class Material(models.Model):
     title = models.CharField(max_length=255, verbose_name="Название")
     type = models.CharField(max_length=10, choices=TYPE_CHOICES, verbose_name="Тип")
     content = models.TextField(blank=True, null=True, verbose_name="Содержимое")
-    file = models.FileField(upload_to='materials/', blank=True, null=True, verbose_name="Файл")
+    file = models.FileField(upload_to='materials/', storage=get_material_storage, blank=True, null=True,
+                            verbose_name="Файл")
     module = models.ForeignKey(Module, related_name='materials', on_delete=models.CASCADE, verbose_name="Модуль")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Дата изменения")
 
     class Meta:
         verbose_name = "Материал"
@@ -53,6 +88,58 @@ class Material(models.Model):
         return self.title
 
 
+class StoredBlob(models.Model):
+    # Файл материала в хранилище по содержимому и число материалов, которые на него ссылаются
+    name = models.CharField(max_length=255, unique=True, verbose_name="Путь")
+    size = models.PositiveBigIntegerField(verbose_name="Размер")
+    refcount = models.PositiveIntegerField(default=0, verbose_name="Число ссылок")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    class Meta:
+        verbose_name = "Файл в хранилище"
+        verbose_name_plural = "Файлы в хранилище"
+
+    def __str__(self):
+        return f'{self.name} ({self.refcount})'
+
+
+class MaterialUpload(models.Model):
+    # Незавершённая загрузка файла материала по частям; запись удаляется после finalize
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='material_uploads',
+                             verbose_name="Пользователь")
+    filename = models.CharField(max_length=255, verbose_name="Имя файла")
+    size = models.PositiveBigIntegerField(verbose_name="Размер")
+    chunk_size = models.PositiveIntegerField(verbose_name="Размер части")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Дата создания")
+
+    class Meta:
+        verbose_name = "Загрузка материала"
+        verbose_name_plural = "Загрузки материалов"
+
+    @property
+    def chunk_count(self):
+        return -(-self.size // self.chunk_size)
+
+    def chunk_length(self, index):
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    def __str__(self):
+        return f'{self.filename} ({self.size} байт)'
+
+
+class MaterialUploadChunk(models.Model):
+    upload = models.ForeignKey(MaterialUpload, on_delete=models.CASCADE, related_name='chunks',
+                               verbose_name="Загрузка")
+    index = models.PositiveIntegerField(verbose_name="Номер части")
+    sha256 = models.CharField(max_length=64, verbose_name="SHA-256")
+
+    class Meta:
+        unique_together = ('upload', 'index')
+        verbose_name = "Часть загрузки"
+        verbose_name_plural = "Части загрузок"
+
+
 class Enrollment(models.Model):
     STATUS_CHOICES = [
         ('active', 'Активен'),
@@ -63,6 +150,9 @@ class Enrollment(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='enrollments', verbose_name="Курс")
     enrollment_date = models.DateTimeField(auto_now_add=True, verbose_name="Дата записи")
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='active', verbose_name="Статус")
+    # Сводка по UserProgress, поддерживается сигналами: сумма прогресса по модулям и число завершённых модулей
+    progress_points = models.PositiveIntegerField(default=0, editable=False, verbose_name="Сумма прогресса")
+    completed_modules = models.PositiveIntegerField(default=0, editable=False, verbose_name="Завершено модулей")
 
     class Meta:
         unique_together = ('user', 'course')
@@ -70,11 +160,21 @@ class Enrollment(models.Model):
         verbose_name_plural = "Записи на курсы"
         permissions = [("enroll_in_course", "Запись на курс")]
 
+    @staticmethod
+    def percent(progress_points, module_count):
+        if not module_count:
+            return 0
+        return min(100, progress_points // module_count)
+
+    @property
+    def progress_percent(self):
+        return self.percent(self.progress_points, self.course.module_count)
+
     def __str__(self):
         return f'{self.user.username} enrolled in {self.course.title}'
 
 
-class UserProgress(models.Model):
+class UserProgress(LoadedValuesMixin, models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='progress', verbose_name="Пользователь")
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='progress', verbose_name="Курс")
     module = models.ForeignKey(Module, on_delete=models.CASCADE, related_name='progress', verbose_name="Модуль")
@@ -105,8 +205,9 @@ class FavoriteCourse(models.Model):
         return f'{self.user.username} - {self.course_name}'
 
 
-class Survey(models.Model):
+class Survey(LoadedValuesMixin, models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='surveys', verbose_name="Пользователь")
+    survey_type = models.CharField(max_length=50, blank=True, default='', db_index=True, verbose_name="Тип опроса")
     answers = models.JSONField(verbose_name="Ответы")  # Храним ответы в JSON
     recommended_course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True,
                                            verbose_name="Рекомендуемый курс")
@@ -118,3 +219,34 @@ class Survey(models.Model):
 
     def __str__(self):
         return f'{self.user.username} - Survey {self.created_at}'
+
+
+class CatalogCourse(models.Model):
+    name = models.CharField(max_length=255, unique=True, verbose_name="Название")
+    icon = models.CharField(max_length=255, default='question.png', verbose_name="Иконка")
+    date = models.DateField(verbose_name="Дата")
+    position = models.PositiveIntegerField(default=0, verbose_name="Порядок")
+
+    class Meta:
+        ordering = ['position', 'id']
+        verbose_name = "Курс каталога"
+        verbose_name_plural = "Каталог курсов"
+
+    def __str__(self):
+        return self.name
+
+
+class SurveyStat(models.Model):
+    # Предрасчитанные распределения: ответы по вопросам и гистограмма баллов (question = 'score')
+    survey_type = models.CharField(max_length=50, verbose_name="Тип опроса")
+    question = models.CharField(max_length=50, verbose_name="Вопрос")
+    value = models.IntegerField(verbose_name="Значение")
+    count = models.PositiveIntegerField(default=0, verbose_name="Количество")
+
+    class Meta:
+        unique_together = ('survey_type', 'question', 'value')
+        verbose_name = "Статистика опросов"
+        verbose_name_plural = "Статистика опросов"
+
+    def __str__(self):
+        return f'{self.survey_type} {self.question}={self.value}: {self.count}'
@@ -0,0 +1,112 @@
+from django.utils.http import urlencode
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+KEYSET_PAGE_SIZE = 50
+KEYSET_MAX_PAGE_SIZE = 200
+
+
+def _parse_int(value, default=None):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class KeysetPage:
+    def __init__(self, object_list, params, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.params = params
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def _query(self, **cursor):
+        params = {key: value for key, value in self.params.items() if key not in ('after', 'before')}
+        params.update(cursor)
+        return '?' + urlencode(params)
+
+    @property
+    def next_query(self):
+        return self._query(after=self.next_cursor) if self.has_next else ''
+
+    @property
+    def previous_query(self):
+        return self._query(before=self.previous_cursor) if self.has_previous else ''
+
+
+def keyset_paginate(queryset, params, per_page=KEYSET_PAGE_SIZE):
+    # Страницы строятся по условию на первичный ключ вместо OFFSET,
+    # поэтому далёкие страницы стоят столько же, сколько первая
+    per_page = min(max(_parse_int(params.get('per_page'), per_page), 1), KEYSET_MAX_PAGE_SIZE)
+    after = _parse_int(params.get('after'))
+    before = _parse_int(params.get('before'))
+    params = {key: value for key, value in params.items() if value not in (None, '')}
+
+    if before is not None:
+        rows = list(queryset.filter(pk__lt=before).order_by('-pk')[:per_page + 1])
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        next_cursor = rows[-1].pk if rows else None
+        previous_cursor = rows[0].pk if rows and has_previous else None
+    else:
+        if after is not None:
+            queryset = queryset.filter(pk__gt=after)
+        rows = list(queryset.order_by('pk')[:per_page + 1])
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        next_cursor = rows[-1].pk if rows and has_next else None
+        previous_cursor = rows[0].pk if rows and after is not None else None
+    return KeysetPage(rows, params, next_cursor=next_cursor, previous_cursor=previous_cursor)
+
+
+class KeysetCursorPagination(CursorPagination):
+    # Курсор по индексированному уникальному столбцу: без COUNT(*) и без OFFSET
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', self.ordering)
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
+
+
+# По умолчанию постраничная пагинация; курсорный режим включается параметром
+# ?pagination=cursor или атрибутом pagination_mode = 'cursor' у представления
+class SwitchablePagination:
+    mode_query_param = 'pagination'
+    page_number_class = PageNumberPagination
+    cursor_class = KeysetCursorPagination
+
+    def __init__(self):
+        self.delegate = self.page_number_class()
+
+    def get_mode(self, request, view):
+        mode = request.query_params.get(self.mode_query_param)
+        if mode in ('page', 'cursor'):
+            return mode
+        if self.cursor_class.cursor_query_param in request.query_params:
+            return 'cursor'
+        return getattr(view, 'pagination_mode', 'page')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.get_mode(request, view) == 'cursor':
+            self.delegate = self.cursor_class()
+        return self.delegate.paginate_queryset(queryset, request, view)
+
+    def __getattr__(self, name):
+        return getattr(self.delegate, name)
@@ -0,0 +1,119 @@
+from django.db import connections, router, transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from .models import Course, Enrollment, Module, UserProgress
+
+COMPLETE = 100
+ROLLUP_KEYS = ('user_id', 'course_id')
+MAX_BULK_ITEMS = 500
+
+
+def loaded_state(instance):
+    # (пользователь, курс) на момент загрузки: если строку перенесли, пересчитывается и прежняя запись
+    values = getattr(instance, '_loaded_values', {})
+    if not all(key in values for key in ROLLUP_KEYS):
+        return None
+    return tuple(values[key] for key in ROLLUP_KEYS)
+
+
+def current_state(instance):
+    return instance.user_id, instance.course_id
+
+
+def refresh_rollups(pairs):
+    # Сводка пересчитывается из строк UserProgress, а не сдвигается на разницу с прочитанным в память
+    # значением: два параллельных сохранения одной строки применили бы дельты к одному старому значению,
+    # и сводка разошлась бы навсегда. Блокировка записи на курс выстраивает пересчёты в очередь —
+    # следующий видит закоммиченные строки предыдущего (SQLite и так пишет по одному)
+    condition = Q(pk__in=[])
+    for user_id, course_id in set(pairs):
+        condition |= Q(user_id=user_id, course_id=course_id)
+    using = router.db_for_write(Enrollment)
+    enrollments = Enrollment.objects.using(using).filter(condition)
+    # Без точки сохранения: внутри пакетной записи пересчёт — часть её транзакции
+    with transaction.atomic(using=using, savepoint=False):
+        if connections[using].features.has_select_for_update:
+            enrollments = Enrollment.objects.using(using).filter(
+                pk__in=list(enrollments.select_for_update().values_list('pk', flat=True))
+            )
+        return rebuild_rollups(enrollments)
+
+
+def existing_progress(user, module_ids):
+    return {
+        (course_id, module_id): value
+        for course_id, module_id, value in UserProgress.objects.select_for_update().filter(
+            user=user, module_id__in=module_ids
+        ).values_list('course_id', 'module_id', 'progress')
+    }
+
+
+def upsert_progress(user, items):
+    # Пакетная запись: один INSERT новых строк и один условный UPDATE; прогресс модуля только растёт.
+    # items — провалидированные dict(index, course, module, progress), результаты в том же порядке
+    module_courses = dict(Module.objects.filter(pk__in={item['module'] for item in items})
+                          .values_list('id', 'course_id'))
+    results = []
+    wanted = {}
+    for item in items:
+        result = {'index': item['index'], 'course': item['course'], 'module': item['module']}
+        if module_courses.get(item['module']) != item['course']:
+            result.update(status='error', errors={'module': ['Модуль не найден в указанном курсе.']})
+        else:
+            key = (item['course'], item['module'])
+            wanted[key] = max(wanted.get(key, 0), item['progress'])
+        results.append(result)
+
+    with transaction.atomic():
+        existing = existing_progress(user, [module_id for _, module_id in wanted])
+        writes = {key: value for key, value in wanted.items() if key not in existing or value > existing[key]}
+        if writes:
+            # Снимок existing мог устареть из-за параллельного пакета: новые строки вставляются без перезаписи,
+            # а рост прогресса проверяется в самом UPDATE (progress < нового значения) — прогресс не уменьшится
+            UserProgress.objects.bulk_create(
+                [UserProgress(user=user, course_id=course_id, module_id=module_id, progress=value)
+                 for (course_id, module_id), value in writes.items() if (course_id, module_id) not in existing],
+                ignore_conflicts=True,
+            )
+            raised = Q(pk__in=[])
+            for (course_id, module_id), value in writes.items():
+                raised |= Q(course_id=course_id, module_id=module_id, progress__lt=value)
+            UserProgress.objects.filter(raised, user=user).update(
+                progress=Case(*(When(course_id=course_id, module_id=module_id, then=Value(value))
+                                for (course_id, module_id), value in writes.items()),
+                              default=F('progress'), output_field=IntegerField()),
+                last_updated=timezone.now(),
+            )
+            # bulk_create и update не вызывают сигналы: сводка пересчитывается из строк, как в refresh_rollups
+            refresh_rollups({(user.id, course_id) for course_id, _ in writes})
+
+    for result in results:
+        if 'status' in result:
+            continue
+        key = (result['course'], result['module'])
+        if key not in writes:
+            result['status'] = 'unchanged'
+        else:
+            result['status'] = 'updated' if key in existing else 'created'
+        result['progress'] = max(wanted[key], existing.get(key, 0))
+    return results
+
+
+def refresh_module_counts(course_ids=None):
+    counts = Module.objects.filter(course=OuterRef('pk')).values('course').annotate(total=Count('id')).values('total')
+    courses = Course.objects.all() if course_ids is None else Course.objects.filter(pk__in=course_ids)
+    return courses.update(module_count=Coalesce(Subquery(counts), Value(0)))
+
+
+def rebuild_rollups(enrollments=None):
+    # Полный пересчёт для данных, записанных в обход сигналов (bulk_create, сидирование, миграции)
+    rows = UserProgress.objects.filter(user=OuterRef('user'), course=OuterRef('course')).values('user', 'course')
+    points = rows.annotate(total=Sum(Least(Greatest('progress', Value(0)), Value(COMPLETE)))).values('total')
+    completed = rows.annotate(total=Count('id', filter=Q(progress__gte=COMPLETE))).values('total')
+    enrollments = enrollments if enrollments is not None else Enrollment.objects.all()
+    return enrollments.update(
+        progress_points=Coalesce(Subquery(points), Value(0)),
+        completed_modules=Coalesce(Subquery(completed), Value(0)),
+    )
@@ -0,0 +1,59 @@
+import functools
+import json
+from pathlib import Path
+
+QUIZZES_PATH = Path(__file__).resolve().parent / 'data' / 'quizzes.json'
+
+
+class CompiledQuiz:
+    # Вопросы для шаблона и ключ ответов в виде множеств, собранные один раз на процесс
+    def __init__(self, questions):
+        self.questions = tuple(
+            {
+                'id': q['id'],
+                'text': q['text'],
+                'options': q['options'],
+                'multiple': len(q['correct']) > 1,
+                'field': f'question_{q["id"]}',
+            }
+            for q in questions
+        )
+        self.answer_key = tuple(frozenset(q['correct']) for q in questions)
+        self.correct_text = tuple(
+            ', '.join(q['options'][key] for key in sorted(q['correct'])) for q in questions
+        )
+
+    def __len__(self):
+        return len(self.questions)
+
+    def read_answers(self, data):
+        return [frozenset(data.getlist(q['field'])) for q in self.questions]
+
+    def grade(self, answers):
+        marks = [answer == key for answer, key in zip(answers, self.answer_key)]
+        results = [
+            {
+                'text': q['text'],
+                'user_answer': ','.join(sorted(answer)) or 'Не отвечено',
+                'user_answer_text': ', '.join(q['options'].get(key, key) for key in sorted(answer)) or 'Не отвечено',
+                'correct_answer': ','.join(sorted(key)),
+                'correct_answer_text': correct_text,
+                'is_correct': mark,
+                'options': q['options'],
+            }
+            for q, answer, key, correct_text, mark in zip(
+                self.questions, answers, self.answer_key, self.correct_text, marks
+            )
+        ]
+        return sum(marks), results
+
+
+@functools.lru_cache(maxsize=None)
+def load_quizzes(path=QUIZZES_PATH):
+    with open(path, encoding='utf-8') as fh:
+        data = json.load(fh)
+    return {course_name: CompiledQuiz(questions) for course_name, questions in data.items()}
+
+
+def get_quiz(course_name):
+    return load_quizzes().get(course_name)
@@ -0,0 +1,243 @@
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+
+from .conditional import get_deletions_version
+from .models import Course, Survey
+from .surveys import load_surveys
+
+# Транзакция может закоммитить курс позже, чем проставлен его updated_at
+SYNC_OVERLAP = timedelta(seconds=5)
+# Не чаще раза в секунду на процесс: столько в худшем случае видны чужие изменения курсов
+SYNC_INTERVAL = 1.0
+DEFAULT_TOP_K = 5
+DEFAULT_CHUNK_SIZE = 5000
+
+
+class AnswerSpace:
+    # Каждое измерение — пара (тип опроса, вопрос); ответ нормируется на максимальный балл вопроса
+    def __init__(self, surveys):
+        self.index = {}
+        scales = []
+        for survey_type, survey in surveys.items():
+            for question_id in survey.question_ids:
+                self.index[(survey_type, question_id)] = len(scales)
+                scales.append(max(survey.allowed_values[question_id]) or 1)
+        self.scales = np.asarray(scales, dtype=float)
+        self.size = len(scales)
+        self.type_columns = {
+            survey_type: [self.index[(survey_type, q)] for q in survey.question_ids]
+            for survey_type, survey in surveys.items()
+        }
+        self.course_types = {}
+        for survey_type, survey in surveys.items():
+            self.course_types.setdefault(survey.course_title, []).append(survey_type)
+
+    def vectorize_many(self, rows):
+        matrix = np.zeros((len(rows), self.size))
+        positions, columns, values = [], [], []
+        for position, (survey_type, answers) in enumerate(rows):
+            if not isinstance(answers, dict):
+                continue
+            for question_id, value in answers.items():
+                column = self.index.get((survey_type, question_id))
+                if column is None:
+                    continue
+                try:
+                    values.append(float(value))
+                except (TypeError, ValueError):
+                    continue
+                positions.append(position)
+                columns.append(column)
+        if values:
+            matrix[positions, columns] = values
+        return matrix / self.scales
+
+    def vectorize(self, survey_type, answers):
+        return self.vectorize_many([(survey_type, answers)])[0]
+
+    def prior(self, title):
+        vector = np.zeros(self.size)
+        for survey_type in self.course_types.get(title, ()):
+            vector[self.type_columns[survey_type]] = 1.0
+        return vector
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class CourseRecommender:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._space = None
+        self.built = False
+        self.course_ids = np.empty(0, dtype=np.int64)
+        self.titles = []
+        self.matrix = np.empty((0, 0))
+        self.dirty = set()
+        # Отметки updated_at применённых курсов и версия счётчика удалений: по ним каждый процесс
+        # сам находит изменённые и удалённые курсы и пересчитывает только их строки
+        self.applied = {}
+        self.synced_at = None
+        self.deletions = None
+        self.synced_clock = 0.0
+
+    @property
+    def space(self):
+        if self._space is None:
+            self._space = AnswerSpace(load_surveys())
+        return self._space
+
+    def _profiles(self, courses):
+        # Профиль курса: «идеальный» ответ опроса, который на него ведёт,
+        # плюс средний вектор ответов пользователей, записанных на курс
+        space = self.space
+        positions = {course_id: position for position, (course_id, _) in enumerate(courses)}
+        sums = np.zeros((len(courses), space.size))
+        counts = np.zeros(len(courses))
+        rows = Survey.objects.filter(user__enrollments__course_id__in=list(positions)).values_list(
+            'user__enrollments__course_id', 'survey_type', 'answers'
+        )
+        batch = []
+        for row in rows.iterator(chunk_size=DEFAULT_CHUNK_SIZE):
+            batch.append(row)
+            if len(batch) >= DEFAULT_CHUNK_SIZE:
+                self._accumulate(batch, positions, sums, counts)
+                batch = []
+        if batch:
+            self._accumulate(batch, positions, sums, counts)
+        learned = sums / np.maximum(counts, 1)[:, None]
+        priors = np.array([space.prior(title) for _, title in courses]).reshape(len(courses), space.size)
+        return _normalize_rows(priors + learned)
+
+    def _accumulate(self, batch, positions, sums, counts):
+        vectors = self.space.vectorize_many([(survey_type, answers) for _, survey_type, answers in batch])
+        targets = np.array([positions[course_id] for course_id, _, _ in batch])
+        np.add.at(sums, targets, vectors)
+        np.add.at(counts, targets, 1)
+
+    def rebuild(self):
+        deletions = get_deletions_version(Course)
+        rows = list(Course.objects.order_by('id').values_list('id', 'title', 'updated_at'))
+        courses = [(course_id, title) for course_id, title, _ in rows]
+        self.matrix = self._profiles(courses)
+        self.course_ids = np.array([course_id for course_id, _ in courses], dtype=np.int64)
+        self.titles = [title for _, title in courses]
+        self.dirty = set()
+        self.applied = {course_id: updated_at for course_id, _, updated_at in rows}
+        self.synced_at = max(self.applied.values(), default=None)
+        self.deletions = deletions
+        self.synced_clock = time.monotonic()
+        self.built = True
+
+    def _sync(self):
+        # Изменения курсов из других процессов: по индексу updated_at с запасом SYNC_OVERLAP на транзакции,
+        # закоммиченные позже своей отметки времени; уже применённые версии повторно не считаются
+        self.synced_clock = time.monotonic()
+        courses = Course.objects.all()
+        if self.synced_at is not None:
+            courses = courses.filter(updated_at__gte=self.synced_at - SYNC_OVERLAP)
+        for course_id, updated_at in courses.values_list('id', 'updated_at'):
+            if self.applied.get(course_id) != updated_at:
+                self.dirty.add(course_id)
+        deletions = get_deletions_version(Course)
+        if deletions != self.deletions:
+            self.deletions = deletions
+            self.dirty.update(set(self.applied) - set(Course.objects.values_list('id', flat=True)))
+
+    def _apply_dirty(self):
+        dirty, self.dirty = self.dirty, set()
+        rows = list(Course.objects.filter(id__in=dirty).order_by('id').values_list('id', 'title', 'updated_at'))
+        courses = [(course_id, title) for course_id, title, _ in rows]
+        keep = ~np.isin(self.course_ids, list(dirty))
+        profiles = self._profiles(courses)
+        self.matrix = np.vstack([self.matrix[keep].reshape(-1, self.space.size), profiles])
+        self.course_ids = np.concatenate([self.course_ids[keep], [c for c, _ in courses]]).astype(np.int64)
+        self.titles = [t for t, k in zip(self.titles, keep) if k] + [title for _, title in courses]
+        for course_id in dirty:
+            self.applied.pop(course_id, None)
+        self.applied.update((course_id, updated_at) for course_id, _, updated_at in rows)
+        stamps = [updated_at for *_, updated_at in rows]
+        if self.synced_at is not None:
+            stamps.append(self.synced_at)
+        self.synced_at = max(stamps, default=None)
+
+    def ensure_current(self):
+        # Полная сборка — один раз на процесс (или по invalidate из команды recommend_courses);
+        # дальше на пути запроса пересчитываются только изменённые курсы
+        with self._lock:
+            if not self.built:
+                self.rebuild()
+                return
+            if time.monotonic() - self.synced_clock >= SYNC_INTERVAL:
+                self._sync()
+            if self.dirty:
+                self._apply_dirty()
+
+    def mark_dirty(self, course_id):
+        # Записи на курс меняют выученный профиль: строка пересчитывается в этом процессе
+        with self._lock:
+            self.dirty.add(course_id)
+
+    def course_changed(self, course_id):
+        # Здесь — сразу; другие процессы найдут курс по updated_at или счётчику удалений
+        self.mark_dirty(course_id)
+
+    def invalidate(self):
+        with self._lock:
+            self.built = False
+
+    def top_k(self, survey_type, answers, k=DEFAULT_TOP_K):
+        self.ensure_current()
+        if not len(self.course_ids):
+            return []
+        vector = self.space.vectorize(survey_type, answers)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return []
+        scores = self.matrix @ (vector / norm)
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [
+            {'id': int(self.course_ids[i]), 'title': self.titles[i], 'score': round(float(scores[i]), 4)}
+            for i in best if scores[i] > 0
+        ]
+
+    def rescore(self, queryset=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        # Пакетный пересчёт рекомендаций для исторических опросов: одно умножение матриц на пачку
+        self.ensure_current()
+        queryset = queryset if queryset is not None else Survey.objects.all()
+        updated = 0
+        batch = []
+        for row in queryset.order_by('id').values_list('id', 'survey_type', 'answers').iterator(chunk_size=chunk_size):
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                updated += self._rescore_batch(batch)
+                batch = []
+        if batch:
+            updated += self._rescore_batch(batch)
+        return updated
+
+    def _rescore_batch(self, batch):
+        if not len(self.course_ids):
+            return 0
+        vectors = _normalize_rows(self.space.vectorize_many([(t, a) for _, t, a in batch]))
+        scores = vectors @ self.matrix.T
+        best = scores.argmax(axis=1)
+        surveys = [
+            Survey(id=survey_id, recommended_course_id=int(self.course_ids[column]))
+            for (survey_id, _, _), column, row_scores in zip(batch, best, scores) if row_scores[column] > 0
+        ]
+        with transaction.atomic():
+            Survey.objects.bulk_update(surveys, ['recommended_course'], batch_size=1000)
+        return len(surveys)
+
+
+recommender = CourseRecommender()
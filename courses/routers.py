@@ -0,0 +1,89 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Сессии всегда читаются с основной базы: отставание реплики разлогинило бы пользователя сразу после входа
+PRIMARY_ONLY_APPS = {'sessions'}
+# Прагмы SQLite на каждое новое соединение: WAL — читатели не ждут писателя, NORMAL — fsync только
+# на контрольных точках WAL, busy_timeout — ожидание блокировки вместо мгновенного «database is locked»
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', 5000),
+)
+
+
+class RoutingState:
+    # Состояние одного запроса: можно ли читать с реплики и была ли запись
+    def __init__(self, replica=False):
+        self.replica = replica
+        self.wrote = False
+
+
+# Объект, а не флаг: sync_to_async копирует контекст, а изменения в общем объекте видны обеим сторонам
+_routing = ContextVar('courses_db_routing', default=None)
+
+
+@contextmanager
+def routing(replica=False):
+    state = RoutingState(replica)
+    token = _routing.set(state)
+    try:
+        yield state
+    finally:
+        _routing.reset(token)
+
+
+def replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def configure_sqlite(connection):
+    # Напрямую через sqlite3, мимо обёрток курсора: прагмы не попадают в счётчики запросов
+    for name, value in SQLITE_PRAGMAS:
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+class PrimaryReplicaRouter:
+    """
+    Записи — в основную базу, чтения внутри безопасного запроса без недавних записей — на случайную
+    реплику из settings.DATABASE_REPLICAS. Вне запроса (команды, миграции, фоновые задачи) всё идёт
+    в основную базу. После первой записи чтения до конца запроса тоже идут в основную базу.
+    """
+
+    def __init__(self, primary=DEFAULT_DB_ALIAS, replicas=None):
+        self.primary = primary
+        self._replicas = replicas
+
+    @property
+    def replicas(self):
+        return replica_aliases() if self._replicas is None else self._replicas
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.replica or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return self.primary
+        replicas = self.replicas
+        return random.choice(replicas) if replicas else self.primary
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.replica = False
+            state.wrote = True
+        return self.primary
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {self.primary, *self.replicas}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему вместе с данными от основной базы
+        if db in self.replicas:
+            return False
+        return None
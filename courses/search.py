@@ -0,0 +1,203 @@
+import html
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+
+from .models import Course, Material, Module
+
+SEARCH_TABLE = 'courses_search'
+SEARCH_MAX_LIMIT = 50
+SEARCH_MAX_OFFSET = 1000
+MAX_TERMS = 8
+# rowid = id * ROWID_STRIDE + код вида: строка индекса находится и удаляется по первичному ключу,
+# без сканирования неиндексируемых колонок FTS5
+ROWID_STRIDE = 4
+SEARCH_KINDS = {'course': 1, 'module': 2, 'material': 3}
+# Веса bm25 по колонкам (kind, title, body): совпадение в названии важнее совпадения в тексте
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+# Маркеры подсветки из управляющих символов: текст экранируется целиком, затем они меняются на <mark>
+MARK_START, MARK_END = '\x02', '\x03'
+SNIPPET_TOKENS = 24
+
+_SOURCES = {
+    'course': ('courses_course', "NEW.title", "COALESCE(NEW.description, '')", 'title, description'),
+    'module': ('courses_module', "NEW.title", "COALESCE(NEW.description, '')", 'title, description'),
+    # В индекс попадает только текст текстовых материалов, у видео и PDF — название
+    'material': ('courses_material', "NEW.title",
+                 "CASE WHEN NEW.type = 'text' THEN COALESCE(NEW.content, '') ELSE '' END", 'title, type, content'),
+}
+
+
+def _rowid(kind, column='NEW.id'):
+    return f'{column} * {ROWID_STRIDE} + {SEARCH_KINDS[kind]}'
+
+
+def create_statements():
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+        f"kind UNINDEXED, title, body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    ]
+    for kind, (table, title, body, columns) in _SOURCES.items():
+        insert = (f"INSERT INTO {SEARCH_TABLE}(rowid, kind, title, body) "
+                  f"VALUES ({_rowid(kind)}, '{kind}', {title}, {body});")
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN {insert} END",
+            # Триггер только на индексируемые колонки: пересчёт module_count и updated_at индекс не трогает
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF {columns} ON {table} BEGIN "
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid = {_rowid(kind, 'OLD.id')}; {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN "
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid = {_rowid(kind, 'OLD.id')}; END",
+        ]
+    return statements
+
+
+def drop_statements():
+    statements = []
+    for table, *_ in _SOURCES.values():
+        statements += [f'DROP TRIGGER IF EXISTS {table}_search_{action}' for action in ('insert', 'update', 'delete')]
+    return statements + [f'DROP TABLE IF EXISTS {SEARCH_TABLE}']
+
+
+def fill_statements():
+    statements = []
+    for kind, (table, title, body, _) in _SOURCES.items():
+        select_title = title.replace('NEW.', '')
+        select_body = body.replace('NEW.', '')
+        statements.append(f"INSERT INTO {SEARCH_TABLE}(rowid, kind, title, body) "
+                          f"SELECT {_rowid(kind, 'id')}, '{kind}', {select_title}, {select_body} FROM {table}")
+    return statements
+
+
+def trigger_names():
+    return [f'{table}_search_{action}' for table, *_ in _SOURCES.values() for action in ('insert', 'update', 'delete')]
+
+
+def missing_triggers(using=None):
+    # Пересоздание таблицы при миграции (AlterField в SQLite) молча удаляет её триггеры, индекс перестаёт
+    # обновляться. None — индекса нет совсем (не SQLite или миграция ещё не применена)
+    db = connections[using or DEFAULT_DB_ALIAS]
+    if db.vendor != 'sqlite':
+        return None
+    with db.cursor() as cursor:
+        cursor.execute("SELECT type, name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {(kind, name) for kind, name in cursor.fetchall()}
+    if ('table', SEARCH_TABLE) not in existing:
+        return None
+    return [name for name in trigger_names() if ('trigger', name) not in existing]
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+def rebuild_index():
+    # Полная перестройка: после ручных правок базы или если индекс разошёлся с таблицами
+    with connection.cursor() as cursor:
+        for statement in drop_statements() + create_statements():
+            cursor.execute(statement)
+        for statement in fill_statements():
+            cursor.execute(statement)
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT COUNT(*) FROM {SEARCH_TABLE}')
+        return cursor.fetchone()[0]
+
+
+def build_match(query):
+    # Запрос пользователя не передаётся в синтаксис FTS5 как есть: слова берутся в кавычки, все
+    # обязательны, по префиксу ищется только последнее (его ещё набирают). Префиксы из 2–3 символов
+    # берутся из отдельного префиксного индекса
+    terms = re.findall(r'\w+', query or '')[:MAX_TERMS]
+    return ' '.join([f'"{term}"' for term in terms[:-1]] + [f'"{term}"*' for term in terms[-1:]])
+
+
+def _highlight(text):
+    return html.escape(text or '').replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def _course_links(rows):
+    # Курс для каждого результата: по одному запросу на вид, только для строк текущей страницы
+    ids = {kind: [object_id for row_kind, object_id in rows if row_kind == kind] for kind in SEARCH_KINDS}
+    links = {}
+    if ids['course']:
+        links.update((('course', pk), (pk, slug)) for pk, slug in
+                     Course.objects.filter(pk__in=ids['course']).values_list('pk', 'slug'))
+    if ids['module']:
+        links.update((('module', pk), (course_id, slug)) for pk, course_id, slug in
+                     Module.objects.filter(pk__in=ids['module']).values_list('pk', 'course_id', 'course__slug'))
+    if ids['material']:
+        links.update((('material', pk), (course_id, slug)) for pk, course_id, slug in
+                     Material.objects.filter(pk__in=ids['material'])
+                     .values_list('pk', 'module__course_id', 'module__course__slug'))
+    return links
+
+
+def search(query, kinds=None, limit=20, offset=0):
+    match = build_match(query)
+    if not match:
+        return []
+    kinds = [kind for kind in (kinds or SEARCH_KINDS) if kind in SEARCH_KINDS]
+    # Сначала ранжирование по одному bm25 и срез страницы, затем подсветка только для её строк:
+    # highlight и snippet на каждое совпадение частого слова стоили бы больше самого поиска
+    page = (
+        f"SELECT rowid, bm25({SEARCH_TABLE}, 0.0, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score "
+        f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s "
+    )
+    params = [match]
+    if len(kinds) < len(SEARCH_KINDS):
+        page += f"AND rowid %% {ROWID_STRIDE} IN ({', '.join(['%s'] * len(kinds))}) "
+        params += [SEARCH_KINDS[kind] for kind in kinds]
+    page += 'ORDER BY score LIMIT %s OFFSET %s'
+    params += [limit, offset]
+    sql = (
+        f"SELECT {SEARCH_TABLE}.rowid / {ROWID_STRIDE}, kind, highlight({SEARCH_TABLE}, 1, %s, %s), "
+        f"snippet({SEARCH_TABLE}, 2, %s, %s, '…', {SNIPPET_TOKENS}), page.score "
+        f"FROM ({page}) AS page JOIN {SEARCH_TABLE} ON {SEARCH_TABLE}.rowid = page.rowid "
+        f"WHERE {SEARCH_TABLE} MATCH %s ORDER BY page.score"
+    )
+    params = [MARK_START, MARK_END, MARK_START, MARK_END, *params, match]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    links = _course_links([(kind, object_id) for object_id, kind, *_ in rows])
+    results = []
+    for object_id, kind, title, snippet, score in rows:
+        course_id, slug = links.get((kind, object_id), (None, None))
+        results.append({
+            'kind': kind,
+            'id': object_id,
+            'course': course_id,
+            'course_slug': slug,
+            'title': _highlight(title),
+            'snippet': _highlight(snippet),
+            # bm25 в SQLite отрицательный: чем меньше, тем релевантнее
+            'score': round(-score, 4),
+        })
+    return results
+
+
+def run_search(query, kinds=None, limit=20, offset=0):
+    return (search if is_supported() else search_fallback)(query, kinds, limit=limit, offset=offset)
+
+
+def search_fallback(query, kinds=None, limit=20, offset=0):
+    # Базы без FTS5: поиск по подстроке в названиях, без ранжирования и подсветки
+    terms = re.findall(r'\w+', query or '')[:MAX_TERMS]
+    if not terms:
+        return []
+    results = []
+    for kind, queryset, course_path, slug_path in (
+        ('course', Course.objects.all(), 'id', 'slug'),
+        ('module', Module.objects.all(), 'course_id', 'course__slug'),
+        ('material', Material.objects.all(), 'module__course_id', 'module__course__slug'),
+    ):
+        if kinds and kind not in kinds:
+            continue
+        for term in terms:
+            queryset = queryset.filter(title__icontains=term)
+        for pk, title, course_id, slug in queryset.order_by('pk').values_list('pk', 'title', course_path,
+                                                                             slug_path)[:offset + limit]:
+            results.append({'kind': kind, 'id': pk, 'course': course_id, 'course_slug': slug,
+                            'title': html.escape(title), 'snippet': '', 'score': 0.0})
+    return results[offset:offset + limit]
@@ -0,0 +1,152 @@
+import random
+import time
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Course, Module, Material, Enrollment, UserProgress, FavoriteCourse, Survey
+from .analytics import rebuild_stats
+from .batching import DEFAULT_BATCH_SIZE, batched
+from .progress import rebuild_rollups, refresh_module_counts
+from .slugs import slugify_title
+
+# modules — модулей на курс, materials — материалов на модуль,
+# enrollments/favorites/surveys — на пользователя, progress — записей прогресса на запись на курс
+DEFAULT_DATASET = {
+    'users': 200,
+    'courses': 20,
+    'modules': 10,
+    'materials': 10,
+    'enrollments': 5,
+    'progress': 3,
+    'surveys': 1,
+    'favorites': 5,
+}
+
+SURVEY_TYPES = ['backend', 'frontend', 'data_science', 'devops', 'ai_ml']
+
+
+def print_progress(write, interval=1.0):
+    last = {}
+
+    def report(label, done, total, elapsed):
+        # Не чаще раза в interval секунд на таблицу, последняя пачка печатается всегда
+        if done != total and elapsed - last.get(label, -interval) < interval:
+            return
+        last[label] = elapsed
+        rate = done / elapsed if elapsed else 0
+        total_text = f'/{total}' if total is not None else ''
+        write(f'{label}: {done}{total_text} ({rate:,.0f} строк/с)')
+    return report
+
+
+def bulk_insert(model, rows, batch_size=DEFAULT_BATCH_SIZE, total=None, report=None, label=None, **kwargs):
+    # Каждая пачка вставляется одной транзакцией, строки генерируются лениво.
+    # Возвращает число вставленных строк: с ignore_conflicts bulk_create не сообщает о пропущенных
+    # дубликатах, поэтому они считаются по таблице до и после
+    label = label or model._meta.model_name
+    before = model.objects.count() if kwargs.get('ignore_conflicts') else None
+    started = time.perf_counter()
+    done = 0
+    for batch in batched(rows, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, batch_size=batch_size, **kwargs)
+        done += len(batch)
+        if report:
+            report(label, done, total, time.perf_counter() - started)
+    return done if before is None else model.objects.count() - before
+
+
+def load_modules(course_ids):
+    modules_by_course = {course_id: [] for course_id in course_ids}
+    for module_id, course_id in Module.objects.filter(course_id__in=course_ids).order_by('id').values_list(
+            'id', 'course_id'):
+        modules_by_course[course_id].append(module_id)
+    return modules_by_course
+
+
+def seed_dataset(users, courses, modules, materials, enrollments, progress, surveys, favorites,
+                 batch_size=DEFAULT_BATCH_SIZE, prefix='seed', seed=0, report=None):
+    rng = random.Random(seed)
+    now = timezone.now()
+    insert = dict(batch_size=batch_size, report=report)
+
+    staff, created = User.objects.get_or_create(
+        username=f'{prefix}_admin', defaults={'is_staff': True, 'is_superuser': True}
+    )
+    if created:
+        staff.set_password(f'{prefix}_admin')
+        staff.save(update_fields=['password'])
+    # Хэш пароля считается один раз — это самая дорогая часть создания пользователя
+    password = make_password(f'{prefix}_user')
+    counts = {'users': int(created) + bulk_insert(
+        User, (User(username=f'{prefix}_user_{i}', password=password) for i in range(users)),
+        total=users, ignore_conflicts=True, **insert,
+    )}
+    user_ids = list(User.objects.filter(username__startswith=f'{prefix}_user_').values_list('id', flat=True))
+
+    # Курсы, модули и материалы тоже не дублируются при повторе с тем же prefix: курсы — по уникальному слагу,
+    # модули и материалы досоздаются только до заданного числа на курс и на модуль
+    titles = {slugify_title(title): title for title in (f'{prefix.capitalize()} course {i}' for i in range(courses))}
+    counts['courses'] = bulk_insert(Course, (
+        Course(title=title, slug=slug, description='Описание курса ' * 20, instructor=staff,
+               start_date=now, end_date=now + timezone.timedelta(days=90))
+        for slug, title in titles.items()
+    ), total=courses, ignore_conflicts=True, **insert)
+    course_titles = dict(
+        Course.objects.filter(instructor=staff, slug__in=list(titles)).order_by('id').values_list('id', 'title')
+    )
+    course_ids = list(course_titles)
+
+    modules_by_course = load_modules(course_ids)
+    counts['modules'] = bulk_insert(Module, (
+        Module(title=f'Module {c}.{i}', description='Описание модуля ' * 20, course_id=course_id)
+        for c, course_id in enumerate(course_ids) for i in range(len(modules_by_course[course_id]), modules)
+    ), total=sum(max(modules - len(ids), 0) for ids in modules_by_course.values()), **insert)
+    modules_by_course = load_modules(course_ids)
+    module_ids = [module_id for ids in modules_by_course.values() for module_id in ids]
+
+    existing_materials = Counter(Material.objects.filter(module_id__in=module_ids).values_list('module_id', flat=True))
+    counts['materials'] = bulk_insert(Material, (
+        Material(title=f'Material {module_id}.{i}', type='text', content='Текст материала ' * 50, module_id=module_id)
+        for module_id in module_ids for i in range(existing_materials[module_id], materials)
+    ), total=sum(max(materials - existing_materials[module_id], 0) for module_id in module_ids), **insert)
+
+    # Выбор курсов для каждого пользователя фиксируется заранее, чтобы записи
+    # и прогресс генерировались согласованно и лениво
+    user_courses = {user_id: rng.sample(course_ids, min(enrollments, len(course_ids))) for user_id in user_ids}
+
+    counts['enrollments'] = bulk_insert(Enrollment, (
+        Enrollment(user_id=user_id, course_id=course_id)
+        for user_id, course_list in user_courses.items() for course_id in course_list
+    ), total=sum(len(c) for c in user_courses.values()), ignore_conflicts=True, **insert)
+
+    def progress_rows():
+        for user_id, course_list in user_courses.items():
+            for course_id in course_list:
+                course_modules = modules_by_course.get(course_id, [])
+                for module_id in rng.sample(course_modules, min(progress, len(course_modules))):
+                    yield UserProgress(user_id=user_id, course_id=course_id, module_id=module_id,
+                                       progress=rng.randint(0, 100))
+
+    counts['progress'] = bulk_insert(UserProgress, progress_rows(), ignore_conflicts=True, **insert)
+    # bulk_create не вызывает сигналы, поэтому сводки пересчитываются одним UPDATE на таблицу
+    refresh_module_counts(course_ids)
+    rebuild_rollups(Enrollment.objects.filter(course_id__in=course_ids))
+    counts['favorites'] = bulk_insert(FavoriteCourse, (
+        FavoriteCourse(user_id=user_id, course_name=course_titles[course_id], progress=rng.randint(0, 100))
+        for user_id in user_ids for course_id in rng.sample(course_ids, min(favorites, len(course_ids)))
+    ), total=len(user_ids) * min(favorites, len(course_ids)), ignore_conflicts=True, **insert)
+    existing_surveys = Counter(Survey.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+    counts['surveys'] = bulk_insert(Survey, (
+        Survey(user_id=user_id, recommended_course_id=rng.choice(course_ids) if course_ids else None,
+               survey_type=rng.choice(SURVEY_TYPES), answers={f'q{q}': rng.randint(0, 3) for q in range(1, 11)})
+        for user_id in user_ids for _ in range(existing_surveys[user_id], surveys)
+    ), total=sum(max(surveys - existing_surveys[user_id], 0) for user_id in user_ids), **insert)
+    if counts['surveys']:
+        # Как и сводки прогресса: bulk_create минует update_survey_stats, распределения пересчитываются целиком
+        rebuild_stats()
+    return counts
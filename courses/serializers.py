@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Course, Module, Material, Enrollment, UserProgress, FavoriteCourse, Survey
+from .models import Course, Module, Material, MaterialUpload, Enrollment, UserProgress, FavoriteCourse, Survey
+from .uploads import MAX_UPLOAD_SIZE, received_chunks
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -17,7 +18,8 @@ class UserSerializer(serializers.ModelSerializer):
 class CourseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Course
-        fields = ['id', 'title', 'description', 'start_date', 'end_date', 'instructor']
+        fields = ['id', 'title', 'slug', 'description', 'start_date', 'end_date', 'instructor']
+        read_only_fields = ['slug']
 
 
 class ModuleSerializer(serializers.ModelSerializer):
@@ -32,10 +34,51 @@ class MaterialSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'type', 'content', 'file', 'module']
 
 
+class MaterialUploadSerializer(serializers.ModelSerializer):
+    size = serializers.IntegerField(min_value=1, max_value=MAX_UPLOAD_SIZE)
+    chunk_count = serializers.ReadOnlyField()
+    received = serializers.SerializerMethodField()
+
+    class Meta:
+        model = MaterialUpload
+        fields = ['id', 'filename', 'size', 'chunk_size', 'chunk_count', 'received']
+        read_only_fields = ['chunk_size']
+
+    def get_received(self, upload):
+        return received_chunks(upload)
+
+
+class MaterialTreeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Material
+        fields = ['id', 'title', 'type', 'content', 'file']
+
+
+class ModuleTreeSerializer(serializers.ModelSerializer):
+    materials = MaterialTreeSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Module
+        fields = ['id', 'title', 'description', 'materials']
+
+
+class CourseTreeSerializer(serializers.ModelSerializer):
+    modules = ModuleTreeSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Course
+        fields = ['id', 'title', 'slug', 'description', 'start_date', 'end_date', 'instructor', 'modules']
+
+
 class EnrollmentSerializer(serializers.ModelSerializer):
+    progress = serializers.IntegerField(source='progress_percent', read_only=True)
+    total_modules = serializers.IntegerField(source='course.module_count', read_only=True)
+
     class Meta:
         model = Enrollment
-        fields = ['id', 'user', 'course', 'enrollment_date', 'status']
+        fields = ['id', 'user', 'course', 'enrollment_date', 'status', 'progress', 'completed_modules',
+                  'total_modules']
+        read_only_fields = ['completed_modules']
 
 
 class UserProgressSerializer(serializers.ModelSerializer):
@@ -44,6 +87,12 @@ class UserProgressSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'course', 'module', 'progress', 'last_updated']
 
 
+class UserProgressBulkItemSerializer(serializers.Serializer):
+    course = serializers.IntegerField()
+    module = serializers.IntegerField()
+    progress = serializers.IntegerField(min_value=0, max_value=100)
+
+
 class FavoriteCourseSerializer(serializers.ModelSerializer):
     class Meta:
         model = FavoriteCourse
@@ -53,4 +102,4 @@ class FavoriteCourseSerializer(serializers.ModelSerializer):
 class SurveySerializer(serializers.ModelSerializer):
     class Meta:
         model = Survey
-        fields = ['id', 'user', 'answers', 'recommended_course', 'created_at']
+        fields = ['id', 'user', 'survey_type', 'answers', 'recommended_course', 'created_at']
@@ -0,0 +1,170 @@
+import copy
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .analytics import update_survey_stats
+from .authentication import forget_tokens
+from .blobs import release_blob, retain_blob
+from .catalog import invalidate_catalog
+from .conditional import record_deletion
+from .course_pages import invalidate_course_pages
+from .course_tree import invalidate_course_trees
+from .models import CatalogCourse, Course, Enrollment, Material, Module, Survey, UserProgress
+from .progress import current_state, loaded_state, rebuild_rollups, refresh_module_counts, refresh_rollups
+from .recommender import recommender
+from .routers import configure_sqlite
+from .surveys import invalidate_course_title
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        configure_sqlite(connection)
+
+
+@receiver([post_save, post_delete], sender=CatalogCourse)
+def catalog_changed(sender, **kwargs):
+    invalidate_catalog()
+
+
+@receiver(pre_save, sender=Course)
+def course_title_changing(sender, instance, **kwargs):
+    if instance.pk:
+        old_title, old_slug = Course.objects.filter(pk=instance.pk).values_list('title', 'slug').first() or (None, None)
+        if old_title and old_title != instance.title:
+            invalidate_course_title(old_title)
+        if old_slug and old_slug != instance.slug:
+            invalidate_course_pages([old_slug])
+
+
+@receiver([post_save, post_delete], sender=Course)
+def course_changed(sender, instance, **kwargs):
+    invalidate_course_title(instance.title)
+    invalidate_course_pages([instance.slug])
+    invalidate_course_trees([instance.id])
+    recommender.course_changed(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+def enrollment_changed(sender, instance, **kwargs):
+    recommender.mark_dirty(instance.course_id)
+
+
+@receiver(post_save, sender=Enrollment)
+def enrollment_created(sender, instance, created, **kwargs):
+    # Прогресс мог быть записан до записи на курс — сводка собирается из существующих строк
+    if created and UserProgress.objects.filter(user_id=instance.user_id, course_id=instance.course_id).exists():
+        rebuild_rollups(Enrollment.objects.filter(pk=instance.pk))
+        instance.refresh_from_db(fields=['progress_points', 'completed_modules'])
+
+
+@receiver(post_save, sender=UserProgress)
+def progress_saved(sender, instance, created, **kwargs):
+    pairs = {current_state(instance)}
+    if not created and loaded_state(instance):
+        pairs.add(loaded_state(instance))
+    refresh_rollups(pairs)
+    instance._loaded_values = {'user_id': instance.user_id, 'course_id': instance.course_id,
+                               'progress': instance.progress}
+
+
+@receiver(post_delete, sender=UserProgress)
+def progress_deleted(sender, instance, **kwargs):
+    refresh_rollups({loaded_state(instance) or current_state(instance)})
+
+
+@receiver([post_save, post_delete], sender=Module)
+def module_changed(sender, instance, **kwargs):
+    course_ids = {instance.course_id, getattr(instance, '_loaded_values', {}).get('course_id', instance.course_id)}
+    refresh_module_counts(course_ids)
+    invalidate_course_pages(Course.objects.filter(pk__in=course_ids).values_list('slug', flat=True))
+    invalidate_course_trees(course_ids)
+    instance._loaded_values = {'course_id': instance.course_id}
+
+
+@receiver([post_save, post_delete], sender=Material)
+def material_changed(sender, instance, **kwargs):
+    module_ids = {instance.module_id, getattr(instance, '_loaded_values', {}).get('module_id', instance.module_id)}
+    invalidate_course_trees(Module.objects.filter(pk__in=module_ids).values_list('course_id', flat=True))
+    instance._loaded_values = {**getattr(instance, '_loaded_values', {}), 'module_id': instance.module_id}
+
+
+@receiver(pre_save, sender=Material)
+def material_file_loading(sender, instance, **kwargs):
+    # Прежнее имя файла нужно счётчику ссылок; если объект не загружен из базы, берём его запросом
+    loaded = getattr(instance, '_loaded_values', {})
+    if instance.pk and 'file' not in loaded:
+        instance._loaded_values = {
+            **loaded, 'file': Material.objects.filter(pk=instance.pk).values_list('file', flat=True).first(),
+        }
+
+
+@receiver(post_save, sender=Material)
+def material_file_saved(sender, instance, **kwargs):
+    previous = getattr(instance, '_loaded_values', {}).get('file') or None
+    current = instance.file.name or None
+    if previous != current:
+        retain_blob(current)
+        release_blob(previous)
+    instance._loaded_values = {**getattr(instance, '_loaded_values', {}), 'file': current}
+
+
+@receiver(post_delete, sender=Material)
+def material_file_deleted(sender, instance, **kwargs):
+    release_blob(getattr(instance, '_loaded_values', {}).get('file') or instance.file.name)
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Module)
+@receiver(post_delete, sender=Material)
+def content_deleted(sender, **kwargs):
+    record_deletion(sender)
+
+
+@receiver(post_save, sender=User)
+def instructor_renamed(sender, instance, created, update_fields=None, **kwargs):
+    # Имя инструктора входит в закэшированную страницу курса
+    if not created and (update_fields is None or 'username' in update_fields):
+        invalidate_course_pages(instance.instructed_courses.values_list('slug', flat=True))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    # Сразу и ещё раз после коммита: параллельный запрос мог успеть перечитать строку до коммита
+    key = instance.key
+    forget_tokens([key])
+    transaction.on_commit(lambda: forget_tokens([key]))
+
+
+@receiver(post_save, sender=User)
+def user_tokens_changed(sender, instance, created, update_fields=None, **kwargs):
+    # Пароль, активность и поля в закэшированной строке токена; вход (last_login) токены не трогает
+    if not created and update_fields != frozenset({'last_login'}):
+        user_id = instance.pk
+        forget_tokens(user_id=user_id)
+        transaction.on_commit(lambda: forget_tokens(user_id=user_id))
+
+
+def survey_state(instance):
+    # (тип, ответы) на момент загрузки; для только что созданного опроса — None
+    values = getattr(instance, '_loaded_values', {})
+    if 'survey_type' not in values or 'answers' not in values:
+        return None
+    return values['survey_type'], values['answers']
+
+
+@receiver(post_save, sender=Survey)
+def survey_saved(sender, instance, created, **kwargs):
+    # Правка через PUT/PATCH снимает старые ответы с агрегатов и добавляет новые
+    update_survey_stats(None if created else survey_state(instance), (instance.survey_type, instance.answers))
+    instance._loaded_values = {'survey_type': instance.survey_type, 'answers': copy.deepcopy(instance.answers)}
+
+
+@receiver(post_delete, sender=Survey)
+def survey_deleted(sender, instance, **kwargs):
+    update_survey_stats(survey_state(instance) or (instance.survey_type, instance.answers))
@@ -0,0 +1,36 @@
+from collections import Counter
+
+from django.utils.text import slugify
+
+SLUG_MAX_LENGTH = 255
+# Запас под суффикс «-N» для одинаковых названий
+SLUG_BASE_LENGTH = SLUG_MAX_LENGTH - 10
+LOOKUP_CHUNK_SIZE = 500
+
+
+def slugify_title(title):
+    return slugify(title, allow_unicode=True)[:SLUG_BASE_LENGTH].strip('-') or 'course'
+
+
+def unique_slugs(queryset, titles):
+    # Свободные слаги для списка названий: сначала одна проверка slug__in на пачку,
+    # суффиксы подбираются только для уже занятых или повторяющихся основ
+    bases = [slugify_title(title) for title in titles]
+    counts = Counter(bases)
+    distinct = list(counts)
+    taken = set()
+    for start in range(0, len(distinct), LOOKUP_CHUNK_SIZE):
+        chunk = distinct[start:start + LOOKUP_CHUNK_SIZE]
+        taken.update(queryset.filter(slug__in=chunk).values_list('slug', flat=True))
+    for base in distinct:
+        if base in taken or counts[base] > 1:
+            taken.update(queryset.filter(slug__startswith=f'{base}-').values_list('slug', flat=True))
+
+    slugs = []
+    for base in bases:
+        slug, suffix = base, 2
+        while slug in taken:
+            slug, suffix = f'{base}-{suffix}', suffix + 1
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
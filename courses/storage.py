@@ -0,0 +1,105 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+BLOB_DIR = 'materials/sha256'
+BLOB_CHUNK_SIZE = 8 * 1024 * 1024
+READ_SIZE = 256 * 1024
+
+
+def tree_digest(chunk_digests):
+    # SHA-256 от конкатенации SHA-256 кусков по BLOB_CHUNK_SIZE: считается потоково и по частям,
+    # пришедшим в любом порядке, поэтому загрузка по частям получает адрес блоба без перечитывания файла
+    digest = hashlib.sha256()
+    for chunk_digest in chunk_digests:
+        digest.update(bytes.fromhex(chunk_digest))
+    return digest.hexdigest()
+
+
+class ContentDigest:
+    def __init__(self, chunk_size=BLOB_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.chunks = []
+        self.current = hashlib.sha256()
+        self.filled = 0
+
+    def update(self, data):
+        view = memoryview(data)
+        while view:
+            piece = view[:self.chunk_size - self.filled]
+            self.current.update(piece)
+            self.filled += len(piece)
+            view = view[len(piece):]
+            if self.filled == self.chunk_size:
+                self.chunks.append(self.current.hexdigest())
+                self.current, self.filled = hashlib.sha256(), 0
+
+    def hexdigest(self):
+        return tree_digest(self.chunks + [self.current.hexdigest()] if self.filled else self.chunks)
+
+
+def file_digest(path):
+    digest = ContentDigest()
+    with open(path, 'rb') as file:
+        while data := file.read(READ_SIZE):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    # Файл хранится один раз под своим хэшем: materials/sha256/ab/<digest>.<ext>. Одинаковое содержимое
+    # получает одно имя, поэтому повторная загрузка не пишет и не копирует байты; удаление — через
+    # счётчик ссылок в courses.blobs
+    def blob_name(self, digest, name):
+        extension = os.path.splitext(name)[1].lower()[:16]
+        return f'{BLOB_DIR}/{digest[:2]}/{digest}{extension}'
+
+    def is_blob(self, name):
+        return bool(name) and name.startswith(BLOB_DIR + '/')
+
+    def get_available_name(self, name, max_length=None):
+        # Итоговое имя определяет _save по содержимому, суффиксы для уникальности не нужны
+        return name
+
+    def adopt(self, path, digest, name):
+        # Готовый локальный файл становится блобом переносом; если такой блоб уже есть — файл удаляется
+        blob = self.blob_name(digest, name)
+        target = self.path(blob)
+        if os.path.exists(target):
+            os.remove(path)
+            return blob
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        file_move_safe(path, target, allow_overwrite=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(target, self.file_permissions_mode)
+        return blob
+
+    def _save(self, name, content):
+        if hasattr(content, 'temporary_file_path'):
+            path = content.temporary_file_path()
+            return self.adopt(path, file_digest(path), name)
+
+        directory = self.path(BLOB_DIR)
+        os.makedirs(directory, exist_ok=True)
+        handle, path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        digest = ContentDigest()
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                for data in content.chunks(READ_SIZE):
+                    file.write(data)
+                    digest.update(data)
+            return self.adopt(path, digest.hexdigest(), name)
+        except BaseException:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+
+
+material_storage = ContentAddressedStorage()
+
+
+def get_material_storage():
+    return material_storage
@@ -0,0 +1,112 @@
+import functools
+import hashlib
+import json
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Course, Survey
+from .slugs import slugify_title
+
+SURVEYS_PATH = Path(__file__).resolve().parent / 'data' / 'surveys.json'
+COURSE_ID_CACHE_KEY = 'courses:survey:course_id:{}'
+
+
+class CompiledSurvey:
+    def __init__(self, survey_type, data):
+        self.survey_type = survey_type
+        self.course_title = data['course_title']
+        self.questions = tuple(data['questions'])
+        self.question_ids = tuple(q['id'] for q in self.questions)
+        # Переход к следующему вопросу по словарю вместо линейного поиска
+        self.next_question = dict(zip(self.question_ids, self.question_ids[1:]))
+        self.allowed_values = {q['id']: frozenset(q['options'].values()) for q in self.questions}
+        self.max_score = sum(max(values) for values in self.allowed_values.values())
+
+    def clean_answer(self, question_id, value):
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            return None
+        return value if value in self.allowed_values.get(question_id, ()) else None
+
+    def clean_answers(self, data):
+        answers = {}
+        errors = {}
+        for question_id in self.question_ids:
+            value = self.clean_answer(question_id, data.get(question_id))
+            if value is None:
+                errors[question_id] = 'Выберите один из предложенных вариантов.'
+            else:
+                answers[question_id] = value
+        return answers, errors
+
+    def score(self, answers):
+        return sum(answers.values())
+
+
+@functools.lru_cache(maxsize=None)
+def load_surveys(path=SURVEYS_PATH):
+    with open(path, encoding='utf-8') as fh:
+        data = json.load(fh)
+    return {survey_type: CompiledSurvey(survey_type, survey) for survey_type, survey in data.items()}
+
+
+def get_survey(survey_type):
+    return load_surveys().get(survey_type)
+
+
+def course_cache_key(title):
+    # Название — произвольный текст с пробелами, а ключи memcached их не допускают: в ключ идёт хэш
+    return COURSE_ID_CACHE_KEY.format(hashlib.blake2b(title.encode(), digest_size=16).hexdigest())
+
+
+def invalidate_course_title(title):
+    cache.delete(course_cache_key(title))
+
+
+def find_course_id(title):
+    return Course.objects.filter(title=title).order_by('id').values_list('id', flat=True).first()
+
+
+def resolve_course_id(title, survey_type, user):
+    key = course_cache_key(title)
+    course_id = cache.get(key)
+    if course_id is not None:
+        return course_id
+
+    course_id = find_course_id(title)
+    if course_id is None:
+        # Курс создаётся по уникальному слагу: параллельные запросы сходятся на одной строке через
+        # get_or_create, и лишний курс с сигналами (каталог, поиск, рекомендации) не появляется
+        defaults = {
+            'title': title,
+            'description': f"Курс по {survey_type}",
+            'instructor': User.objects.filter(is_staff=True).first() or user,
+            'start_date': timezone.now(),
+            'end_date': timezone.now() + timezone.timedelta(days=90),
+        }
+        course, _ = Course.objects.get_or_create(slug=slugify_title(title), defaults=defaults)
+        if course.title != title:
+            # Слаг уже занят курсом с другим названием — обычное создание со свободным слагом
+            course = Course.objects.create(**defaults)
+        course_id = course.id
+    cache.set(key, course_id, None)
+    return course_id
+
+
+def submit_survey(user, survey, answers):
+    from .recommender import recommender
+
+    # Курс, закреплённый за типом опроса, нужен как опорный профиль и как запасной вариант
+    course_id = resolve_course_id(survey.course_title, survey.survey_type, user)
+    recommendations = recommender.top_k(survey.survey_type, answers)
+    if not recommendations:
+        recommendations = [{'id': course_id, 'title': survey.course_title, 'score': 0.0}]
+    submitted = Survey.objects.create(
+        user=user, survey_type=survey.survey_type, answers=answers,
+        recommended_course_id=recommendations[0]['id'],
+    )
+    return submitted, recommendations
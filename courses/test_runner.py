@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+def isolated_caches():
+    # Кэш default в памяти процесса: тесты и замеры чистят его и не должны задевать общий кэш воркеров
+    return {**settings.CACHES, 'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class CoursesTestRunner(DiscoverRunner):
+    """
+    DiscoverRunner, который на время прогона подменяет кэш default на LocMemCache (settings.TEST_RUNNER).
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._caches = override_settings(CACHES=isolated_caches())
+        self._caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches.disable()
+        super().teardown_test_environment(**kwargs)
@@ -1,12 +1,21 @@
+import time
 from django.contrib.auth.models import User
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase
-from courses.models import Course, FavoriteCourse
+from courses.models import (
+    Course, Module, Material, MaterialUpload, MaterialUploadChunk, FavoriteCourse, CatalogCourse, Survey, Enrollment,
+    UserProgress, StoredBlob
+)
+from courses.catalog import get_catalog, invalidate_catalog
+from courses.seeding import seed_dataset
+from courses.slugs import slugify_title
 from django.utils import timezone
 from datetime import datetime
-from django.test import TestCase, Client
+from django.test import SimpleTestCase, TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 
 
 # Тесты для API
@@ -103,3 +112,1605 @@ class CoursesViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'api_users.html')
         self.assertContains(response, 'testuser')
+
+
+class CatalogTests(TestCase):
+    def setUp(self):
+        invalidate_catalog()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+
+    def test_catalog_seeded_from_migration(self):
+        response = self.client.get(reverse('api_courses'))
+        self.assertEqual(len(response.context['courses']), 15)
+        self.assertEqual(response.context['courses'][0]['name'], 'Backend')
+        self.assertEqual(response.context['courses'][0]['date'], '15 апреля 2025')
+
+    def test_catalog_marks_favorites(self):
+        FavoriteCourse.objects.create(user=self.user, course_name='Frontend', progress=40)
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('api_courses'))
+        courses = {c['name']: c for c in response.context['courses']}
+        self.assertTrue(courses['Frontend']['is_favorite'])
+        self.assertEqual(courses['Frontend']['progress'], 40)
+        self.assertFalse(courses['Backend']['is_favorite'])
+
+    def test_catalog_query_count_is_constant(self):
+        self.client.login(username='testuser', password='testpass123')
+        self.client.get(reverse('api_courses'))
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse('api_courses'))
+
+        CatalogCourse.objects.bulk_create([
+            CatalogCourse(name=f'Course {i}', date=timezone.now().date(), position=100 + i) for i in range(50)
+        ])
+        FavoriteCourse.objects.bulk_create([
+            FavoriteCourse(user=self.user, course_name=f'Course {i}') for i in range(50)
+        ])
+        invalidate_catalog()
+        self.client.get(reverse('api_courses'))
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(reverse('api_courses'))
+        self.assertEqual(len(response.context['courses']), 65)
+        self.assertEqual(len(small), len(large))
+
+    def test_catalog_invalidated_on_save(self):
+        self.assertEqual(len(get_catalog()), 15)
+        CatalogCourse.objects.create(name='Rust', date=timezone.now().date(), position=99)
+        self.assertEqual(get_catalog()[-1]['name'], 'Rust')
+
+
+class FavoritesQueryTests(TestCase):
+    def setUp(self):
+        invalidate_catalog()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.admin = User.objects.create_superuser(username='admin', password='adminpass123')
+        self.client.login(username='testuser', password='testpass123')
+
+    def _add_favorites(self, names):
+        now = timezone.now()
+        Course.objects.bulk_create([
+            Course(title=name, slug=slugify_title(name), description='', instructor=self.admin, start_date=now,
+                   end_date=now) for name in names
+        ])
+        FavoriteCourse.objects.bulk_create([FavoriteCourse(user=self.user, course_name=name) for name in names])
+
+    def test_favorites_icons_and_dates(self):
+        Course.objects.create(title='Backend', description='', instructor=self.admin,
+                              start_date=timezone.make_aware(datetime(2025, 4, 15)), end_date=timezone.now())
+        FavoriteCourse.objects.create(user=self.user, course_name='Backend', progress=30)
+        FavoriteCourse.objects.create(user=self.user, course_name='Unknown')
+        response = self.client.get(reverse('favorites'))
+        courses = {c['name']: c for c in response.context['favorite_courses']}
+        self.assertEqual(courses['Backend']['icon'], '2920/2920346.png')
+        self.assertEqual(courses['Backend']['date'], '15 апреля 2025')
+        self.assertEqual(courses['Backend']['progress'], 30)
+        self.assertEqual(courses['Unknown']['icon'], 'question.png')
+
+    def test_favorites_query_count_is_constant(self):
+        self._add_favorites(['Backend'])
+        self.client.get(reverse('favorites'))
+        with CaptureQueriesContext(connection) as one:
+            self.client.get(reverse('favorites'))
+
+        self._add_favorites([f'Course {i}' for i in range(60)])
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(reverse('favorites'))
+        self.assertEqual(len(response.context['favorite_courses']), 61)
+        self.assertEqual(len(one), len(many))
+
+
+class StaffListingTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.admin = User.objects.create_superuser(username='admin', password='adminpass123')
+        self.client.login(username='admin', password='adminpass123')
+        now = timezone.now()
+        self.courses = [
+            Course.objects.create(title=f'Course {i}', description='', instructor=self.admin, start_date=now, end_date=now)
+            for i in range(2)
+        ]
+        self.modules = Module.objects.bulk_create([
+            Module(title=f'Module {i}', description='x' * 100, course=self.courses[i % 2]) for i in range(120)
+        ])
+        Material.objects.bulk_create([
+            Material(title=f'Material {i}', type='text', content='y' * 100, module=self.modules[i % 4]) for i in range(120)
+        ])
+
+    def test_module_list_keyset_pages(self):
+        response = self.client.get(reverse('module_list'))
+        page = response.context['page']
+        self.assertEqual(len(page), 50)
+        self.assertTrue(page.has_next)
+        self.assertFalse(page.has_previous)
+
+        response = self.client.get(reverse('module_list') + page.next_query)
+        second = response.context['page']
+        self.assertEqual(second.object_list[0].pk, page.object_list[-1].pk + 1)
+        self.assertTrue(second.has_previous)
+
+        response = self.client.get(reverse('module_list') + second.previous_query)
+        self.assertEqual([m.pk for m in response.context['page']], [m.pk for m in page])
+
+    def test_module_list_filter_by_course(self):
+        response = self.client.get(reverse('module_list'), {'course': self.courses[1].id, 'per_page': 200})
+        modules = response.context['page'].object_list
+        self.assertEqual(len(modules), 60)
+        self.assertTrue(all(m.course_id == self.courses[1].id for m in modules))
+
+    def test_material_list_filter_by_module(self):
+        response = self.client.get(reverse('material_list'), {'module': self.modules[0].id})
+        materials = response.context['page'].object_list
+        self.assertEqual(len(materials), 30)
+        self.assertContains(response, 'Module 0')
+
+    def test_listing_query_count_does_not_grow_with_rows(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse('material_list'), {'per_page': 5})
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(reverse('material_list'), {'per_page': 100})
+        self.assertEqual(len(small), len(large))
+
+
+class CursorPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='admin', password='password')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        now = timezone.now()
+        Course.objects.bulk_create([
+            Course(title=f'Course {i}', slug=f'course-{i}', description='', instructor=self.user, start_date=now,
+                   end_date=now)
+            for i in range(25)
+        ])
+
+    def test_page_number_is_default(self):
+        response = self.client.get(reverse('course_list_create'))
+        self.assertEqual(response.data['count'], 25)
+
+    def test_cursor_mode_walks_all_rows_without_count(self):
+        url = reverse('course_list_create') + '?pagination=cursor'
+        seen = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertNotIn('count', response.data)
+            self.assertFalse(any('COUNT(' in q['sql'].upper() for q in queries))
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_view_can_opt_in_to_cursor_mode(self):
+        from courses.views import CourseListCreateView
+        CourseListCreateView.pagination_mode = 'cursor'
+        try:
+            response = self.client.get(reverse('course_list_create'))
+        finally:
+            del CourseListCreateView.pagination_mode
+        self.assertNotIn('count', response.data)
+        self.assertIsNotNone(response.data['next'])
+
+
+class QueryBudgetMiddlewareTests(TestCase):
+    def setUp(self):
+        invalidate_catalog()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+
+    @override_settings(QUERY_STATS_HEADERS=True)
+    def test_headers_in_debug_mode(self):
+        response = self.client.get(reverse('api_courses'))
+        self.assertGreater(int(response['X-DB-Query-Count']), 0)
+        self.assertIn('X-DB-Query-Time-Ms', response)
+        self.assertIn('X-DB-Duplicate-Queries', response)
+
+    @override_settings(QUERY_STATS_HEADERS=False)
+    def test_structured_log_in_production_mode(self):
+        with self.assertLogs('courses.queries', level='INFO') as logs:
+            response = self.client.get(reverse('api_courses'))
+        self.assertNotIn('X-DB-Query-Count', response)
+        self.assertIn('"view": "api_courses"', logs.output[0])
+
+    @override_settings(QUERY_STATS_HEADERS=True, QUERY_BUDGETS={'api_courses': 1})
+    def test_budget_exceeded_logs_warning(self):
+        with self.assertLogs('courses.queries', level='WARNING') as logs:
+            self.client.get(reverse('api_courses'))
+        self.assertIn('db_query_budget_exceeded', logs.output[0])
+
+    def test_duplicate_fingerprints(self):
+        from courses.middleware import capture_queries
+        with capture_queries() as stats:
+            for course_id in (1, 2, 3):
+                list(Course.objects.filter(id=course_id))
+        self.assertEqual(stats.count, 3)
+        self.assertEqual(list(stats.duplicates.values()), [3])
+
+
+class BenchmarkTests(TestCase):
+    def test_seed_and_measure(self):
+        from courses.benchmarks import run_benchmark
+        counts = seed_dataset(users=3, courses=2, modules=2, materials=2, enrollments=1, progress=1,
+                              surveys=1, favorites=1, prefix='bench')
+        self.assertEqual(counts['materials'], 8)
+        self.assertEqual(counts['progress'], 3)
+        results = run_benchmark(requests=3, warmup=0, only=['api_courses', 'enrollment_list_create'])
+        self.assertEqual(set(results), {'api_courses', 'enrollment_list_create'})
+        for result in results.values():
+            self.assertEqual(result['status_codes'], [200])
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            self.assertGreater(result['queries_max'], 0)
+
+
+class SeedingTests(TestCase):
+    def test_seed_dataset_in_batches(self):
+        from courses.models import Enrollment, UserProgress
+        reports = []
+        counts = seed_dataset(users=10, courses=3, modules=4, materials=2, enrollments=2, progress=3,
+                              surveys=0, favorites=1, batch_size=7,
+                              report=lambda label, done, total, elapsed: reports.append((label, done)))
+        self.assertEqual(counts['enrollments'], 20)
+        self.assertEqual(counts['progress'], 60)
+        self.assertEqual(UserProgress.objects.count(), 60)
+        self.assertEqual(Enrollment.objects.count(), 20)
+        self.assertIn(('userprogress', 7), reports)
+        self.assertIn(('userprogress', 60), reports)
+
+    def test_seed_dataset_fills_survey_stats(self):
+        from courses.analytics import stats_report
+        counts = seed_dataset(users=6, courses=2, modules=1, materials=0, enrollments=1, progress=0, surveys=2,
+                              favorites=0)
+        self.assertEqual(counts['surveys'], 12)
+        self.assertEqual(sum(entry['total'] for entry in stats_report().values()), 12)
+
+    def test_seed_dataset_is_repeatable(self):
+        dataset = dict(users=5, courses=2, modules=2, materials=3, enrollments=1, progress=1, surveys=1, favorites=1)
+        first = seed_dataset(**dataset)
+        tables = (User, Course, Module, Material, Enrollment, UserProgress, FavoriteCourse, Survey)
+        sizes = [model.objects.count() for model in tables]
+        second = seed_dataset(**dataset)
+        self.assertEqual([model.objects.count() for model in tables], sizes)
+        self.assertEqual(User.objects.filter(username__startswith='seed_user_').count(), 5)
+        # Счётчики — вставленные строки, а не попытки: повтор ничего не добавляет
+        self.assertEqual({name: first[name] for name in ('users', 'courses', 'modules', 'materials', 'surveys')},
+                         {'users': 6, 'courses': 2, 'modules': 4, 'materials': 12, 'surveys': 5})
+        self.assertEqual(set(second.values()), {0})
+
+
+class CourseQuizTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.login(username='testuser', password='testpass123')
+        self.correct = {
+            'question_1': 'b', 'question_2': 'a', 'question_3': 'b', 'question_4': 'a', 'question_5': 'c',
+            'question_6': 'a', 'question_7': 'a', 'question_8': 'c', 'question_9': ['a', 'b'],
+        }
+
+    def test_multi_select_question_can_be_answered_correctly(self):
+        response = self.client.post(reverse('course_test', kwargs={'course_name': 'Backend'}), self.correct)
+        self.assertEqual(response.context['correct_answers'], 9)
+        self.assertEqual(response.context['percentage'], 100)
+
+    def test_partial_multi_select_is_wrong(self):
+        answers = dict(self.correct, question_9='a')
+        response = self.client.post(reverse('course_test', kwargs={'course_name': 'Backend'}), answers)
+        self.assertEqual(response.context['correct_answers'], 8)
+        self.assertFalse(response.context['results'][-1]['is_correct'])
+        self.assertEqual(response.context['results'][-1]['correct_answer_text'], 'print, input')
+
+    def test_unanswered_question_is_rejected(self):
+        answers = dict(self.correct)
+        del answers['question_3']
+        response = self.client.post(reverse('course_test', kwargs={'course_name': 'Backend'}), answers)
+        self.assertTemplateUsed(response, 'course_test.html')
+        self.assertEqual(response.context['error'], 'Пожалуйста, ответьте на все вопросы.')
+
+    def test_favorite_progress_only_increases(self):
+        favorite = FavoriteCourse.objects.create(user=self.user, course_name='Frontend', progress=60)
+        url = reverse('course_test', kwargs={'course_name': 'Frontend'})
+        wrong = {f'question_{i}': 'd' for i in range(1, 6)}
+        self.client.post(url, wrong)
+        favorite.refresh_from_db()
+        self.assertEqual(favorite.progress, 60)
+        self.client.post(url, {'question_1': 'a', 'question_2': 'b', 'question_3': 'c', 'question_4': 'a',
+                               'question_5': 'b'})
+        favorite.refresh_from_db()
+        self.assertEqual(favorite.progress, 100)
+
+    def test_unknown_course_has_no_quiz(self):
+        response = self.client.get(reverse('course_test', kwargs={'course_name': 'Rust'}))
+        self.assertEqual(response.context['error'], 'Тест для этого курса ещё не готов.')
+
+
+class SurveySubmissionTests(APITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.answers = {f'q{i}': 3 if i % 2 else 2 for i in range(1, 11)}
+
+    def test_html_single_page_submission(self):
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('api_survey', kwargs={'survey_type': 'backend'}), {'mode': 'single'})
+        self.assertContains(response, 'name="q10"')
+        response = self.client.post(reverse('api_survey', kwargs={'survey_type': 'backend'}),
+                                    {'mode': 'single', **self.answers})
+        self.assertRedirects(response, reverse('course_detail', kwargs={'slug': 'backend-разработка-с-python'}))
+        survey = Survey.objects.get(user=self.user)
+        self.assertEqual(survey.survey_type, 'backend')
+        self.assertEqual(survey.answers, self.answers)
+        self.assertEqual(survey.recommended_course.title, 'Backend-разработка с Python')
+
+    def test_course_resolution_key_and_race(self):
+        import warnings
+        from unittest import mock
+        from django.core.cache import CacheKeyWarning
+        from django.db.models.signals import post_delete
+        from courses.surveys import resolve_course_id
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            course_id = resolve_course_id('Backend-разработка с Python', 'backend', self.user)
+            self.assertEqual(resolve_course_id('Backend-разработка с Python', 'backend', self.user), course_id)
+
+        # Параллельный запрос уже создал курс, а поиск по названию его ещё не увидел
+        from django.core.cache import cache
+        cache.clear()
+        deleted = []
+
+        def course_deleted(sender, instance, **kwargs):
+            deleted.append(instance.pk)
+        post_delete.connect(course_deleted, sender=Course)
+        self.addCleanup(post_delete.disconnect, course_deleted, sender=Course)
+        with mock.patch('courses.surveys.find_course_id', return_value=None):
+            self.assertEqual(resolve_course_id('Backend-разработка с Python', 'backend', self.user), course_id)
+        self.assertEqual(Course.objects.count(), 1)
+        self.assertEqual(deleted, [])
+
+    def test_html_single_page_requires_all_answers(self):
+        self.client.login(username='testuser', password='testpass123')
+        answers = dict(self.answers)
+        del answers['q5']
+        response = self.client.post(reverse('api_survey', kwargs={'survey_type': 'backend'}),
+                                    {'mode': 'single', **answers})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Survey.objects.exists())
+
+    def test_json_submission_scores_and_reuses_course(self):
+        self.client.force_authenticate(self.user)
+        url = reverse('survey_submit')
+        response = self.client.post(url, {'survey_type': 'devops', 'answers': self.answers}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['score'], 25)
+        self.assertEqual(response.data['max_score'], 30)
+        course_id = response.data['recommended_course']['id']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'survey_type': 'devops', 'answers': self.answers}, format='json')
+        self.assertEqual(response.data['recommended_course']['id'], course_id)
+        self.assertEqual(Course.objects.filter(title='DevOps и администрирование').count(), 1)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('INSERT INTO "courses_survey"')]), 1)
+        self.assertFalse([q for q in queries if 'courses_course' in q['sql']])
+
+    def test_json_submission_rejects_invalid_answer(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(reverse('survey_submit'),
+                                    {'survey_type': 'devops', 'answers': dict(self.answers, q1=7)}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('q1', response.data['answers'])
+
+    def test_step_by_step_flow_still_works(self):
+        self.client.login(username='testuser', password='testpass123')
+        url = reverse('api_survey', kwargs={'survey_type': 'frontend'})
+        self.client.get(url)
+        for question_id, value in self.answers.items():
+            response = self.client.post(url, {'current_question': question_id, question_id: value})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Survey.objects.get(user=self.user).answers, self.answers)
+
+
+class SurveyAnalyticsTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='password')
+        self.client.force_authenticate(self.admin)
+
+    def _create(self, survey_type, answers):
+        return Survey.objects.create(user=self.admin, survey_type=survey_type, answers=answers)
+
+    def test_incremental_aggregates_match_rebuild(self):
+        from courses.analytics import rebuild_stats, stats_report
+        self._create('backend', {'q1': 3, 'q2': 2})
+        self._create('backend', {'q1': 3, 'q2': 0})
+        self._create('devops', {'q1': 1})
+        self._create('devops', {'q1': 'bad'})
+        incremental = stats_report()
+        self.assertEqual(incremental['backend']['questions']['q1'], {3: 2})
+        self.assertEqual(incremental['backend']['scores'], {3: 1, 5: 1})
+        self.assertEqual(incremental['devops']['total'], 2)
+
+        rebuild_stats(chunk_size=3)
+        self.assertEqual(stats_report(), incremental)
+
+    def test_update_moves_answers_between_aggregates(self):
+        from courses.analytics import rebuild_stats, stats_report
+        survey = self._create('backend', {'q1': 3, 'q2': 2})
+        url = reverse('survey_detail', kwargs={'pk': survey.pk})
+        response = self.client.patch(url, {'answers': {'q1': 1, 'q2': 2}}, format='json')
+        self.assertEqual(response.status_code, 200)
+        survey = Survey.objects.get(pk=survey.pk)
+        survey.answers['q2'] = 0
+        survey.save()
+        report = stats_report()
+        self.assertEqual(report['backend']['questions'], {'q1': {1: 1}, 'q2': {0: 1}})
+        self.assertEqual(report['backend']['scores'], {1: 1})
+        rebuild_stats()
+        self.assertEqual(stats_report(), report)
+
+    def test_delete_removes_answers_from_aggregates(self):
+        from courses.analytics import stats_report
+        self._create('backend', {'q1': 3})
+        survey = self._create('backend', {'q1': 2})
+        response = self.client.delete(reverse('survey_detail', kwargs={'pk': survey.pk}))
+        self.assertEqual(response.status_code, 204)
+        report = stats_report()
+        self.assertEqual(report['backend']['questions'], {'q1': {3: 1}})
+        self.assertEqual(report['backend']['total'], 1)
+
+    def test_only_known_types_questions_and_values_are_recorded(self):
+        from courses.analytics import rebuild_stats, stats_report
+        from courses.models import SurveyStat
+        self._create('made-up', {'q1': 3})
+        self._create('backend', {'q1': 99, 'extra': 1, 'q2': 2})
+        report = stats_report()
+        self.assertEqual(list(report), ['backend'])
+        self.assertEqual(report['backend']['questions'], {'q2': {2: 1}})
+        self.assertEqual(report['backend']['scores'], {2: 1})
+        self.assertEqual(SurveyStat.objects.count(), 2)
+        rebuild_stats()
+        self.assertEqual(stats_report(), report)
+
+    def test_analytics_endpoint(self):
+        self._create('frontend', {'q1': 2})
+        response = self.client.get(reverse('survey_analytics'), {'survey_type': 'frontend'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['frontend']['total'], 1)
+        self.assertEqual(list(response.data), ['frontend'])
+
+    def test_analytics_endpoint_is_staff_only(self):
+        user = User.objects.create_user(username='user', password='password')
+        self.client.force_authenticate(user)
+        response = self.client.get(reverse('survey_analytics'))
+        self.assertEqual(response.status_code, 403)
+
+
+class RecommenderTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from courses.recommender import recommender
+        cache.clear()
+        recommender.invalidate()
+        self.recommender = recommender
+        self.admin = User.objects.create_superuser(username='admin', password='password')
+        now = timezone.now()
+        self.backend = Course.objects.create(title='Backend-разработка с Python', description='',
+                                             instructor=self.admin, start_date=now, end_date=now)
+        self.api_course = Course.objects.create(title='API design', description='',
+                                                instructor=self.admin, start_date=now, end_date=now)
+        self.pattern = {f'q{i}': 3 if i <= 5 else 0 for i in range(1, 11)}
+        for i in range(3):
+            user = User.objects.create_user(username=f'student{i}', password='password')
+            Enrollment.objects.create(user=user, course=self.api_course)
+            Survey.objects.create(user=user, survey_type='backend', answers=self.pattern)
+
+    def test_prior_profile_for_mapped_course(self):
+        answers = {f'q{i}': 3 for i in range(1, 11)}
+        top = self.recommender.top_k('backend', answers, k=2)
+        self.assertEqual(top[0]['id'], self.backend.id)
+        self.assertAlmostEqual(top[0]['score'], 1.0, places=3)
+
+    def test_learned_profile_from_enrolled_users(self):
+        top = self.recommender.top_k('backend', self.pattern, k=2)
+        self.assertEqual([c['id'] for c in top], [self.api_course.id, self.backend.id])
+
+    def test_unrelated_survey_type_scores_nothing(self):
+        self.assertEqual(self.recommender.top_k('devops', {'q1': 3}), [])
+
+    def test_incremental_update_on_course_changes(self):
+        self.recommender.top_k('backend', self.pattern)
+        self.api_course.delete()
+        top = self.recommender.top_k('backend', self.pattern)
+        self.assertEqual([c['id'] for c in top], [self.backend.id])
+        renamed = Course.objects.create(title='Backend-разработка с Python', description='',
+                                        instructor=self.admin, start_date=timezone.now(), end_date=timezone.now())
+        top = self.recommender.top_k('backend', self.pattern)
+        self.assertIn(renamed.id, [c['id'] for c in top])
+
+    def test_other_process_applies_changes_without_rebuild(self):
+        from unittest import mock
+        from courses.recommender import CourseRecommender
+        other = CourseRecommender()
+        other.top_k('backend', self.pattern)
+        self.api_course.delete()
+        created = Course.objects.create(title='Backend-разработка с Python', description='',
+                                        instructor=self.admin, start_date=timezone.now(), end_date=timezone.now())
+        with mock.patch('courses.recommender.SYNC_INTERVAL', 0), \
+                mock.patch.object(other, 'rebuild', side_effect=AssertionError('full rebuild')):
+            top = other.top_k('backend', self.pattern)
+        self.assertEqual({c['id'] for c in top}, {self.backend.id, created.id})
+
+    def test_batch_rescore(self):
+        Survey.objects.update(recommended_course=None)
+        updated = self.recommender.rescore(chunk_size=2)
+        self.assertEqual(updated, 3)
+        self.assertEqual(set(Survey.objects.values_list('recommended_course_id', flat=True)), {self.api_course.id})
+
+    def test_submission_returns_top_k(self):
+        client = Client()
+        client.force_login(self.admin)
+        response = client.post(reverse('survey_submit'), {'survey_type': 'backend', 'answers': self.pattern},
+                               content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['recommended_course']['id'], self.api_course.id)
+        self.assertEqual(len(data['recommendations']), 2)
+
+
+class EnrollmentProgressRollupTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='password')
+        self.admin = User.objects.create_superuser(username='admin', password='password')
+        now = timezone.now()
+        self.course = Course.objects.create(title='Backend', description='', instructor=self.admin,
+                                            start_date=now, end_date=now)
+        self.modules = [Module.objects.create(title=f'M{i}', description='', course=self.course) for i in range(4)]
+        self.enrollment = Enrollment.objects.create(user=self.user, course=self.course)
+
+    def rollup(self):
+        self.enrollment.refresh_from_db()
+        return self.enrollment.progress_points, self.enrollment.completed_modules
+
+    def test_module_count_follows_modules(self):
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.module_count, 4)
+        self.modules[0].delete()
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.module_count, 3)
+
+    def test_progress_writes_update_rollup(self):
+        first = UserProgress.objects.create(user=self.user, course=self.course, module=self.modules[0], progress=40)
+        UserProgress.objects.create(user=self.user, course=self.course, module=self.modules[1], progress=100)
+        self.assertEqual(self.rollup(), (140, 1))
+
+        first = UserProgress.objects.get(pk=first.pk)
+        first.progress = 100
+        first.save()
+        self.assertEqual(self.rollup(), (200, 2))
+        first.progress = 150
+        first.save()
+        self.assertEqual(self.rollup(), (200, 2))
+        first.delete()
+        self.assertEqual(self.rollup(), (100, 1))
+        self.assertEqual(self.enrollment.progress_percent, 25)
+
+    def test_rollup_update_is_single_statement(self):
+        UserProgress.objects.create(user=self.user, course=self.course, module=self.modules[0], progress=10)
+        progress = UserProgress.objects.get(module=self.modules[0])
+        progress.progress = 60
+        with CaptureQueriesContext(connection) as ctx:
+            progress.save()
+        enrollment_queries = [q['sql'] for q in ctx.captured_queries if 'courses_enrollment' in q['sql']]
+        self.assertEqual(len(enrollment_queries), 1)
+        self.assertTrue(enrollment_queries[0].startswith('UPDATE "courses_enrollment"'))
+        self.assertEqual(self.rollup(), (60, 0))
+
+    def test_concurrent_saves_do_not_drift(self):
+        UserProgress.objects.create(user=self.user, course=self.course, module=self.modules[0], progress=10)
+        # Два запроса прочитали строку с прогрессом 10 и сохраняют каждый своё значение
+        first = UserProgress.objects.get(module=self.modules[0])
+        second = UserProgress.objects.get(module=self.modules[0])
+        first.progress = 50
+        first.save()
+        second.progress = 30
+        second.save()
+        self.assertEqual(self.rollup(), (30, 0))
+
+    def test_enrollment_after_progress_picks_up_existing_rows(self):
+        other = User.objects.create_user(username='late', password='password')
+        UserProgress.objects.create(user=other, course=self.course, module=self.modules[0], progress=100)
+        enrollment = Enrollment.objects.create(user=other, course=self.course)
+        self.assertEqual((enrollment.progress_points, enrollment.completed_modules), (100, 1))
+
+    def test_enrollment_api_exposes_rollup(self):
+        for module, value in zip(self.modules, (100, 100, 50, 0)):
+            UserProgress.objects.create(user=self.user, course=self.course, module=module, progress=value)
+        self.client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('enrollment_detail', args=[self.enrollment.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['progress'], 62)
+        self.assertEqual(response.data['completed_modules'], 2)
+        self.assertEqual(response.data['total_modules'], 4)
+        self.assertFalse(any('courses_userprogress' in q['sql'] for q in ctx.captured_queries))
+
+    def test_seeded_progress_is_rolled_up(self):
+        seed_dataset(users=3, courses=2, modules=3, materials=0, enrollments=2, progress=2, surveys=0, favorites=0)
+        for enrollment in Enrollment.objects.filter(user__username__startswith='seed_user_'):
+            rows = UserProgress.objects.filter(user=enrollment.user_id, course=enrollment.course_id)
+            self.assertEqual(enrollment.progress_points, sum(min(max(p, 0), 100) for p in rows.values_list(
+                'progress', flat=True)))
+            self.assertEqual(enrollment.completed_modules, rows.filter(progress__gte=100).count())
+
+
+class UserProgressBulkTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='password')
+        self.admin = User.objects.create_superuser(username='admin', password='password')
+        now = timezone.now()
+        self.course = Course.objects.create(title='Backend', description='', instructor=self.admin,
+                                            start_date=now, end_date=now)
+        self.other_course = Course.objects.create(title='Frontend', description='', instructor=self.admin,
+                                                  start_date=now, end_date=now)
+        self.modules = [Module.objects.create(title=f'M{i}', description='', course=self.course) for i in range(3)]
+        self.foreign_module = Module.objects.create(title='F', description='', course=self.other_course)
+        self.enrollment = Enrollment.objects.create(user=self.user, course=self.course)
+        self.client.force_authenticate(self.user)
+
+    def post(self, items):
+        return self.client.post(reverse('progress_bulk'), items, format='json')
+
+    def test_upsert_is_monotonic_with_per_item_results(self):
+        UserProgress.objects.create(user=self.user, course=self.course, module=self.modules[0], progress=80)
+        UserProgress.objects.create(user=self.user, course=self.course, module=self.modules[1], progress=30)
+        response = self.post([
+            {'course': self.course.id, 'module': self.modules[0].id, 'progress': 50},
+            {'course': self.course.id, 'module': self.modules[1].id, 'progress': 100},
+            {'course': self.course.id, 'module': self.modules[2].id, 'progress': 40},
+            {'course': self.course.id, 'module': self.foreign_module.id, 'progress': 10},
+            {'course': self.course.id, 'module': self.modules[2].id, 'progress': 101},
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([r['status'] for r in data['results']],
+                         ['unchanged', 'updated', 'created', 'error', 'error'])
+        self.assertEqual((data['created'], data['updated'], data['unchanged'], data['error']), (1, 1, 1, 2))
+        self.assertEqual(data['results'][0]['progress'], 80)
+        self.assertIn('progress', data['results'][4]['errors'])
+        stored = dict(UserProgress.objects.filter(user=self.user).values_list('module_id', 'progress'))
+        self.assertEqual(stored, {self.modules[0].id: 80, self.modules[1].id: 100, self.modules[2].id: 40})
+
+        self.enrollment.refresh_from_db()
+        self.assertEqual((self.enrollment.progress_points, self.enrollment.completed_modules), (220, 1))
+
+    def test_single_insert_and_update_statement(self):
+        UserProgress.objects.create(user=self.user, course=self.course, module=self.modules[0], progress=10)
+        items = [{'course': self.course.id, 'module': module.id, 'progress': 50} for module in self.modules]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post(items)
+        self.assertEqual((response.json()['created'], response.json()['updated']), (2, 1))
+        writes = [q['sql'] for q in ctx.captured_queries if 'courses_userprogress' in q['sql'].split('SET')[0]
+                  and q['sql'].startswith(('INSERT', 'UPDATE'))]
+        self.assertEqual(len(writes), 2)
+        self.assertIn('"progress" < ', writes[1])
+
+    def test_overlapping_batches_keep_progress_and_rollups(self):
+        # Второй пакет прочитал строки до записи первого: вставка не перезаписывает, UPDATE не понижает,
+        # а сводка пересчитывается из строк, поэтому модуль не считается дважды
+        from unittest import mock
+        UserProgress.objects.create(user=self.user, course=self.course, module=self.modules[2], progress=30)
+        self.post([{'course': self.course.id, 'module': self.modules[0].id, 'progress': 100}])
+        with mock.patch('courses.progress.existing_progress', return_value={}):
+            response = self.post([
+                {'course': self.course.id, 'module': self.modules[0].id, 'progress': 60},
+                {'course': self.course.id, 'module': self.modules[1].id, 'progress': 50},
+                {'course': self.course.id, 'module': self.modules[2].id, 'progress': 90},
+            ])
+        self.assertEqual(response.status_code, 200)
+        stored = dict(UserProgress.objects.filter(user=self.user).values_list('module_id', 'progress'))
+        self.assertEqual(stored, {self.modules[0].id: 100, self.modules[1].id: 50, self.modules[2].id: 90})
+        self.enrollment.refresh_from_db()
+        self.assertEqual((self.enrollment.progress_points, self.enrollment.completed_modules), (240, 1))
+
+    def test_rejects_bad_payload(self):
+        self.assertEqual(self.post({'items': 'nope'}).status_code, 400)
+        self.assertEqual(self.post([]).status_code, 400)
+
+
+class CohortEnrollmentTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='password')
+        self.course = Course.objects.create(title='Backend', description='', instructor=self.admin,
+                                            start_date=timezone.now(), end_date=timezone.now())
+        User.objects.bulk_create([User(username=f'cohort_{i}') for i in range(5000)])
+        self.user_ids = list(User.objects.filter(username__startswith='cohort_').order_by('id')
+                             .values_list('id', flat=True))
+
+    def test_bulk_endpoint_reports_counts(self):
+        Enrollment.objects.create(user_id=self.user_ids[0], course=self.course)
+        self.client.force_authenticate(self.admin)
+        users = self.user_ids[:2000] + [f'cohort_{i}' for i in range(2000, 5000)] + ['ghost', 10 ** 9, None]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('enrollment_bulk'), {'course': self.course.id, 'users': users},
+                                        format='json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['created'], data['already_enrolled'], data['invalid']), (4999, 1, 3))
+        self.assertEqual(Enrollment.objects.filter(course=self.course).count(), 5000)
+        inserts = [q for q in ctx.captured_queries
+                   if q['sql'].startswith('INSERT') and 'INTO "courses_enrollment"' in q['sql']]
+        # SQLite ограничивает число параметров запроса, поэтому пачка в 1000 строк делится на несколько INSERT
+        self.assertLess(len(inserts), 50)
+
+        again = self.client.post(reverse('enrollment_bulk'), {'course': self.course.id, 'users': users[:10]},
+                                 format='json').json()
+        self.assertEqual((again['created'], again['already_enrolled']), (0, 10))
+
+    def test_staff_only(self):
+        user = User.objects.get(username='cohort_0')
+        self.client.force_authenticate(user)
+        response = self.client.post(reverse('enrollment_bulk'), {'course': self.course.id, 'users': [user.id]},
+                                    format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_new_enrollments_pick_up_existing_progress(self):
+        module = Module.objects.create(title='M', description='', course=self.course)
+        UserProgress.objects.create(user_id=self.user_ids[0], course=self.course, module=module, progress=100)
+        from courses.cohorts import enroll_cohort
+        enroll_cohort(self.course, self.user_ids[:3])
+        enrollment = Enrollment.objects.get(user_id=self.user_ids[0], course=self.course)
+        self.assertEqual((enrollment.progress_points, enrollment.completed_modules), (100, 1))
+
+    def test_management_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('enroll_cohort', self.course.id, '--usernames', 'cohort_1', 'cohort_2', 'ghost',
+                     '--user-ids', str(self.user_ids[1]), stdout=out, stderr=StringIO())
+        self.assertIn('записано 2', out.getvalue())
+        self.assertIn('ghost', out.getvalue())
+
+
+class CourseDetailPageTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.admin = User.objects.create_superuser(username='admin', password='password')
+        now = timezone.now()
+        self.course = Course.objects.create(title='Backend-разработка с Python', description='Описание',
+                                            instructor=self.admin, start_date=now, end_date=now)
+        Module.objects.create(title='Введение', description='', course=self.course)
+
+    def test_slug_is_unique_and_stable(self):
+        self.assertEqual(self.course.slug, 'backend-разработка-с-python')
+        twin = Course.objects.create(title='Backend-разработка с Python', description='', instructor=self.admin,
+                                     end_date=timezone.now())
+        self.assertEqual(twin.slug, 'backend-разработка-с-python-2')
+        self.course.title = 'Backend на Python'
+        self.course.save()
+        self.assertEqual(self.course.slug, 'backend-разработка-с-python')
+
+    def test_cached_page_skips_orm(self):
+        url = reverse('course_detail', kwargs={'slug': self.course.slug})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertContains(response, 'admin')
+        self.assertContains(response, 'Введение')
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertIn('INNER JOIN "auth_user"', ctx.captured_queries[0]['sql'])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertContains(response, 'Введение')
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_course_and_module_saves_invalidate_page(self):
+        url = reverse('course_detail', kwargs={'slug': self.course.slug})
+        self.client.get(url)
+        self.course.description = 'Новое описание'
+        self.course.save()
+        self.assertContains(self.client.get(url), 'Новое описание')
+        Module.objects.create(title='Второй модуль', description='', course=self.course)
+        self.assertContains(self.client.get(url), 'Второй модуль')
+        self.admin.username = 'teacher'
+        self.admin.save()
+        self.assertContains(self.client.get(url), 'teacher')
+
+    def test_title_urls_redirect_to_slug(self):
+        import warnings
+        from django.core.cache import CacheKeyWarning
+        with warnings.catch_warnings():
+            # Название с пробелами и кириллицей попадает в ключ кэша страницы только в виде хэша
+            warnings.simplefilter('error', CacheKeyWarning)
+            response = self.client.get(reverse('course_detail', kwargs={'slug': self.course.title}))
+        self.assertRedirects(response, reverse('course_detail', kwargs={'slug': self.course.slug}),
+                             status_code=301)
+        self.assertEqual(self.client.get(reverse('course_detail', kwargs={'slug': 'missing'})).status_code, 404)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='mobile', password='password')
+        now = timezone.now()
+        self.course = Course.objects.create(title='Backend', description='', instructor=self.user,
+                                            start_date=now, end_date=now)
+        self.modules = [Module.objects.create(title=f'M{i}', description='', course=self.course) for i in range(3)]
+        self.client.force_authenticate(self.user)
+
+    def test_detail_revalidates_without_serializing(self):
+        url = reverse('module_detail', kwargs={'pk': self.modules[0].pk})
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn('Last-Modified', response)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        self.modules[0].title = 'Renamed'
+        self.modules[0].save()
+        response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_etag_tracks_writes_and_deletes(self):
+        url = reverse('module_list_create')
+        etag = self.client.get(url, format='json')['ETag']
+        self.assertEqual(self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertNotEqual(self.client.get(url + '?page=2', format='json').get('ETag'), etag)
+
+        self.modules[1].delete()
+        response = self.client.get(url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+
+    def test_list_ignores_if_modified_since(self):
+        from django.utils.http import http_date
+        url = reverse('module_list_create')
+        response = self.client.get(url, format='json')
+        self.assertNotIn('Last-Modified', response)
+        self.modules[1].delete()
+        since = http_date(time.time() + 60)
+        response = self.client.get(url, format='json', HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+
+    def test_if_modified_since(self):
+        url = reverse('course_detail_api', kwargs={'pk': self.course.pk})
+        last_modified = self.client.get(url, format='json')['Last-Modified']
+        response = self.client.get(url, format='json', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        Course.objects.filter(pk=self.course.pk).update(updated_at=timezone.now() + timezone.timedelta(minutes=1))
+        response = self.client.get(url, format='json', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_object_is_still_404(self):
+        response = self.client.get(reverse('material_detail', kwargs={'pk': 999}), format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response)
+
+
+class SharedCacheTests(SimpleTestCase):
+    def test_version_bumps_are_unique_without_incr(self):
+        from unittest import mock
+        from courses.versions import bump_version, get_version
+        key = 'courses:test:version'
+        first = get_version(key)
+        with mock.patch('django.core.cache.backends.locmem.LocMemCache.incr', side_effect=AssertionError('incr')):
+            bump_version(key)
+            second = get_version(key)
+            bump_version(key)
+        self.assertEqual(len({first, second, get_version(key)}), 3)
+
+    def test_deploy_check_rejects_process_local_cache(self):
+        from courses.checks import shared_cache_check
+        self.assertEqual([e.id for e in shared_cache_check(None)], ['courses.W002'])
+        file_cache = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                  'LOCATION': '/tmp/courses-test-cache'}}
+        with override_settings(CACHES=file_cache):
+            self.assertEqual(shared_cache_check(None), [])
+
+
+class CourseTreeTests(APITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username='student', password='password')
+        now = timezone.now()
+        self.course = Course.objects.create(title='Backend', description='', instructor=self.user,
+                                            start_date=now, end_date=now)
+        self.other = Course.objects.create(title='Frontend', description='', instructor=self.user,
+                                           start_date=now, end_date=now)
+        self.modules = [Module.objects.create(title=f'M{i}', description='', course=self.course) for i in range(3)]
+        for module in self.modules:
+            for j in range(4):
+                Material.objects.create(title=f'{module.title}.{j}', type='text', content='', module=module)
+        Module.objects.create(title='Other', description='', course=self.other)
+        self.url = reverse('course_tree', kwargs={'pk': self.course.pk})
+        self.client.force_authenticate(self.user)
+
+    def test_tree_uses_three_queries_then_cache(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 3)
+        data = response.json()
+        self.assertEqual([m['title'] for m in data['modules']], ['M0', 'M1', 'M2'])
+        self.assertEqual(len(data['modules'][0]['materials']), 4)
+
+        with CaptureQueriesContext(connection) as ctx:
+            cached = self.client.get(self.url)
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=cached['ETag']).status_code, 304)
+
+    def test_module_and_material_changes_invalidate(self):
+        self.client.get(self.url)
+        material = Material.objects.filter(module=self.modules[0]).first()
+        material.title = 'Updated material'
+        material.save()
+        self.assertContains(self.client.get(self.url), 'Updated material')
+
+        material.module = Module.objects.get(course=self.other)
+        material.save()
+        self.assertNotContains(self.client.get(self.url), 'Updated material')
+
+        self.modules[2].delete()
+        self.assertEqual(len(self.client.get(self.url).json()['modules']), 2)
+
+    def test_other_course_changes_keep_cache(self):
+        self.client.get(self.url)
+        Module.objects.create(title='Another', description='', course=self.other)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_missing_course(self):
+        self.assertEqual(self.client.get(reverse('course_tree', kwargs={'pk': 999})).status_code, 404)
+
+
+class ValuesSerializerTests(APITestCase):
+    def setUp(self):
+        seed_dataset(users=6, courses=3, modules=2, materials=2, enrollments=2, progress=2, surveys=1, favorites=2)
+        self.user = User.objects.get(username='seed_admin')
+        self.client.force_authenticate(self.user)
+
+    def test_output_is_byte_identical(self):
+        from courses.benchmarks import benchmark_serializers
+        results = benchmark_serializers(rows=100, repeat=1)
+        self.assertEqual(len(results), 7)
+        for name, result in results.items():
+            self.assertTrue(result['rows'], name)
+            self.assertTrue(result['identical'], name)
+
+    def test_list_endpoint_matches_model_serializer(self):
+        from rest_framework.renderers import JSONRenderer
+        from rest_framework.test import APIRequestFactory
+        from courses.serializers import EnrollmentSerializer
+        response = self.client.get(reverse('enrollment_list_create'), {'page_size': 5}, format='json')
+        ids = [item['id'] for item in response.data['results']]
+        enrollments = sorted(Enrollment.objects.select_related('course').filter(id__in=ids), key=lambda e: ids.index(e.id))
+        request = APIRequestFactory().get('/')
+        expected = EnrollmentSerializer(enrollments, many=True, context={'request': request}).data
+        self.assertEqual(JSONRenderer().render(response.data['results']), JSONRenderer().render(expected))
+
+    def test_file_urls_are_absolute(self):
+        material = Material.objects.first()
+        material.file.name = 'materials/notes.pdf'
+        material.save()
+        response = self.client.get(reverse('material_list_create'), {'page_size': 100}, format='json')
+        files = [item['file'] for item in response.data['results'] if item['file']]
+        self.assertEqual(files, ['http://testserver/media/materials/notes.pdf'])
+
+    def test_unstored_fields_must_be_declared(self):
+        from django.core.exceptions import ImproperlyConfigured
+        from courses.fast_serializers import EnrollmentValuesSerializer
+
+        class Incomplete(EnrollmentValuesSerializer):
+            computed = {}
+
+        with self.assertRaises(ImproperlyConfigured):
+            Incomplete()
+
+
+class MaterialDownloadTests(APITestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.core.files.base import ContentFile
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root, MATERIAL_ACCEL_REDIRECT='')
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.user = User.objects.create_user(username='student', password='password')
+        self.stranger = User.objects.create_user(username='stranger', password='password')
+        now = timezone.now()
+        course = Course.objects.create(title='Video', description='', instructor=self.user,
+                                       start_date=now, end_date=now)
+        module = Module.objects.create(title='M', description='', course=course)
+        Enrollment.objects.create(user=self.user, course=course)
+        self.data = bytes(range(256)) * 40
+        self.material = Material(title='Lecture', type='video', content='', module=module)
+        self.material.file.save('lecture.bin', ContentFile(self.data), save=True)
+        self.url = reverse('material_download', kwargs={'pk': self.material.pk})
+        self.client.force_authenticate(self.user)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.data)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(int(response['Content-Length']), len(self.data))
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        self.assertTrue(self.client.get(self.url + '?download=1')['Content-Disposition'].startswith('attachment'))
+
+    def test_single_and_suffix_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), self.data[100:200])
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.data)}')
+        self.assertEqual(response['Content-Length'], '100')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), self.data[-10:])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10000-')
+        self.assertEqual(self.body(response), self.data[10000:])
+
+    def test_multiple_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9, 500-509, 5-12')
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response['Content-Type'].startswith('multipart/byteranges; boundary='))
+        body = self.body(response)
+        self.assertEqual(int(response['Content-Length']), len(body))
+        size = len(self.data)
+        self.assertIn(f'Content-Range: bytes 0-12/{size}\r\n\r\n'.encode() + self.data[0:13], body)
+        self.assertIn(f'Content-Range: bytes 500-509/{size}\r\n\r\n'.encode() + self.data[500:510], body)
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.data)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.data)}')
+
+    def test_validators(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.data)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+    def test_accel_redirect(self):
+        with override_settings(MATERIAL_ACCEL_REDIRECT='/protected/'):
+            response = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/' + self.material.file.name)
+        self.assertEqual(response.content, b'')
+
+    def test_requires_enrollment(self):
+        self.client.force_authenticate(self.stranger)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get(self.url).status_code, (401, 403))
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(reverse('material_download', kwargs={'pk': 999999})).status_code, 404)
+
+
+class MaterialUploadTests(APITestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.admin = User.objects.create_user(username='admin', password='password', is_staff=True)
+        now = timezone.now()
+        course = Course.objects.create(title='Video', description='', instructor=self.admin,
+                                       start_date=now, end_date=now)
+        self.module = Module.objects.create(title='M', description='', course=course)
+        self.client.force_authenticate(self.admin)
+
+    def start(self, data, chunk_size):
+        from unittest import mock
+        with mock.patch('courses.uploads.CHUNK_SIZE', chunk_size):
+            response = self.client.post(reverse('material_upload_start'),
+                                        {'filename': '../lecture.bin', 'size': len(data)}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def put_chunk(self, upload, index, body, **headers):
+        url = reverse('material_upload_chunk', kwargs={'pk': upload['id'], 'index': index})
+        return self.client.put(url, body, content_type='application/octet-stream', **headers)
+
+    def test_out_of_order_resume_and_finalize(self):
+        import hashlib
+        import os
+        data = os.urandom(2500)
+        upload = self.start(data, 1000)
+        self.assertEqual((upload['chunk_count'], upload['received']), (3, []))
+
+        self.assertEqual(self.put_chunk(upload, 2, data[2000:]).status_code, 200)
+        response = self.put_chunk(upload, 0, data[:1000],
+                                  HTTP_X_CHUNK_SHA256=hashlib.sha256(data[:1000]).hexdigest())
+        self.assertEqual(response.json()['sha256'], hashlib.sha256(data[:1000]).hexdigest())
+        status_url = reverse('material_upload_detail', kwargs={'pk': upload['id']})
+        self.assertEqual(self.client.get(status_url).json()['received'], [0, 2])
+
+        finalize_url = reverse('material_upload_finalize', kwargs={'pk': upload['id']})
+        payload = {'title': 'Lecture', 'type': 'video', 'module': self.module.id}
+        self.assertEqual(self.client.post(finalize_url, payload, format='json').status_code, 400)
+
+        self.assertEqual(self.put_chunk(upload, 1, data[1000:2000]).status_code, 200)
+        expected = hashlib.sha256(b''.join(hashlib.sha256(data[i:i + 1000]).digest()
+                                           for i in range(0, 2500, 1000))).hexdigest()
+        response = self.client.post(finalize_url, {**payload, 'sha256': expected}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['sha256'], expected)
+
+        material = Material.objects.get(pk=response.json()['id'])
+        self.assertTrue(material.file.name.startswith('materials/sha256/'))
+        self.assertTrue(material.file.name.endswith('.bin'))
+        with material.file.open('rb') as file:
+            self.assertEqual(file.read(), data)
+        self.assertFalse(MaterialUpload.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'uploads')), [])
+
+    def test_rejects_bad_chunks(self):
+        import os
+        data = os.urandom(1500)
+        upload = self.start(data, 1000)
+        self.assertEqual(self.put_chunk(upload, 0, data[:999]).status_code, 400)
+        self.assertEqual(self.put_chunk(upload, 1, data[1000:] + b'x').status_code, 400)
+        self.assertEqual(self.put_chunk(upload, 2, b'').status_code, 400)
+        self.assertEqual(self.put_chunk(upload, 0, data[:1000], HTTP_X_CHUNK_SHA256='0' * 64).status_code, 400)
+        self.assertFalse(MaterialUploadChunk.objects.exists())
+
+        self.assertEqual(self.put_chunk(upload, 0, data[:1000]).status_code, 200)
+        self.assertEqual(self.put_chunk(upload, 1, data[1000:]).status_code, 200)
+        finalize_url = reverse('material_upload_finalize', kwargs={'pk': upload['id']})
+        response = self.client.post(finalize_url, {'title': 'L', 'type': 'pdf', 'module': self.module.id,
+                                                   'sha256': '0' * 64}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_replace_file_of_existing_material_and_discard(self):
+        import os
+        material = Material.objects.create(title='Old', type='pdf', content='', module=self.module)
+        data = os.urandom(10)
+        upload = self.start(data, 1000)
+        self.put_chunk(upload, 0, data)
+        finalize_url = reverse('material_upload_finalize', kwargs={'pk': upload['id']})
+        self.assertEqual(self.client.post(finalize_url, {'material': material.id}, format='json').status_code, 200)
+        material.refresh_from_db()
+        self.assertEqual(material.title, 'Old')
+        self.assertTrue(material.file.name.startswith('materials/'))
+
+        upload = self.start(data, 1000)
+        url = reverse('material_upload_detail', kwargs={'pk': upload['id']})
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(MaterialUpload.objects.exists())
+
+    def test_staff_only(self):
+        self.client.force_authenticate(User.objects.create_user(username='student', password='password'))
+        response = self.client.post(reverse('material_upload_start'), {'filename': 'a', 'size': 1}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        user = User.objects.create_user(username='admin', password='password')
+        now = timezone.now()
+        course = Course.objects.create(title='Docs', description='', instructor=user, start_date=now, end_date=now)
+        self.module = Module.objects.create(title='M', description='', course=course)
+
+    def material(self, filename, data):
+        from django.core.files.base import ContentFile
+        material = Material(title=filename, type='pdf', content='', module=self.module)
+        material.file.save(filename, ContentFile(data), save=True)
+        return material
+
+    def test_digest_matches_chunk_digests(self):
+        import hashlib
+        import os
+        from courses.storage import ContentDigest, tree_digest
+        data = os.urandom(2500)
+        digest = ContentDigest(chunk_size=1000)
+        for offset in range(0, len(data), 333):
+            digest.update(data[offset:offset + 333])
+        self.assertEqual(digest.hexdigest(), tree_digest(
+            [hashlib.sha256(data[i:i + 1000]).hexdigest() for i in range(0, 2500, 1000)]))
+
+    def test_same_content_is_stored_once(self):
+        import os
+        first = self.material('a.pdf', b'same bytes')
+        second = self.material('b.pdf', b'same bytes')
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertTrue(first.file.name.startswith('materials/sha256/'))
+        path = first.file.path
+        self.assertEqual(StoredBlob.objects.get(name=first.file.name).refcount, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(StoredBlob.objects.get(name=second.file.name).refcount, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(StoredBlob.objects.exists())
+
+    def test_replacing_file_releases_old_blob(self):
+        import os
+        from django.core.files.base import ContentFile
+        material = self.material('a.pdf', b'old')
+        old_path = material.file.path
+        material = Material.objects.get(pk=material.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            material.file.save('a.pdf', ContentFile(b'new'), save=True)
+        self.assertFalse(os.path.exists(old_path))
+        self.assertEqual(list(StoredBlob.objects.values_list('name', 'refcount')), [(material.file.name, 1)])
+
+        material.title = 'Renamed'
+        material.save()
+        self.assertEqual(StoredBlob.objects.get().refcount, 1)
+
+    def test_dedupe_command_moves_legacy_files(self):
+        import os
+        from django.core.management import call_command
+        legacy = os.path.join(self.media_root, 'materials')
+        os.makedirs(legacy)
+        for name, data in (('a.pdf', b'shared'), ('b.pdf', b'shared'), ('c.pdf', b'unique')):
+            with open(os.path.join(legacy, name), 'wb') as file:
+                file.write(data)
+        materials = [Material.objects.create(title=name, type='pdf', content='', module=self.module,
+                                             file=f'materials/{name}') for name in ('a.pdf', 'b.pdf', 'c.pdf')]
+
+        call_command('dedupe_materials', stdout=open(os.devnull, 'w'))
+        names = [Material.objects.get(pk=material.pk).file.name for material in materials]
+        self.assertEqual(names[0], names[1])
+        self.assertNotEqual(names[0], names[2])
+        self.assertEqual(sorted(os.listdir(legacy)), ['sha256'])
+        self.assertEqual(dict(StoredBlob.objects.values_list('name', 'refcount')), {names[0]: 2, names[2]: 1})
+        with open(os.path.join(self.media_root, names[0]), 'rb') as file:
+            self.assertEqual(file.read(), b'shared')
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='password')
+        now = timezone.now()
+        self.course = Course.objects.create(title='Django для начинающих', description='Веб-разработка на Python',
+                                            instructor=self.user, start_date=now, end_date=now)
+        self.module = Module.objects.create(title='Модели', description='ORM и миграции', course=self.course)
+        self.material = Material.objects.create(title='Запросы', type='text', module=self.module,
+                                                content='Фильтрация через ORM: filter, exclude и <script>')
+        Material.objects.create(title='Видео про ORM', type='video', content='orm orm orm', module=self.module)
+        self.url = reverse('search')
+        self.client.force_authenticate(self.user)
+
+    def search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_ranked_and_highlighted(self):
+        results = self.search(q='orm')
+        self.assertEqual([(r['kind'], r['id']) for r in results][0], ('material', Material.objects.get(type='video').id))
+        self.assertEqual({r['kind'] for r in results}, {'module', 'material'})
+        text = next(r for r in results if r['id'] == self.material.id and r['kind'] == 'material')
+        self.assertIn('<mark>ORM</mark>', text['snippet'])
+        self.assertIn('&lt;script&gt;', text['snippet'])
+        self.assertEqual((text['course'], text['course_slug']), (self.course.id, self.course.slug))
+        # Текст видео не индексируется, только название
+        video = next(r for r in results if r['kind'] == 'material' and r['id'] != self.material.id)
+        self.assertEqual(video['snippet'], '')
+
+    def test_triggers_survive_migrations(self):
+        # Тестовая база собрана всеми миграциями: пересоздание таблицы курсов, модулей или материалов
+        # в новой миграции удалило бы триггеры, и этот тест упадёт
+        from django.core.checks import run_checks
+        from courses.search import missing_triggers
+        self.assertEqual(missing_triggers(), [])
+        self.assertEqual([e.id for e in run_checks(databases=['default']) if e.id.startswith('courses.')], [])
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER courses_module_search_update')
+        self.assertEqual(missing_triggers(), ['courses_module_search_update'])
+        self.assertIn('courses.W001', [e.id for e in run_checks(databases=['default'])])
+
+    def test_prefix_kind_and_syntax(self):
+        self.assertEqual([r['kind'] for r in self.search(q='разраб')], ['course'])
+        self.assertEqual([r['kind'] for r in self.search(q='orm', kind='module')], ['module'])
+        self.assertEqual(self.search(q='"orm" OR NEAR(('), self.search(q='orm OR near'))
+        self.assertEqual(self.client.get(self.url, {'q': ''}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'q': 'orm', 'kind': 'user'}).status_code, 400)
+
+    def test_index_follows_changes(self):
+        Material.objects.filter(pk=self.material.pk).update(content='Агрегации и аннотации')
+        self.assertEqual(self.search(q='аннотации')[0]['id'], self.material.id)
+        self.assertFalse(any(r['id'] == self.material.id for r in self.search(q='фильтрация')))
+
+        Course.objects.bulk_create([Course(title='Kubernetes', slug='kubernetes', description='', instructor=self.user,
+                                           start_date=timezone.now(), end_date=timezone.now())])
+        self.assertEqual(len(self.search(q='kubernetes')), 1)
+
+        self.course.delete()
+        self.assertEqual(self.search(q='orm'), [])
+
+    def test_rebuild_command(self):
+        from django.core.management import call_command
+        from io import StringIO
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM courses_search")
+        self.assertEqual(self.search(q='orm'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search(q='orm')), 3)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username='student', password='password')
+        now = timezone.now()
+        self.course = Course.objects.create(title='Python', description='Основы', instructor=self.user,
+                                            start_date=now, end_date=now)
+        Module.objects.create(title='Введение', description='', course=self.course)
+        CatalogCourse.objects.create(name='Python', icon='python.png', date=now.date())
+        FavoriteCourse.objects.create(user=self.user, course_name='Python', progress=40)
+        invalidate_catalog()
+
+    @override_settings(QUERY_STATS_HEADERS=True)
+    async def test_async_middleware_chain(self):
+        from django.test import AsyncClient
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        for name, kwargs, text in (
+            ('api_courses', {}, 'Python'),
+            ('favorites', {}, 'Python'),
+            ('api_profile', {}, 'student'),
+            ('course_detail', {'slug': self.course.slug}, 'Введение'),
+        ):
+            response = await client.get(reverse(name, kwargs=kwargs))
+            self.assertEqual(response.status_code, 200, name)
+            self.assertContains(response, text)
+            # Запросы асинхронного ORM учитываются middleware в потоке запроса
+            self.assertGreater(int(response['X-DB-Query-Count']), 0, name)
+
+        tree_url = reverse('course_tree', kwargs={'pk': self.course.pk})
+        response = await client.get(tree_url)
+        self.assertEqual(response.json()['modules'][0]['title'], 'Введение')
+        self.assertEqual((await client.get(tree_url, headers={'If-None-Match': response['ETag']})).status_code, 304)
+        self.assertEqual((await client.post(tree_url)).status_code, 405)
+
+    async def test_anonymous_and_token_access(self):
+        from django.test import AsyncClient
+        client = AsyncClient()
+        tree_url = reverse('course_tree', kwargs={'pk': self.course.pk})
+        self.assertEqual((await client.get(tree_url)).status_code, 403)
+        self.assertEqual((await client.get(reverse('favorites'))).status_code, 302)
+        self.assertEqual((await client.get(reverse('api_courses'))).status_code, 200)
+
+        token = await Token.objects.acreate(user=self.user)
+        response = await client.get(tree_url, headers={'Authorization': f'Token {token.key}'})
+        self.assertEqual(response.status_code, 200)
+        response = await client.get(tree_url, headers={'Authorization': 'Token wrong'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+        self.assertIn('detail', response.json())
+        response = await client.get(tree_url, headers={'Authorization': 'Bearer wrong'})
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+        response = await client.get(reverse('course_tree', kwargs={'pk': 999}),
+                                    headers={'Authorization': f'Token {token.key}'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    # Основная база и реплика — два отдельных файла SQLite; на «реплике» намеренно устаревшие данные.
+    # Соединения добавляются в setUpClass, поэтому '__all__', а не их имена: проверки запускаются раньше
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        import tempfile
+        from django.db import connections
+        from courses.models import SurveyStat
+        cls.tempdir = tempfile.TemporaryDirectory()
+        for alias, value in (('router_primary', 2), ('router_replica', 1)):
+            connections.settings[alias] = connections.configure_settings({
+                'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': f'{cls.tempdir.name}/{alias}.sqlite3'},
+            })['default']
+            with connections[alias].schema_editor() as editor:
+                editor.create_model(SurveyStat)
+            SurveyStat.objects.using(alias).create(survey_type='routing', question='q', value=value)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        from django.db import connections
+        super().tearDownClass()
+        for alias in ('router_primary', 'router_replica'):
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        cls.tempdir.cleanup()
+
+    def setUp(self):
+        from courses.routers import PrimaryReplicaRouter
+        router = PrimaryReplicaRouter(primary='router_primary', replicas=['router_replica'])
+        settings = override_settings(DATABASE_ROUTERS=[router], DATABASE_REPLICAS=['router_replica'])
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def request(self, method='get', cookies=None, write=False):
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from courses.middleware import ReplicaRoutingMiddleware
+        from courses.models import SurveyStat
+
+        def view(request):
+            if write:
+                SurveyStat.objects.create(survey_type='routing', question='w', value=3)
+            return HttpResponse(str(SurveyStat.objects.get(question='q').value))
+
+        factory = RequestFactory()
+        for name, value in (cookies or {}).items():
+            factory.cookies[name] = value
+        return ReplicaRoutingMiddleware(view)(getattr(factory, method)('/'))
+
+    def test_reads_go_to_replica_writes_to_primary(self):
+        from courses.models import SurveyStat
+        # Вне запроса — только основная база
+        self.assertEqual(SurveyStat.objects.get(question='q').value, 2)
+        response = self.request()
+        self.assertEqual(int(response.content), 1)
+        self.assertNotIn('db_primary', response.cookies)
+        # Небезопасный метод читает с основной базы
+        self.assertEqual(int(self.request('post').content), 2)
+
+    def test_read_your_writes(self):
+        from courses.models import SurveyStat
+        # После записи в том же запросе чтение уже с основной базы, ответ закрепляет клиента за ней
+        response = self.request(write=True)
+        self.assertEqual(int(response.content), 2)
+        self.assertIn('db_primary', response.cookies)
+        self.assertTrue(SurveyStat.objects.using('router_primary').filter(question='w').exists())
+        self.assertFalse(SurveyStat.objects.using('router_replica').filter(question='w').exists())
+        self.assertEqual(int(self.request(cookies={'db_primary': '1'}).content), 2)
+
+    def test_sqlite_pragmas(self):
+        from django.db import connections
+        with connections['router_primary'].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from courses.authentication import token_cache
+        cache.clear()
+        token_cache.clear()
+        self.user = User.objects.create_user(username='student', password='password')
+        self.token = Token.objects.create(user=self.user)
+
+    def authenticate(self, key=None):
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+        from courses.authentication import CachedTokenAuthentication
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {key or self.token.key}')
+        return CachedTokenAuthentication().authenticate(Request(request))
+
+    def test_cached_after_first_lookup(self):
+        with CaptureQueriesContext(connection) as queries:
+            user, token = self.authenticate()
+        self.assertEqual(len(queries), 1)
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+        self.assertEqual((user.pk, user.username, token.key, token.user), (self.user.pk, 'student', self.token.key, user))
+        self.assertTrue(user.is_authenticated)
+        # Хэш пароля не кэшируется и дочитывается по требованию
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password('password'))
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(self.client.get(reverse('course_list_create')).status_code, 200)
+
+    def test_revocation(self):
+        from rest_framework.exceptions import AuthenticationFailed
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+        self.user.is_active = True
+        self.user.save()
+        self.authenticate()
+        self.user.set_password('changed-password')
+        self.user.save()
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+        self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+        # Вход по сессии обновляет только last_login и кэш не сбрасывает
+        token = Token.objects.create(user=self.user)
+        self.authenticate(token.key)
+        self.client.login(username='student', password='changed-password')
+        with self.assertNumQueries(0):
+            self.authenticate(token.key)
+
+    @override_settings(TOKEN_SHARED_CACHE='default')
+    def test_shared_tier(self):
+        from django.core.cache import cache
+        from courses.authentication import shared_key, token_cache
+        self.authenticate()
+        self.assertIsNotNone(cache.get(shared_key(self.token.key)))
+        # Другой процесс: своего LRU нет, строка берётся из общего кэша без запросов к базе
+        token_cache.clear()
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+        key = self.token.key
+        self.token.delete()
+        self.assertIsNone(cache.get(shared_key(key)))
+
+    @override_settings(TOKEN_SHARED_CACHE='default')
+    def test_revocation_during_load_is_not_cached(self):
+        from unittest import mock
+        from rest_framework.exceptions import AuthenticationFailed
+        from courses.authentication import CachedTokenAuthentication, token_cache
+        load_row = CachedTokenAuthentication.load_row
+
+        def load_then_revoke(auth, key):
+            # Строка прочитана из базы, и до записи в общий кэш пользователя деактивируют
+            row = load_row(auth, key)
+            self.user.is_active = False
+            self.user.save()
+            return row
+
+        with mock.patch.object(CachedTokenAuthentication, 'load_row', load_then_revoke):
+            self.authenticate()
+        # Другой процесс: общий кэш не должен вернуть строку, прочитанную до отзыва
+        token_cache.clear()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    @override_settings(TOKEN_CACHE_SIZE=1)
+    def test_lru_and_ttl(self):
+        from unittest import mock
+        from courses.authentication import token_cache
+        other = Token.objects.create(user=User.objects.create_user(username='other', password='password'))
+        self.authenticate()
+        self.authenticate(other.key)
+        self.assertEqual(len(token_cache), 1)
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with mock.patch('courses.authentication.time.monotonic', return_value=time.monotonic() + 3600):
+            with self.assertNumQueries(1):
+                self.authenticate()
@@ -0,0 +1,95 @@
+import hashlib
+import os
+
+from django.db import IntegrityError, transaction
+
+from .models import MaterialUpload, MaterialUploadChunk
+from .storage import BLOB_CHUNK_SIZE, READ_SIZE, file_digest, material_storage, tree_digest
+
+# Размер части совпадает с куском хэша хранилища: сумма загрузки сразу служит адресом блоба
+CHUNK_SIZE = BLOB_CHUNK_SIZE
+MAX_UPLOAD_SIZE = 50 * 1024 ** 3
+UPLOADS_DIR = 'uploads'
+
+
+class UploadError(Exception):
+    pass
+
+
+def part_path(upload):
+    return material_storage.path(f'{UPLOADS_DIR}/{upload.pk}.part')
+
+
+def start_upload(user, filename, size):
+    upload = MaterialUpload.objects.create(user=user, filename=os.path.basename(filename), size=size,
+                                           chunk_size=CHUNK_SIZE)
+    path = part_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Файл сразу нужного размера: части пишутся на свои смещения в любом порядке и параллельно
+    with open(path, 'wb') as file:
+        file.truncate(size)
+    return upload
+
+
+def received_chunks(upload):
+    return list(upload.chunks.order_by('index').values_list('index', flat=True))
+
+
+def write_chunk(upload, index, stream, expected_sha256=None):
+    # Часть читается из тела запроса кусками и сразу пишется в итоговый файл, SHA-256 считается по пути.
+    # Повторная отправка той же части (обрыв соединения) просто перезаписывает её
+    if not 0 <= index < upload.chunk_count:
+        raise UploadError(f'Номер части должен быть от 0 до {upload.chunk_count - 1}.')
+    length = upload.chunk_length(index)
+    # Пока часть перезаписывается, прежняя сумма недействительна
+    MaterialUploadChunk.objects.filter(upload=upload, index=index).delete()
+    digest = hashlib.sha256()
+    remaining = length
+    with open(part_path(upload), 'r+b') as file:
+        file.seek(index * upload.chunk_size)
+        while data := stream.read(READ_SIZE):
+            if len(data) > remaining:
+                raise UploadError(f'Часть {index} длиннее {length} байт.')
+            file.write(data)
+            digest.update(data)
+            remaining -= len(data)
+    if remaining:
+        raise UploadError(f'Часть {index} должна содержать {length} байт.')
+    sha256 = digest.hexdigest()
+    if expected_sha256 and expected_sha256.lower() != sha256:
+        raise UploadError(f'Контрольная сумма части {index} не совпадает.')
+
+    try:
+        with transaction.atomic():
+            MaterialUploadChunk.objects.update_or_create(upload=upload, index=index, defaults={'sha256': sha256})
+    except IntegrityError:
+        # Та же часть пришла параллельно и уже записана
+        MaterialUploadChunk.objects.filter(upload=upload, index=index).update(sha256=sha256)
+    return sha256
+
+
+def finish_upload(upload, material, expected_sha256=None):
+    # Файл не перечитывается: сумма собирается из сумм частей, а сам файл становится блобом
+    # переносом в пределах хранилища (или удаляется, если такое содержимое уже есть)
+    digests = list(upload.chunks.order_by('index').values_list('sha256', flat=True))
+    if len(digests) != upload.chunk_count:
+        raise UploadError(f'Получено частей: {len(digests)} из {upload.chunk_count}.')
+    sha256 = tree_digest(digests)
+    if expected_sha256 and expected_sha256.lower() != sha256:
+        raise UploadError('Контрольная сумма файла не совпадает.')
+
+    path = part_path(upload)
+    # Загрузки, начатые с другим размером части, хэшируются заново
+    digest = sha256 if upload.chunk_size == BLOB_CHUNK_SIZE else file_digest(path)
+    material.file.name = material_storage.adopt(path, digest, upload.filename)
+    material.save()
+    upload.delete()
+    return sha256
+
+
+def discard_upload(upload):
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
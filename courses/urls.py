@@ -12,7 +12,7 @@ urlpatterns = [
     path('courses/list/', views.api_courses, name='api_courses'),
     path('course/create/', views.course_create, name='course_create'),
     path('course/<path:course_name>/test/', views.course_test, name='course_test'),
-    path('course/<path:course_name>/', views.course_detail, name='course_detail'),
+    path('course/<path:slug>/', views.course_detail, name='course_detail'),
     path('toggle_favorite/', views.toggle_favorite, name='toggle_favorite'),
     path('survey/<str:survey_type>/', views.api_survey, name='api_survey'),
     path('profile/', views.api_profile, name='api_profile'),
@@ -24,17 +24,30 @@ urlpatterns = [
     path('api/users/<int:pk>/', views.UserDetailView.as_view(), name='user_detail'),
     path('api/courses/', views.CourseListCreateView.as_view(), name='course_list_create'),
     path('api/courses/<int:pk>/', views.CourseDetailView.as_view(), name='course_detail_api'),
+    path('api/courses/<int:pk>/tree/', views.course_tree, name='course_tree'),
     path('api/modules/', views.ModuleListCreateView.as_view(), name='module_list_create'),
     path('api/modules/<int:pk>/', views.ModuleDetailView.as_view(), name='module_detail'),
     path('api/materials/', views.MaterialListCreateView.as_view(), name='material_list_create'),
     path('api/materials/<int:pk>/', views.MaterialDetailView.as_view(), name='material_detail'),
+    path('api/search/', views.SearchView.as_view(), name='search'),
+    path('api/materials/uploads/', views.MaterialUploadStartView.as_view(), name='material_upload_start'),
+    path('api/materials/uploads/<uuid:pk>/', views.MaterialUploadDetailView.as_view(), name='material_upload_detail'),
+    path('api/materials/uploads/<uuid:pk>/chunks/<int:index>/', views.MaterialUploadChunkView.as_view(),
+         name='material_upload_chunk'),
+    path('api/materials/uploads/<uuid:pk>/finalize/', views.MaterialUploadFinishView.as_view(),
+         name='material_upload_finalize'),
+    path('api/materials/<int:pk>/download/', views.MaterialDownloadView.as_view(), name='material_download'),
     path('api/enrollments/', views.EnrollmentListCreateView.as_view(), name='enrollment_list_create'),
+    path('api/enrollments/bulk/', views.EnrollmentBulkView.as_view(), name='enrollment_bulk'),
     path('api/enrollments/<int:pk>/', views.EnrollmentDetailView.as_view(), name='enrollment_detail'),
     path('api/progress/', views.UserProgressListCreateView.as_view(), name='progress_list_create'),
+    path('api/progress/bulk/', views.UserProgressBulkView.as_view(), name='progress_bulk'),
     path('api/progress/<int:pk>/', views.UserProgressDetailView.as_view(), name='progress_detail'),
     path('api/favorites/', views.FavoriteCourseListCreateView.as_view(), name='favorite_list_create'),
     path('api/favorites/<int:pk>/', views.FavoriteCourseDetailView.as_view(), name='favorite_detail'),
     path('api/surveys/', views.SurveyListCreateView.as_view(), name='survey_list_create'),
+    path('api/surveys/submit/', views.SurveySubmitView.as_view(), name='survey_submit'),
+    path('api/surveys/analytics/', views.SurveyAnalyticsView.as_view(), name='survey_analytics'),
     path('api/surveys/<int:pk>/', views.SurveyDetailView.as_view(), name='survey_detail'),
     path('modules/create/', views.module_create, name='module_create'),
     path('modules/', views.module_list, name='module_list'),
@@ -0,0 +1,20 @@
+import uuid
+
+from django.core.cache import cache
+
+
+def get_version(key, store=None):
+    # store — другой алиас кэша (например, общий уровень токенов), по умолчанию default
+    store = store or cache
+    version = store.get(key)
+    if version is None:
+        # Стартовое значение уникально, чтобы после вытеснения ключа не совпасть со старой копией
+        store.add(key, uuid.uuid4().hex, None)
+        version = store.get(key)
+    return version
+
+
+def bump_version(key, store=None):
+    # Новое уникальное значение вместо incr: в файловом кэше incr — это get + set, и два процесса
+    # могли бы записать одно и то же число, потеряв одну из инвалидаций
+    (store or cache).set(key, uuid.uuid4().hex, None)
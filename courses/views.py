@@ -3,18 +3,47 @@ from django.contrib import messages
 from django.utils import timezone
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
-from rest_framework import generics
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.views.decorators.http import require_safe
+from asgiref.sync import sync_to_async
+from rest_framework import generics, status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from .models import Course, Module, Material, Enrollment, UserProgress, FavoriteCourse, Survey
+from .models import Course, Module, Material, MaterialUpload, Enrollment, UserProgress, FavoriteCourse, Survey
+from .catalog import acatalog_for_user, aget_catalog_icons, format_course_date
+from .course_pages import aget_course_page
+from .course_tree import aget_course_tree
+from .downloads import serve_file
+from .pagination import keyset_paginate
+from .quizzes import get_quiz
+from .search import SEARCH_KINDS, SEARCH_MAX_LIMIT, SEARCH_MAX_OFFSET, run_search
+from .slugs import slugify_title
+from .surveys import get_survey, submit_survey
+from .uploads import UploadError, discard_upload, finish_upload, start_upload, write_chunk
+from .analytics import stats_report
+from .cohorts import MAX_COHORT_SIZE, enroll_cohort
+from .conditional import ConditionalGetMixin
+from .fast_serializers import (
+    FastListMixin, CourseValuesSerializer, ModuleValuesSerializer, MaterialValuesSerializer,
+    EnrollmentValuesSerializer, UserProgressValuesSerializer, FavoriteCourseValuesSerializer, SurveyValuesSerializer
+)
+from .progress import MAX_BULK_ITEMS, upsert_progress
 from .serializers import (
-    UserSerializer, CourseSerializer, ModuleSerializer, MaterialSerializer,
-    EnrollmentSerializer, UserProgressSerializer, FavoriteCourseSerializer, SurveySerializer
+    UserSerializer, CourseSerializer, ModuleSerializer, MaterialSerializer, MaterialUploadSerializer,
+    EnrollmentSerializer, UserProgressSerializer, UserProgressBulkItemSerializer,
+    FavoriteCourseSerializer, SurveySerializer
 )
-from django.contrib.auth.models import User
+from django.contrib.auth.models import AnonymousUser, User
 from django.contrib.auth.forms import UserCreationForm
+import io
 import locale
+import os
 
 locale.setlocale(locale.LC_TIME, 'ru_RU.UTF-8')
 
@@ -44,8 +73,18 @@ def module_list(request):
         messages.error(request, 'Только администраторы могут просматривать модули.')
         return redirect('home')
 
-    modules = Module.objects.all()
-    return render(request, 'module_list.html', {'modules': modules})
+    modules = Module.objects.select_related('course').defer('description', 'course__description')
+    course_id = request.GET.get('course', '')
+    if course_id.isdigit():
+        modules = modules.filter(course_id=course_id)
+    page = keyset_paginate(modules, request.GET)
+    courses = Course.objects.only('id', 'title').order_by('title')
+    return render(request, 'module_list.html', {
+        'modules': page,
+        'page': page,
+        'courses': courses,
+        'selected_course': course_id,
+    })
 
 
 @login_required
@@ -113,8 +152,24 @@ def material_list(request):
         messages.error(request, 'Только администраторы могут просматривать материалы.')
         return redirect('home')
 
-    materials = Material.objects.all()
-    return render(request, 'material_list.html', {'materials': materials})
+    materials = Material.objects.select_related('module').defer('content', 'module__description')
+    course_id = request.GET.get('course', '')
+    module_id = request.GET.get('module', '')
+    if course_id.isdigit():
+        materials = materials.filter(module__course_id=course_id)
+    if module_id.isdigit():
+        materials = materials.filter(module_id=module_id)
+    page = keyset_paginate(materials, request.GET)
+    courses = Course.objects.only('id', 'title').order_by('title')
+    modules = Module.objects.filter(course_id=course_id).only('id', 'title') if course_id.isdigit() else Module.objects.none()
+    return render(request, 'material_list.html', {
+        'materials': page,
+        'page': page,
+        'courses': courses,
+        'modules': modules,
+        'selected_course': course_id,
+        'selected_module': module_id,
+    })
 
 
 @login_required
@@ -196,8 +251,8 @@ def api_logout(request):
 
 
 @login_required
-def api_profile(request):
-    return render(request, 'api_profile.html', {'user': request.user})
+async def api_profile(request):
+    return render(request, 'api_profile.html', {'user': await _auser(request)})
 
 
 # Общие страницы
@@ -216,40 +271,40 @@ def settings(request):
     return redirect('home')
 
 
+async def _auser(request):
+    # Пользователь и сессия загружаются асинхронно, а request.user заменяется готовым объектом:
+    # шаблоны и контекстные процессоры иначе сделали бы синхронный запрос из event loop
+    user = await request.auser()
+    request.user = user
+    return user
+
+
+def _drf_user(request):
+    # Неверный токен — AuthenticationFailed с заголовком WWW-Authenticate отклонившего его класса, как в APIView
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    # Request подменяет классы на ForcedAuthentication в тестах с force_authenticate
+    for authenticator in drf_request.authenticators:
+        try:
+            result = authenticator.authenticate(drf_request)
+        except AuthenticationFailed as exc:
+            exc.auth_header = authenticator.authenticate_header(drf_request)
+            raise
+        if result is not None:
+            return result[0]
+    return AnonymousUser()
+
+
+async def _api_user(request):
+    # Сессия проверяется асинхронно; Token и JWT — классами аутентификации DRF в потоке
+    user = await _auser(request)
+    if user.is_authenticated:
+        return user
+    return await sync_to_async(_drf_user)(request)
+
+
 # Курсы и избранное
-def api_courses(request):
-    all_courses = [
-        {'name': 'Backend', 'icon': '2920/2920346.png', 'date': '15 апреля 2025'},
-        {'name': 'Frontend', 'icon': '1055/1055681.png', 'date': '20 апреля 2025'},
-        {'name': 'Data Science', 'icon': '2920/2920352.png', 'date': '25 апреля 2025'},
-        {'name': 'DevOps', 'icon': '1055/1055680.png', 'date': '30 апреля 2025'},
-        {'name': 'AI/ML', 'icon': '2920/2920348.png', 'date': '5 мая 2025'},
-        {'name': 'Cybersecurity', 'icon': '5968/5968852.png', 'date': '10 мая 2025'},
-        {'name': 'Mobile Development', 'icon': '5968/5968896.png', 'date': '15 мая 2025'},
-        {'name': 'Cloud Computing', 'icon': 'question.png', 'date': '20 мая 2025'},
-        {'name': 'Game Development', 'icon': '5968/5968880.png', 'date': '25 мая 2025'},
-        {'name': 'UI/UX Design', 'icon': '5968/5968908.png', 'date': '30 мая 2025'},
-        {'name': 'Blockchain', 'icon': '5968/5968864.png', 'date': '5 июня 2025'},
-        {'name': 'Python Basics', 'icon': '5968/5968876.png', 'date': '10 июня 2025'},
-        {'name': 'Java Programming', 'icon': '5968/5968844.png', 'date': '15 июня 2025'},
-        {'name': 'Web Development', 'icon': '5968/5968912.png', 'date': '20 июня 2025'},
-        {'name': 'Database Design', 'icon': '5968/5968820.png', 'date': '25 июня 2025'},
-    ]
-    if request.user.is_authenticated:
-        favorite_courses = FavoriteCourse.objects.filter(user=request.user)
-        courses = []
-        for course in all_courses:
-            fav = favorite_courses.filter(course_name=course['name']).first()
-            courses.append({
-                'name': course['name'],
-                'icon': course['icon'],
-                'date': course['date'],
-                'progress': fav.progress if fav else 0,
-                'is_favorite': fav is not None
-            })
-    else:
-        courses = [{'name': c['name'], 'icon': c['icon'], 'date': c['date'], 'progress': 0, 'is_favorite': False} for c
-                   in all_courses]
+async def api_courses(request):
+    courses = await acatalog_for_user(await _auser(request))
     return render(request, 'api_courses.html', {'courses': courses})
 
 
@@ -258,44 +313,28 @@ def home(request):
 
 
 @login_required
-def favorites(request):
-    favorite_courses = FavoriteCourse.objects.filter(user=request.user)
-    if not favorite_courses.exists():
+async def favorites(request):
+    user = await _auser(request)
+    favorite_courses = [row async for row in
+                        FavoriteCourse.objects.filter(user=user).values_list('course_name', 'progress')]
+    if not favorite_courses:
         return render(request, 'favorites.html', {'message': 'У вас нет добавленных курсов'})
-    courses = []
-    all_courses = {
-        'Backend': '2920/2920346.png',
-        'Frontend': '1055/1055681.png',
-        'Data Science': '2920/2920352.png',
-        'DevOps': '1055/1055680.png',
-        'AI/ML': '2920/2920348.png',
-        'Cybersecurity': '5968/5968852.png',
-        'Mobile Development': '5968/5968896.png',
-        'Cloud Computing': 'question.png',
-        'Game Development': '5968/5968880.png',
-        'UI/UX Design': '5968/5968908.png',
-        'Blockchain': '5968/5968864.png',
-        'Python Basics': '5968/5968876.png',
-        'Java Programming': '5968/5968844.png',
-        'Web Development': '5968/5968912.png',
-        'Database Design': '5968/5968820.png',
+    icons = await aget_catalog_icons()
+    known = {
+        title: (slug, start_date) async for title, slug, start_date in
+        Course.objects.filter(title__in=[name for name, _ in favorite_courses]).values_list('title', 'slug', 'start_date')
     }
-    for fav in favorite_courses:
-        try:
-            course = Course.objects.get(title=fav.course_name)
-            courses.append({
-                'name': fav.course_name,
-                'icon': all_courses.get(fav.course_name, 'question.png'),
-                'date': course.start_date.strftime('%d %B %Y'),
-                'progress': fav.progress,
-            })
-        except Course.DoesNotExist:
-            courses.append({
-                'name': fav.course_name,
-                'icon': all_courses.get(fav.course_name, 'question.png'),
-                'date': timezone.now().strftime('%d %B %Y'),
-                'progress': fav.progress,
-            })
+    today = format_course_date(timezone.now())
+    courses = []
+    for name, progress in favorite_courses:
+        slug, start_date = known.get(name, (slugify_title(name), None))
+        courses.append({
+            'name': name,
+            'slug': slug,
+            'icon': icons.get(name, 'question.png'),
+            'date': format_course_date(start_date) if start_date else today,
+            'progress': progress,
+        })
     return render(request, 'favorites.html', {'favorite_courses': courses})
 
 
@@ -347,141 +386,49 @@ def course_create(request):
     return render(request, 'course_create.html', {'courses': courses})
 
 
-def course_detail(request, course_name):
-    course = get_object_or_404(Course, title=course_name)
-    return render(request, 'course_detail.html', {'course': course})
+async def course_detail(request, slug):
+    await _auser(request)
+    page = await aget_course_page(slug)
+    if page is None:
+        # Старые ссылки вели на страницу по названию курса — перенаправляем на постоянный адрес
+        course_slug = await Course.objects.filter(title=slug).order_by('id').values_list('slug', flat=True).afirst()
+        if course_slug is None:
+            raise Http404('Курс не найден')
+        return redirect('course_detail', slug=course_slug, permanent=True)
+    return render(request, 'course_detail.html', page)
+
+
+def _redirect_to_course(course_id):
+    return redirect('course_detail', slug=Course.objects.values_list('slug', flat=True).get(pk=course_id))
 
 
 # Тесты для курсов
 @login_required
 def course_test(request, course_name):
-    test_questions = {
-        'Backend': [
-            {'id': 1, 'text': 'Сколько возможных значений у переменной типа bool?',
-             'options': {'a': '1', 'b': '2', 'c': '3', 'd': '4'}, 'correct': 'b'},
-            {'id': 2, 'text': 'Что делает метод словаря popitem()?',
-             'options': {'a': 'Удаляет случайную пару', 'b': 'Добавляет элемент', 'c': 'Возвращает длину',
-                         'd': 'Очищает словарь'}, 'correct': 'a'},
-            {'id': 3, 'text': 'Что такое «else»?',
-             'options': {'a': 'Цикл', 'b': 'Условие', 'c': 'Исключение', 'd': 'Функция'}, 'correct': 'b'},
-            {'id': 4, 'text': 'Что делает функция len?',
-             'options': {'a': 'Возвращает длину', 'b': 'Сортирует', 'c': 'Удаляет элемент', 'd': 'Добавляет элемент'},
-             'correct': 'a'},
-            {'id': 5, 'text': 'Что обозначает тип данных float?',
-             'options': {'a': 'Целое число', 'b': 'Строку', 'c': 'Дробное число', 'd': 'Логическое значение'},
-             'correct': 'c'},
-            {'id': 6, 'text': 'Что хранит в себе переменная?',
-             'options': {'a': 'Данные', 'b': 'Функцию', 'c': 'Класс', 'd': 'Модуль'}, 'correct': 'a'},
-            {'id': 7, 'text': 'Что лучше использовать для множественного ветвления?',
-             'options': {'a': 'if-elif-else', 'b': 'for', 'c': 'while', 'd': 'try-except'}, 'correct': 'a'},
-            {'id': 8, 'text': 'Язык Python подходит для разработки:',
-             'options': {'a': 'Только веба', 'b': 'Только игр', 'c': 'Многого', 'd': 'Только мобильных приложений'},
-             'correct': 'c'},
-            {'id': 9, 'text': 'Что является оператором ввода и вывода?',
-             'options': {'a': 'print', 'b': 'input', 'c': 'len', 'd': 'range'}, 'correct': 'a,b'},
-            # Множественный выбор пока не поддерживается, см. ниже
-        ],
-        'Frontend': [
-            {'id': 1, 'text': 'Что такое HTML?',
-             'options': {'a': 'Язык разметки', 'b': 'Язык программирования', 'c': 'Скриптовый язык',
-                         'd': 'База данных'}, 'correct': 'a'},
-            {'id': 2, 'text': 'Какой тег используется для заголовка?',
-             'options': {'a': '<p>', 'b': '<h1>', 'c': '<div>', 'd': '<span>'}, 'correct': 'b'},
-            {'id': 3, 'text': 'Что такое CSS?',
-             'options': {'a': 'Язык программирования', 'b': 'База данных', 'c': 'Язык стилей', 'd': 'Фреймворк'},
-             'correct': 'c'},
-            {'id': 4, 'text': 'Какой метод добавляет элемент в массив в JS?',
-             'options': {'a': 'push', 'b': 'pop', 'c': 'shift', 'd': 'slice'}, 'correct': 'a'},
-            {'id': 5, 'text': 'Что такое DOM?',
-             'options': {'a': 'База данных', 'b': 'Объектная модель документа', 'c': 'Язык стилей', 'd': 'Фреймворк'},
-             'correct': 'b'},
-        ],
-        'Data Science': [
-            {'id': 1, 'text': 'Что такое Python?',
-             'options': {'a': 'Язык программирования', 'b': 'Фреймворк', 'c': 'База данных',
-                         'd': 'Операционная система'}, 'correct': 'a'},
-            {'id': 2, 'text': 'Какая библиотека используется для анализа данных?',
-             'options': {'a': 'Django', 'b': 'Pandas', 'c': 'React', 'd': 'Flask'}, 'correct': 'b'},
-            {'id': 3, 'text': 'Что такое машинное обучение?',
-             'options': {'a': 'Создание сайтов', 'b': 'Работа с базами', 'c': 'Обучение моделей', 'd': 'Дизайн'},
-             'correct': 'c'},
-            {'id': 4, 'text': 'Что делает библиотека NumPy?',
-             'options': {'a': 'Визуализация', 'b': 'Работа с массивами', 'c': 'Создание API', 'd': 'Парсинг'},
-             'correct': 'b'},
-            {'id': 5, 'text': 'Что такое SQL?',
-             'options': {'a': 'Язык запросов', 'b': 'Язык программирования', 'c': 'Фреймворк', 'd': 'Библиотека'},
-             'correct': 'a'},
-        ],
-        'DevOps': [
-            {'id': 1, 'text': 'Что такое Docker?',
-             'options': {'a': 'Контейнеризация', 'b': 'Язык программирования', 'c': 'База данных', 'd': 'Скрипт'},
-             'correct': 'a'},
-            {'id': 2, 'text': 'Что такое CI/CD?',
-             'options': {'a': 'Интеграция и доставка', 'b': 'Язык стилей', 'c': 'Фреймворк', 'd': 'Библиотека'},
-             'correct': 'a'},
-            {'id': 3, 'text': 'Какой инструмент для оркестрации?',
-             'options': {'a': 'Kubernetes', 'b': 'Pandas', 'c': 'React', 'd': 'Django'}, 'correct': 'a'},
-            {'id': 4, 'text': 'Что делает Ansible?',
-             'options': {'a': 'Автоматизация', 'b': 'Визуализация', 'c': 'Парсинг', 'd': 'Создание API'},
-             'correct': 'a'},
-            {'id': 5, 'text': 'Что такое Jenkins?',
-             'options': {'a': 'Сервер автоматизации', 'b': 'Язык', 'c': 'База данных', 'd': 'Фреймворк'},
-             'correct': 'a'},
-        ],
-        'AI/ML': [
-            {'id': 1, 'text': 'Что такое нейронная сеть?',
-             'options': {'a': 'Модель машинного обучения', 'b': 'Язык', 'c': 'База данных', 'd': 'Скрипт'},
-             'correct': 'a'},
-            {'id': 2, 'text': 'Какая библиотека для ML?',
-             'options': {'a': 'TensorFlow', 'b': 'Django', 'c': 'Flask', 'd': 'React'}, 'correct': 'a'},
-            {'id': 3, 'text': 'Что такое overfitting?',
-             'options': {'a': 'Переобучение', 'b': 'Недообучение', 'c': 'Оптимизация', 'd': 'Визуализация'},
-             'correct': 'a'},
-            {'id': 4, 'text': 'Что делает функция sigmoid?',
-             'options': {'a': 'Активация', 'b': 'Сортировка', 'c': 'Удаление', 'd': 'Добавление'}, 'correct': 'a'},
-            {'id': 5, 'text': 'Что такое кластеризация?',
-             'options': {'a': 'Группировка данных', 'b': 'Создание API', 'c': 'Дизайн', 'd': 'Парсинг'},
-             'correct': 'a'},
-        ],
-    }
-
-    questions = test_questions.get(course_name, [])
-    if not questions:
+    quiz = get_quiz(course_name)
+    if quiz is None:
         return render(request, 'course_test.html',
                       {'course_name': course_name, 'error': 'Тест для этого курса ещё не готов.'})
 
     if request.method == 'POST':
-        total_questions = len(questions)
-        correct_answers = 0
-        results = []
-
-        for q in questions:
-            user_answer = request.POST.get(f'question_{q["id"]}')
-            is_correct = user_answer == q['correct']
-            if is_correct:
-                correct_answers += 1
-            results.append({
-                'text': q['text'],
-                'user_answer': user_answer or 'Не отвечено',
-                'correct_answer': q['correct'],
-                'is_correct': is_correct,
-                'options': q['options']
-            })
+        answers = quiz.read_answers(request.POST)
 
         # Проверка, что все вопросы отвечены
-        if len([r for r in results if r['user_answer'] == 'Не отвечено']) > 0:
+        if not all(answers):
             return render(request, 'course_test.html', {
                 'course_name': course_name,
-                'questions': questions,
+                'questions': quiz.questions,
                 'error': 'Пожалуйста, ответьте на все вопросы.'
             })
 
+        total_questions = len(quiz)
+        correct_answers, results = quiz.grade(answers)
         percentage = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
 
-        if FavoriteCourse.objects.filter(user=request.user, course_name=course_name).exists():
-            favorite = FavoriteCourse.objects.get(user=request.user, course_name=course_name)
-            favorite.progress = max(favorite.progress, percentage)
-            favorite.save()
+        # Один UPDATE, который срабатывает только при улучшении результата
+        FavoriteCourse.objects.filter(
+            user=request.user, course_name=course_name, progress__lt=int(percentage)
+        ).update(progress=int(percentage))
 
         context = {
             'course_name': course_name,
@@ -492,173 +439,57 @@ def course_test(request, course_name):
         }
         return render(request, 'test_results.html', context)
 
-    return render(request, 'course_test.html', {'course_name': course_name, 'questions': questions})
+    return render(request, 'course_test.html', {'course_name': course_name, 'questions': quiz.questions})
 
 
 # Опросы
 @login_required
 def api_survey(request, survey_type):
-    survey_questions = {
-        'backend': [
-            {"id": "q1", "text": "Вам нравится работать с серверной логикой?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q2", "text": "Интересуют ли вас базы данных?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q3", "text": "Любите ли вы оптимизировать код?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q4", "text": "Хотите ли вы разрабатывать API?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q5", "text": "Интересует ли вас безопасность приложений?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q6", "text": "Нравится ли вам работать с Python/Django?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q7", "text": "Любите ли вы сложные серверные задачи?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q8", "text": "Интересует ли вас масштабирование систем?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q9", "text": "Хотите ли вы работать с микросервисами?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q10", "text": "Нравится ли вам отладка серверного кода?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-        ],
-        'frontend': [
-            {"id": "q1", "text": "Любите ли вы создавать интерфейсы?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q2", "text": "Интересует ли вас дизайн UI/UX?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q3", "text": "Нравится ли вам работать с JavaScript?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q4", "text": "Хотите ли вы изучать React/Vue?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q5", "text": "Интересует ли вас адаптивная вёрстка?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q6", "text": "Любите ли вы анимации на сайтах?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q7", "text": "Нравится ли вам CSS и стилизация?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q8", "text": "Интересует ли вас работа с DOM?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q9", "text": "Хотите ли вы улучшать UX?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q10", "text": "Нравится ли вам тестировать интерфейсы?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-        ],
-        'data_science': [
-            {"id": "q1", "text": "Интересует ли вас анализ данных?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q2", "text": "Любите ли вы статистику?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q3", "text": "Нравится ли вам работать с Python?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q4", "text": "Интересуют ли вас большие данные?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q5", "text": "Хотите ли вы визуализировать данные?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q6", "text": "Любите ли вы математику?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q7", "text": "Интересует ли вас работа с SQL?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q8", "text": "Нравится ли вам исследовать данные?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q9", "text": "Хотите ли вы предсказывать тренды?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q10", "text": "Интересует ли вас очистка данных?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-        ],
-        'devops': [
-            {"id": "q1", "text": "Нравится ли вам настраивать серверы?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q2", "text": "Интересует ли вас автоматизация?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q3", "text": "Любите ли вы работать с Docker?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q4", "text": "Хотите ли вы управлять облаком?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q5", "text": "Интересует ли вас CI/CD?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q6", "text": "Нравится ли вам мониторинг систем?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q7", "text": "Любите ли вы Bash-скрипты?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q8", "text": "Интересует ли вас сетевая безопасность?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q9", "text": "Хотите ли вы работать с Kubernetes?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q10", "text": "Нравится ли вам решать проблемы инфраструктуры?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-        ],
-        'ai_ml': [
-            {"id": "q1", "text": "Интересует ли вас машинное обучение?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q2", "text": "Любите ли вы математику и статистику?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q3", "text": "Нравится ли вам работать с Python?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q4", "text": "Интересуют ли вас нейронные сети?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q5", "text": "Хотите ли вы предсказывать данные?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q6", "text": "Любите ли вы сложные алгоритмы?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q7", "text": "Интересует ли вас обработка данных?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q8", "text": "Нравится ли вам экспериментировать с моделями?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q9", "text": "Хотите ли вы работать с TensorFlow?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-            {"id": "q10", "text": "Интересует ли вас компьютерное зрение?",
-             "options": {"Очень": 3, "Да": 2, "Нет": 1, "Совсем нет": 0}},
-        ],
-    }
-
-    if survey_type not in survey_questions:
+    survey = get_survey(survey_type)
+    if survey is None:
         messages.error(request, "Неверный тип опроса.")
         return redirect('home')
 
-    questions = survey_questions[survey_type]
+    questions = survey.questions
+
+    # Все ответы одним запросом, без хранения промежуточного состояния в сессии
+    if request.method == 'POST' and request.POST.get('mode') == 'single':
+        answers, errors = survey.clean_answers(request.POST)
+        if errors:
+            return render(request, 'api_survey.html', {
+                'survey_type': survey_type, 'questions': questions, 'single_page': True,
+                'error': 'Пожалуйста, ответьте на все вопросы.',
+            })
+        _, recommendations = submit_survey(request.user, survey, answers)
+        course_title = recommendations[0]['title']
+        messages.success(request, f"Рекомендуемый курс: {course_title}")
+        return _redirect_to_course(recommendations[0]['id'])
 
     if request.method == 'POST':
         answers = request.session.get('survey_answers', {})
         current_question = request.POST.get('current_question', 'q1')
-        answer = request.POST.get(current_question)
+        answer = survey.clean_answer(current_question, request.POST.get(current_question))
 
-        if answer:
-            answers[current_question] = int(answer)
+        if answer is not None:
+            answers[current_question] = answer
             request.session['survey_answers'] = answers
 
-        next_question = None
-        for i, q in enumerate(questions):
-            if q['id'] == current_question and i + 1 < len(questions):
-                next_question = questions[i + 1]['id']
-                break
+        next_question = survey.next_question.get(current_question)
 
         if not next_question:
-            score = sum(answers.values())
-            course_title = {
-                'backend': "Backend-разработка с Python",
-                'frontend': "Frontend-разработка (React)",
-                'data_science': "Анализ данных с Python",
-                'devops': "DevOps и администрирование",
-                'ai_ml': "Машинное обучение",
-            }[survey_type]
-            try:
-                course = Course.objects.get(title=course_title)
-            except Course.DoesNotExist:
-                course = Course.objects.create(
-                    title=course_title,
-                    description=f"Курс по {survey_type}",
-                    instructor=User.objects.filter(is_staff=True).first() or request.user,
-                    start_date=timezone.now(),
-                    end_date=timezone.now() + timezone.timedelta(days=90)
-                )
-            Survey.objects.create(user=request.user, answers=answers, recommended_course=course)
-            messages.success(request, f"Рекомендуемый курс: {course.title}")
-            del request.session['survey_answers']
-            return redirect('course_detail', course_name=course.title)
+            _, recommendations = submit_survey(request.user, survey, answers)
+            course_title = recommendations[0]['title']
+            messages.success(request, f"Рекомендуемый курс: {course_title}")
+            request.session.pop('survey_answers', None)
+            return _redirect_to_course(recommendations[0]['id'])
 
         return render(request, 'api_survey.html',
                       {'survey_type': survey_type, 'question': next_question, 'questions': questions})
 
+    if request.GET.get('mode') == 'single':
+        return render(request, 'api_survey.html',
+                      {'survey_type': survey_type, 'questions': questions, 'single_page': True})
+
     request.session['survey_answers'] = {}
     return render(request, 'api_survey.html', {'survey_type': survey_type, 'question': 'q1', 'questions': questions})
 
@@ -697,9 +528,10 @@ class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
         return obj
 
 
-class CourseListCreateView(generics.ListCreateAPIView):
+class CourseListCreateView(ConditionalGetMixin, FastListMixin, generics.ListCreateAPIView):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
+    values_serializer_class = CourseValuesSerializer
     permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
@@ -708,7 +540,7 @@ class CourseListCreateView(generics.ListCreateAPIView):
         serializer.save(instructor=self.request.user)
 
 
-class CourseDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CourseDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [IsAuthenticated]
@@ -724,9 +556,32 @@ class CourseDetailView(generics.RetrieveUpdateDestroyAPIView):
         instance.delete()
 
 
-class ModuleListCreateView(generics.ListCreateAPIView):
+@require_safe
+async def course_tree(request, pk):
+    # Асинхронное представление без APIView: DRF не поддерживает async, аутентификация — через _api_user
+    try:
+        user = await _api_user(request)
+    except AuthenticationFailed as exc:
+        response = JsonResponse({'detail': exc.detail}, status=exc.status_code)
+        if exc.auth_header:
+            response.headers['WWW-Authenticate'] = exc.auth_header
+        return response
+    if not user.is_authenticated:
+        return JsonResponse({'detail': 'Учётные данные не были предоставлены.'}, status=status.HTTP_403_FORBIDDEN)
+    entry = await aget_course_tree(pk)
+    if entry is None:
+        return JsonResponse({'detail': 'Курс не найден'}, status=status.HTTP_404_NOT_FOUND)
+    content, etag = entry
+    response = get_conditional_response(request, etag=quote_etag(etag)) or \
+        HttpResponse(content, content_type='application/json')
+    response.headers['ETag'] = quote_etag(etag)
+    return response
+
+
+class ModuleListCreateView(ConditionalGetMixin, FastListMixin, generics.ListCreateAPIView):
     queryset = Module.objects.all()
     serializer_class = ModuleSerializer
+    values_serializer_class = ModuleValuesSerializer
     permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
@@ -735,7 +590,7 @@ class ModuleListCreateView(generics.ListCreateAPIView):
         serializer.save()
 
 
-class ModuleDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ModuleDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Module.objects.all()
     serializer_class = ModuleSerializer
     permission_classes = [IsAuthenticated]
@@ -751,9 +606,10 @@ class ModuleDetailView(generics.RetrieveUpdateDestroyAPIView):
         instance.delete()
 
 
-class MaterialListCreateView(generics.ListCreateAPIView):
+class MaterialListCreateView(ConditionalGetMixin, FastListMixin, generics.ListCreateAPIView):
     queryset = Material.objects.all()
     serializer_class = MaterialSerializer
+    values_serializer_class = MaterialValuesSerializer
     permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
@@ -762,7 +618,7 @@ class MaterialListCreateView(generics.ListCreateAPIView):
         serializer.save()
 
 
-class MaterialDetailView(generics.RetrieveUpdateDestroyAPIView):
+class MaterialDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Material.objects.all()
     serializer_class = MaterialSerializer
     permission_classes = [IsAuthenticated]
@@ -778,9 +634,110 @@ class MaterialDetailView(generics.RetrieveUpdateDestroyAPIView):
         instance.delete()
 
 
-class EnrollmentListCreateView(generics.ListCreateAPIView):
-    queryset = Enrollment.objects.all()
+class SearchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'q': 'Укажите поисковый запрос.'}, status=status.HTTP_400_BAD_REQUEST)
+        kinds = [kind for kind in request.query_params.get('kind', '').split(',') if kind]
+        if any(kind not in SEARCH_KINDS for kind in kinds):
+            return Response({'kind': f'Допустимые значения: {", ".join(SEARCH_KINDS)}.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), SEARCH_MAX_LIMIT)
+            offset = min(max(int(request.query_params.get('offset', 0)), 0), SEARCH_MAX_OFFSET)
+        except ValueError:
+            return Response({'limit': 'limit и offset должны быть числами.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = run_search(query, kinds, limit=limit, offset=offset)
+        return Response({'q': query, 'limit': limit, 'offset': offset, 'results': results})
+
+
+class MaterialDownloadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def perform_content_negotiation(self, request, force=False):
+        # Плееры присылают Accept: video/*, а рендереры DRF здесь не используются
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, pk):
+        material = get_object_or_404(
+            Material.objects.select_related('module').only('title', 'file', 'module__course'), pk=pk
+        )
+        if not material.file:
+            raise Http404('У материала нет файла')
+        if not request.user.is_staff and not Enrollment.objects.filter(
+                user=request.user, course_id=material.module.course_id).exclude(status='canceled').exists():
+            self.permission_denied(request, message='Материал доступен только записанным на курс')
+        # В хранилище файл назван по хэшу, пользователю он отдаётся под названием материала
+        filename = material.title + os.path.splitext(material.file.name)[1]
+        return serve_file(request, material.file, as_attachment=request.query_params.get('download') == '1',
+                          filename=filename)
+
+
+class MaterialUploadStartView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        serializer = MaterialUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = start_upload(request.user, serializer.validated_data['filename'], serializer.validated_data['size'])
+        return Response(MaterialUploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+
+
+class MaterialUploadDetailView(APIView):
+    # Состояние загрузки: по списку received клиент после обрыва досылает только недостающие части
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, pk):
+        upload = get_object_or_404(MaterialUpload, pk=pk, user=request.user)
+        return Response(MaterialUploadSerializer(upload).data)
+
+    def delete(self, request, pk):
+        discard_upload(get_object_or_404(MaterialUpload, pk=pk, user=request.user))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class MaterialUploadChunkView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def put(self, request, pk, index):
+        # Тело запроса — байты части; request.data не трогаем, чтобы не буферизовать её в памяти
+        upload = get_object_or_404(MaterialUpload, pk=pk, user=request.user)
+        try:
+            sha256 = write_chunk(upload, index, request.stream or io.BytesIO(),
+                                 request.headers.get('X-Chunk-SHA256'))
+        except UploadError as error:
+            return Response({'chunk': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'index': index, 'sha256': sha256})
+
+
+class MaterialUploadFinishView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, pk):
+        upload = get_object_or_404(MaterialUpload, pk=pk, user=request.user)
+        material_id = request.data.get('material')
+        if material_id is not None:
+            material = get_object_or_404(Material, pk=material_id)
+        else:
+            serializer = MaterialSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            material = Material(**serializer.validated_data)
+        try:
+            sha256 = finish_upload(upload, material, request.data.get('sha256'))
+        except UploadError as error:
+            return Response({'upload': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({**MaterialSerializer(material, context={'request': request}).data, 'sha256': sha256},
+                        status=status.HTTP_200_OK if material_id is not None else status.HTTP_201_CREATED)
+
+
+class EnrollmentListCreateView(FastListMixin, generics.ListCreateAPIView):
+    queryset = Enrollment.objects.select_related('course')
     serializer_class = EnrollmentSerializer
+    values_serializer_class = EnrollmentValuesSerializer
     permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
@@ -788,19 +745,38 @@ class EnrollmentListCreateView(generics.ListCreateAPIView):
 
 
 class EnrollmentDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Enrollment.objects.all()
+    queryset = Enrollment.objects.select_related('course')
     serializer_class = EnrollmentSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         if self.request.user.is_staff:
-            return Enrollment.objects.all()
-        return Enrollment.objects.filter(user=self.request.user)
+            return self.queryset.all()
+        return self.queryset.filter(user=self.request.user)
 
 
-class UserProgressListCreateView(generics.ListCreateAPIView):
+class EnrollmentBulkView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        course_id = request.data.get('course')
+        course = Course.objects.filter(pk=course_id).first() if str(course_id).isdigit() else None
+        if course is None:
+            return Response({'course': 'Курс не найден.'}, status=status.HTTP_400_BAD_REQUEST)
+        users = request.data.get('users')
+        if not isinstance(users, list) or not users:
+            return Response({'users': 'Ожидается непустой список id или логинов пользователей.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(users) > MAX_COHORT_SIZE:
+            return Response({'users': f'Не больше {MAX_COHORT_SIZE} пользователей за запрос.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response({'course': course.id, **enroll_cohort(course, users)})
+
+
+class UserProgressListCreateView(FastListMixin, generics.ListCreateAPIView):
     queryset = UserProgress.objects.all()
     serializer_class = UserProgressSerializer
+    values_serializer_class = UserProgressValuesSerializer
     permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
@@ -818,9 +794,40 @@ class UserProgressDetailView(generics.RetrieveUpdateDestroyAPIView):
         return UserProgress.objects.filter(user=self.request.user)
 
 
-class FavoriteCourseListCreateView(generics.ListCreateAPIView):
+class UserProgressBulkView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        items = request.data.get('items') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response({'items': 'Ожидается непустой список записей прогресса.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > MAX_BULK_ITEMS:
+            return Response({'items': f'Не больше {MAX_BULK_ITEMS} записей за запрос.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            serializer = UserProgressBulkItemSerializer(data=item)
+            if serializer.is_valid():
+                valid.append({'index': index, **serializer.validated_data})
+            else:
+                results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+        if valid:
+            for result in upsert_progress(request.user, valid):
+                results[result['index']] = result
+
+        summary = {name: 0 for name in ('created', 'updated', 'unchanged', 'error')}
+        for result in results:
+            summary[result['status']] += 1
+        return Response({**summary, 'results': results})
+
+
+class FavoriteCourseListCreateView(FastListMixin, generics.ListCreateAPIView):
     queryset = FavoriteCourse.objects.all()
     serializer_class = FavoriteCourseSerializer
+    values_serializer_class = FavoriteCourseValuesSerializer
     permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
@@ -838,9 +845,10 @@ class FavoriteCourseDetailView(generics.RetrieveUpdateDestroyAPIView):
         return FavoriteCourse.objects.filter(user=self.request.user)
 
 
-class SurveyListCreateView(generics.ListCreateAPIView):
+class SurveyListCreateView(FastListMixin, generics.ListCreateAPIView):
     queryset = Survey.objects.all()
     serializer_class = SurveySerializer
+    values_serializer_class = SurveyValuesSerializer
     permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
@@ -858,6 +866,37 @@ class SurveyDetailView(generics.RetrieveUpdateDestroyAPIView):
         return Survey.objects.filter(user=self.request.user)
 
 
+class SurveySubmitView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        survey = get_survey(request.data.get('survey_type'))
+        if survey is None:
+            return Response({'survey_type': 'Неверный тип опроса.'}, status=status.HTTP_400_BAD_REQUEST)
+        raw_answers = request.data.get('answers')
+        if not isinstance(raw_answers, dict):
+            return Response({'answers': 'Ожидается объект вида {"q1": 3, ...}.'}, status=status.HTTP_400_BAD_REQUEST)
+        answers, errors = survey.clean_answers(raw_answers)
+        if errors:
+            return Response({'answers': errors}, status=status.HTTP_400_BAD_REQUEST)
+        submitted, recommendations = submit_survey(request.user, survey, answers)
+        return Response({
+            'id': submitted.id,
+            'survey_type': survey.survey_type,
+            'score': survey.score(answers),
+            'max_score': survey.max_score,
+            'recommended_course': {'id': recommendations[0]['id'], 'title': recommendations[0]['title']},
+            'recommendations': recommendations,
+        }, status=status.HTTP_201_CREATED)
+
+
+class SurveyAnalyticsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(stats_report(request.query_params.get('survey_type')))
+
+
 class CustomTokenObtainPairView(TokenObtainPairView):
     pass
 
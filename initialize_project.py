@@ -18,9 +18,15 @@ except Exception as e:
     print(f"Ошибка при загрузке Django: {e}")
     sys.exit(1)
 
+import argparse
+
+from django.db import transaction
 from django.utils import timezone
 from django.contrib.auth.models import User
 from courses.models import Course, Module, Material, Enrollment, UserProgress
+from courses.slugs import unique_slugs
+from courses.progress import rebuild_rollups, refresh_module_counts
+from courses.seeding import DEFAULT_DATASET, DEFAULT_BATCH_SIZE, seed_dataset, print_progress
 
 
 def create_initial_data():
@@ -52,41 +58,69 @@ def create_initial_data():
         },
     ]
 
-    for course_data in courses_data:
-        if not Course.objects.filter(title=course_data['title']).exists():
-            course = Course.objects.create(
-                title=course_data['title'],
-                description=course_data['description'],
-                start_date=timezone.now(),
-                end_date=timezone.now(),
-                instructor=user
-            )
-            for module_title, module_desc, materials in course_data['modules']:
-                module = Module.objects.create(
-                    title=module_title,
-                    description=module_desc,
-                    course=course
-                )
-                for material_title, material_type, content in materials:
-                    Material.objects.create(
-                        title=material_title,
-                        type=material_type,
-                        content=content,
-                        module=module
+    # Одна проверка существования на все курсы и пакетная вставка вместо create() на каждую строку
+    existing = set(Course.objects.filter(title__in=[c['title'] for c in courses_data]).values_list('title', flat=True))
+    new_courses = [c for c in courses_data if c['title'] not in existing]
+    if new_courses:
+        with transaction.atomic():
+            slugs = unique_slugs(Course.objects.all(), [c['title'] for c in new_courses])
+            courses = Course.objects.bulk_create([
+                Course(title=c['title'], slug=slug, description=c['description'], start_date=timezone.now(),
+                       end_date=timezone.now(), instructor=user)
+                for c, slug in zip(new_courses, slugs)
+            ])
+            modules = Module.objects.bulk_create([
+                Module(title=module_title, description=module_desc, course=course)
+                for course, course_data in zip(courses, new_courses)
+                for module_title, module_desc, _ in course_data['modules']
+            ])
+            module_iter = iter(modules)
+            materials = []
+            first_modules = {}
+            for course, course_data in zip(courses, new_courses):
+                for _, _, material_rows in course_data['modules']:
+                    module = next(module_iter)
+                    first_modules.setdefault(course.id, module)
+                    materials.extend(
+                        Material(title=material_title, type=material_type, content=content, module=module)
+                        for material_title, material_type, content in material_rows
                     )
-            Enrollment.objects.create(user=user, course=course)
-            UserProgress.objects.create(user=user, course=course, module=course.modules.first(), progress=50)
+            Material.objects.bulk_create(materials)
+            Enrollment.objects.bulk_create([Enrollment(user=user, course=course) for course in courses])
+            UserProgress.objects.bulk_create([
+                UserProgress(user=user, course=course, module=first_modules[course.id], progress=50)
+                for course in courses
+            ])
+            # bulk_create не вызывает сигналы — счётчики модулей и сводки прогресса пересчитываются явно
+            refresh_module_counts([course.id for course in courses])
+            rebuild_rollups(Enrollment.objects.filter(course__in=courses))
 
     print("Курсы:", Course.objects.all())
     print("Записи:", Enrollment.objects.all())
     print("Прогресс:", UserProgress.objects.all())
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='Инициализация проекта и загрузка данных')
+    parser.add_argument('--seed', action='store_true',
+                        help='Сгенерировать синтетические данные заданного объёма (для стейджинга)')
+    for name, default in DEFAULT_DATASET.items():
+        parser.add_argument(f'--{name}', type=int, default=default)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_args()
     print("Создание миграций...")
     call_command('makemigrations')
     print("Применение миграций...")
     call_command('migrate')
     print("Добавление данных...")
     create_initial_data()
-    print("Готово!")
\ No newline at end of file
+    if args.seed:
+        print("Генерация данных...")
+        counts = seed_dataset(**{name: getattr(args, name) for name in DEFAULT_DATASET},
+                              batch_size=args.batch_size, report=print_progress(print))
+        print("Создано:", counts)
+    print("Готово!")
@@ -33,20 +33,51 @@ INSTALLED_APPS = [
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'courses.authentication.CachedTokenAuthentication',
         'rest_framework_simplejwt.authentication.JWTAuthentication',
 
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'courses.pagination.SwitchablePagination',
     'PAGE_SIZE': 10,
 
 }
 
+# Общий кэш всех воркеров: страницы и деревья курсов, версии каталога и удалений, курсы опросов.
+# Сброс из одного процесса должен быть виден остальным, поэтому LocMemCache (память процесса) — только для тестов:
+# его подставляет TEST_RUNNER на время прогона.
+# REDIS_URL — Redis (нужен пакет redis), иначе — файлы в CACHE_DIR, общие для процессов одного хоста
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', BASE_DIR / 'cache'),
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+
+TEST_RUNNER = 'courses.test_runner.CoursesTestRunner'
+
+# Кэш токенов (courses.authentication.CachedTokenAuthentication): LRU процесса и необязательный общий уровень.
+# TOKEN_CACHE_TTL — сколько другой процесс может принимать отозванный токен
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', 30))
+TOKEN_SHARED_CACHE = os.environ.get('TOKEN_SHARED_CACHE', '')
+TOKEN_SHARED_CACHE_TTL = 300
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'courses.middleware.QueryBudgetMiddleware',
+    'courses.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -57,6 +88,21 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'online_project.urls'
 
+# Учёт SQL-запросов на запрос (courses.middleware.QueryBudgetMiddleware).
+# Заголовки X-DB-* отдаются в отладке/стейджинге, в продакшене пишутся JSON-строки в лог courses.queries.
+QUERY_STATS_HEADERS = os.environ.get('QUERY_STATS_HEADERS', str(DEBUG)) == 'True'
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGETS = {
+    'api_courses': 4,
+    'favorites': 5,
+    'module_list': 6,
+    'material_list': 7,
+    'course_detail': 4,
+    'progress_bulk': 7,
+    'course_tree': 5,
+    'search': 6,
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -78,13 +124,33 @@ WSGI_APPLICATION = 'online_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Соединения живут между запросами и проверяются перед повторным использованием;
+# прагмы SQLite (WAL и др.) ставятся на каждое новое соединение (courses.routers.configure_sqlite)
+DATABASE_CONN_MAX_AGE = int(os.environ.get('DATABASE_CONN_MAX_AGE', 60))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'timeout': 20},
     }
 }
 
+# Реплики только для чтения через запятую: DATABASE_REPLICAS=/srv/replica1.sqlite3,/srv/replica2.sqlite3.
+# Данные на них доставляет внешняя репликация (Litestream, LiteFS); в тестах реплики — зеркала default
+for index, name in enumerate(filter(None, os.environ.get('DATABASE_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'NAME': name.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['courses.routers.PrimaryReplicaRouter']
+# Сколько секунд после записи клиент читает с основной базы (read-your-writes)
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -123,6 +189,8 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Внутренний location nginx для X-Accel-Redirect; пусто — файлы материалов отдаёт Django
+MATERIAL_ACCEL_REDIRECT = os.environ.get('MATERIAL_ACCEL_REDIRECT', '')
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
@@ -132,3 +200,17 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = '/login/'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'courses': {
+            'handlers': ['console'],
+            'level': os.environ.get('COURSES_LOG_LEVEL', 'WARNING'),
+        },
+    },
+}